@@ -1,8 +1,14 @@
+import json
 import typing
 
 import azcam
 import azcam.exceptions
 import azcam.utils
+from azcam_console.status import (
+    STATUS_SNAPSHOT_COMMANDS,
+    StatusSnapshot,
+    make_status_snapshot,
+)
 
 
 class API(object):
@@ -22,6 +28,20 @@ class API(object):
 
         return reply
 
+    def command_batch(self, commands: list[str]) -> list:
+        """
+        Send a list of commands to azcamserver API as one batch and return the replies in order.
+        Failed commands return their AzcamError in place of a reply.
+
+        Args:
+            commands: list of command strings
+
+        Returns:
+            list of replies for each command.
+        """
+
+        return azcam.db.server.command_batch(commands)
+
     # *************************************************************************
     #   parameters
     # *************************************************************************
@@ -56,6 +76,60 @@ class API(object):
 
         return self.command(f"set_par {parameter} {value} {subdict}")
 
+    def get_pars(self, parameters: list[str], subdict: str | None = None) -> dict:
+        """
+        Return the current values of several parameters in one server exchange.
+
+        Args:
+            parameters: list of parameter names
+            subdict: name of the sub-dictionary containing the parameters
+
+        Returns:
+            dict of {parameter: value}. Parameters which could not be read have a value of None.
+        """
+
+        replies = self.command_batch(
+            [f"get_par {parameter} {subdict}" for parameter in parameters]
+        )
+
+        values = {}
+        for parameter, reply in zip(parameters, replies):
+            if isinstance(reply, azcam.exceptions.AzcamError):
+                reply = None
+            values[parameter] = reply
+
+        return values
+
+    def set_pars(self, parameters: dict, subdict: str | None = None) -> None:
+        """
+        Set the values of several parameters in one server exchange.
+        All parameters are sent even if one fails, then an AzcamError is raised listing
+        the parameters which could not be set, as ParametersConsole.set_pars().
+
+        Args:
+            parameters: dict of {parameter: value}
+            subdict: name of sub-dictionary in which to set paramaters
+        """
+
+        replies = self.command_batch(
+            [
+                f"set_par {parameter} {value} {subdict}"
+                for parameter, value in parameters.items()
+            ]
+        )
+
+        failed = [
+            parameter
+            for parameter, reply in zip(parameters, replies)
+            if isinstance(reply, azcam.exceptions.AzcamError)
+        ]
+        if len(failed) > 0:
+            raise azcam.exceptions.AzcamError(
+                f"could not set parameters: {' '.join(failed)}"
+            )
+
+        return
+
     def save_pars(self) -> None:
         """
         Writes the par_dict to the par_file using current values.
@@ -419,10 +493,21 @@ class API(object):
             data: dictionary of exposure related data
         """
 
-        # ToDo: parse string to dict
         reply = self.command(f"get_status")
 
-        return reply
+        return json.loads(reply)
+
+    def get_status_snapshot(self) -> StatusSnapshot:
+        """
+        Return exposure state and progress, filename, and temperatures from "get_status",
+        with pressures, wavelength, and filter from three instrument commands.
+        The four commands are sent on one connection, one round trip each.
+
+        Returns:
+            snapshot: StatusSnapshot object
+        """
+
+        return make_status_snapshot(self.command_batch(STATUS_SNAPSHOT_COMMANDS))
 
     def set_image_title(self, title: str):
         """
@@ -0,0 +1,534 @@
+"""
+asyncio API class for console to communicate with azcamserver.
+"""
+
+import asyncio
+import json
+import typing
+
+import azcam
+import azcam.exceptions
+import azcam.utils
+from azcam_console.async_server_comm import AsyncServerCommunication
+from azcam_console.status import (
+    EXPOSURE_FLAG_COMMAND,
+    STATUS_SNAPSHOT_COMMANDS,
+    ExposureEvent,
+    StatusSnapshot,
+    make_exposure_event,
+    make_status_snapshot,
+    next_poll_command,
+)
+
+
+class AsyncAPI(object):
+    """
+    asyncio API class for console to communicate with azcamserver.
+    Methods mirror those of `API` but are coroutines, so that exposures, telemetry and
+    instrument commands may run concurrently from one console process.
+
+    Usage:
+        server = AsyncServerCommunication()
+        await server.connect("localhost", 2402)
+        api = AsyncAPI(server)
+        await asyncio.gather(api.expose(10, "flat"), api.get_temperatures())
+    """
+
+    def __init__(self, server: AsyncServerCommunication | None = None) -> None:
+        """
+        Args:
+            server: connected AsyncServerCommunication object
+        """
+
+        if server is None:
+            server = AsyncServerCommunication()
+
+        #: asyncio server connection
+        self.server = server
+
+    async def command(self, command: str):
+        """
+        Send a command to azcamserver API and return the reply.
+        """
+
+        reply = await self.server.command(command)
+
+        return reply
+
+    async def command_batch(self, commands: list[str]) -> list:
+        """
+        Send a list of commands to azcamserver API as one batch and return the replies in order.
+        Failed commands return their AzcamError in place of a reply.
+        """
+
+        return await self.server.command_batch(commands)
+
+    # *************************************************************************
+    #   parameters
+    # *************************************************************************
+
+    async def get_par(self, parameter: str, subdict: str | None = None) -> typing.Any:
+        """
+        Return the current attribute value of a parameter in the parameters dictionary.
+
+        Args:
+            parameter: name of the parameter
+            subdict: name of the sub-dictionary containing the parameter
+        """
+
+        return await self.command(f"get_par {parameter} {subdict}")
+
+    async def set_par(
+        self, parameter: str, value: typing.Any = "None", subdict: str | None = None
+    ) -> None:
+        """
+        Set the value of a parameter in a parameters dictionary.
+
+        Args:
+            parameter: name of the parameter
+            value: value of the parameter. Defaults to None.
+            subdict: name of sub-dictionary in which to set paramater
+        """
+
+        return await self.command(f"set_par {parameter} {value} {subdict}")
+
+    async def save_pars(self) -> None:
+        """
+        Writes the par_dict to the par_file using current values.
+        """
+
+        return await self.command(f"save_pars")
+
+    # *************************************************************************
+    #   temperatures and pressures
+    # *************************************************************************
+
+    async def get_temperatures(self) -> list[float]:
+        """
+        Return all system temperatures.
+        """
+
+        temps = await self.command(f"get_temperatures")
+
+        if type(temps) == list:
+            reply = [float(x) for x in temps]
+        else:
+            reply = [float(temps)]
+
+        return reply
+
+    async def set_control_temperature(
+        self, temperature: float | None = None, temperature_id: int = -1
+    ) -> None:
+        """
+        Set the control temperature (set point).
+
+        Args:
+            temperature: control temperature in Celsius. If not specified, use saved value
+            temperature_id: control temperature sensor number
+        """
+
+        if temperature is None:
+            temperature = "None"
+
+        return await self.command(
+            f"set_control_temperature {temperature} {temperature_id}"
+        )
+
+    async def get_control_temperature(self, temperature_id: int = -1) -> float:
+        """
+        Get the control temperature (set point).
+
+        Args:
+            temperature_id: temperature sensor identifier
+        """
+
+        temp = await self.command(f"get_control_temperature {temperature_id}")
+
+        return float(temp)
+
+    async def get_pressures(self) -> list[float]:
+        """
+        Return a list of all instrument pressures.
+        """
+
+        reply = await self.command(f"instrument.get_pressures")
+        if type(reply) == str:
+            reply = reply.split(" ")
+
+        return [float(x) for x in reply]
+
+    # *************************************************************************
+    #   exposures
+    # *************************************************************************
+
+    async def expose(self, exposure_time: float, imagetype: str = "", title: str = ""):
+        """
+        Make a complete exposure.
+
+        Args:
+            exposure_time: exposure time in seconds
+            imagetype: type of exposure ('zero', 'object', 'flat', ...)
+            title: image title.
+        """
+
+        return await self.command(f"expose {exposure_time} {imagetype} {title}")
+
+    async def expose1(
+        self, exposure_time: float, image_type: str = "", image_title: str = ""
+    ):
+        """
+        Make a complete exposure with immediate return to caller.
+
+        Args:
+            exposure_time: exposure time in seconds
+            image_type: type of exposure ('zero', 'object', 'flat', ...)
+            image_title: image title, usually surrounded by double quotes
+        """
+
+        return await self.command(f"expose1 {exposure_time} {image_type} {image_title}")
+
+    async def sequence(
+        self, number_exposures: int = 1, flush_array_flag: int = -1, delay: float = -1
+    ):
+        """
+        Take an exposure sequence.
+        Uses pre-set exposure time, image type and image title.
+
+        Args:
+            number_exposures: number of exposures to make.
+            flush_array_flag: defines detector flushing, see API.sequence()
+            delay: delay between exposures in seconds
+        """
+
+        return await self.command(
+            f"sequence {number_exposures} {flush_array_flag} {delay}"
+        )
+
+    async def sequence1(
+        self, number_exposures: int = 1, flush_array_flag: int = -1, delay: float = -1
+    ):
+        """
+        Take an exposure sequence with immediate return to caller.
+
+        Args:
+            number_exposures: number of exposures to make.
+            flush_array_flag: defines detector flushing, see API.sequence()
+            delay: delay between exposures in seconds
+        """
+
+        return await self.command(
+            f"sequence1 {number_exposures} {flush_array_flag} {delay}"
+        )
+
+    async def test(self, exposure_time: float = 0.0, shutter: int = 0):
+        """
+        Make a test exposure.
+
+        Args:
+            exposure_time: exposure time in seconds
+            shutter: 0 for closed and 1 for open
+        """
+
+        return await self.command(f"test {exposure_time} {shutter}")
+
+    async def flush(self, cycles: int = 1):
+        """
+        Flush/clear sensor.
+
+        Args:
+            cycles: number of times to flush the sensor
+        """
+
+        return await self.command(f"flush {cycles}")
+
+    async def abort(self):
+        """
+        Abort an operation in progress.
+        """
+
+        return await self.command(f"abort")
+
+    async def pause(self):
+        """
+        Pause an exposure inegration (only) in progress.
+        """
+
+        return await self.command(f"pause")
+
+    async def resume(self):
+        """
+        Resume a paused exposure.
+        """
+
+        return await self.command(f"resume")
+
+    async def set_shutter(self, state: int = 0, shutter_id: int = 0):
+        """
+        Open or close a shutter.
+
+        Args:
+            state: 1 to open shutter or 0 to close
+            shutter_id: shutter ID flag
+        """
+
+        return await self.command(f"set_shutter {state} {shutter_id}")
+
+    async def get_exposuretime(self) -> float:
+        """
+        Return current exposure time in seconds.
+        """
+
+        reply = await self.command(f"get_exposuretime")
+
+        return float(reply)
+
+    async def set_exposuretime(self, exposure_time: float):
+        """
+        Set current exposure time.
+
+        Args:
+            exposure_time: exposure time in seconds.
+        """
+
+        return await self.command(f"set_exposuretime {exposure_time}")
+
+    async def get_exposuretime_remaining(self) -> float:
+        """
+        Return remaining exposure time in seconds.
+        """
+
+        reply = await self.command(f"get_exposuretime_remaining")
+
+        return float(reply)
+
+    async def get_pixels_remaining(self) -> int:
+        """
+        Return number of remaining pixels to be read (counts down).
+        """
+
+        reply = await self.command(f"get_pixels_remaining")
+
+        return int(reply)
+
+    async def get_exposureflag(self):
+        """
+        Return the current exposure flag.
+        """
+
+        return await self.command(f"exposure.get_exposureflag")
+
+    async def get_filename(self) -> str:
+        """
+        Return the current exposure image filename.
+        """
+
+        return await self.command(f"exposure.get_filename")
+
+    async def exposure_events(
+        self, active_interval: float = 0.25, idle_interval: float = 0.1
+    ) -> typing.AsyncIterator[ExposureEvent]:
+        """
+        Async generator which yields exposure state and progress events when the state
+        changes. Each poll is one command, the exposure flag while idle or the exposure
+        status during an exposure, and a change between the two is polled again at once.
+
+        Args:
+            active_interval: poll interval in seconds while an exposure is in progress
+            idle_interval: poll interval in seconds when idle
+
+        Usage:
+            async for event in api.exposure_events():
+                print(event.exposurestate, event.progress)
+        """
+
+        latest = None
+        command = EXPOSURE_FLAG_COMMAND
+        repolled = False
+        while True:
+            try:
+                reply = await self.command(command)
+            except azcam.exceptions.AzcamError as e:
+                reply = e
+
+            event = make_exposure_event(command, reply)
+            if event is not None and event.changed(latest):
+                latest = event
+                yield event
+
+            # state changed between idle and in progress, poll again at once
+            poll_command = next_poll_command(event)
+            if poll_command != command and not repolled:
+                command, repolled = poll_command, True
+                continue
+            command, repolled = poll_command, False
+
+            if latest.exposureflag > 0:
+                await asyncio.sleep(active_interval)
+            else:
+                await asyncio.sleep(idle_interval)
+
+    async def get_status(self) -> dict:
+        """
+        Return a variety of system status data in one dictionary.
+        """
+
+        reply = await self.command(f"get_status")
+
+        return json.loads(reply)
+
+    async def get_status_snapshot(self) -> StatusSnapshot:
+        """
+        Return exposure state and progress, filename, and temperatures from "get_status",
+        with pressures, wavelength, and filter from three instrument commands.
+        The four commands are sent on one connection, one round trip each.
+        """
+
+        return make_status_snapshot(await self.command_batch(STATUS_SNAPSHOT_COMMANDS))
+
+    async def set_filename(self, filename: str):
+        """
+        Set the filename components based on a simple filename.
+
+        Args:
+            filename: complete filename to be set
+        """
+
+        return await self.command(f"set_filename {filename}")
+
+    async def set_image_title(self, title: str):
+        """
+        Set the image title.
+
+        Args:
+            title: image title
+        """
+
+        title = azcam.utils.quoter(title)
+
+        return await self.command(f"set_image_title {title}")
+
+    async def get_image_title(self):
+        """
+        Return the image title.
+        """
+
+        reply = await self.command(f"get_image_title")
+
+        if type(reply) == list:
+            reply = " ".join(reply)
+
+        return reply
+
+    async def set_image_type(self, imagetype: str = "zero"):
+        """
+        Set image type for an exposure.
+
+        Args:
+            imagetype: system defined, and typically includes: zero, object, dark, flat.
+        """
+
+        return await self.command(f"set_image_type {imagetype}")
+
+    async def get_image_type(self) -> str:
+        """
+        Get current image type for an exposure.
+        """
+
+        return await self.command(f"get_image_type")
+
+    async def get_roi(self, roi_num: int = 0) -> list:
+        """
+        Returns a list of the ROI parameters for the roi_num specified.
+
+        Args:
+            roi_num: ROI number to return
+        """
+
+        reply = await self.command(f"get_roi {roi_num}")
+
+        return [int(x) for x in reply]
+
+    async def set_roi(
+        self,
+        first_col: int = -1,
+        last_col: int = -1,
+        first_row: int = -1,
+        last_row: int = -1,
+        col_bin: int = -1,
+        row_bin: int = -1,
+        roi_num: int = 0,
+    ):
+        """
+        Sets the ROI values for subsequent exposures.
+        All values are in unbinned coordinates.
+        """
+
+        return await self.command(
+            f"set_roi {first_col} {last_col} {first_row} {last_row} {col_bin} {row_bin} {roi_num}"
+        )
+
+    async def roi_reset(self):
+        """
+        Resets detector ROI values to full frame, current binning.
+        """
+
+        return await self.command(f"roi_reset")
+
+    # *************************************************************************
+    #   instruments
+    # *************************************************************************
+
+    async def get_filters(self, filter_id=0):
+        """
+        Return a list of all available/loaded filters.
+        """
+
+        return await self.command(f"get_filters {filter_id}")
+
+    async def set_filter(self, filter_name: str, filter_id: int = 0):
+        """
+        Set instrument filter position.
+
+        Args:
+            filter_name: filter value to set
+            filter_id: filter ID flag
+        """
+
+        return await self.command(f"set_filter {filter_name} {filter_id}")
+
+    async def get_filter(self, filter_id: int = 0) -> str:
+        """
+        Get instrument filter position.
+
+        Args:
+            filter_id: filter ID flag
+        """
+
+        return await self.command(f"get_filter {filter_id}")
+
+    async def set_wavelength(
+        self, wavelength: float, wavelength_id: int = 0, nd: int = -1
+    ):
+        """
+        Set wavelength.
+
+        Args:
+            wavelength: wavelength value, may be a string such as 'clear' or 'dark'
+            wavelength_id: wavelength ID flag
+            nd: neutral density value to set
+        """
+
+        return await self.command(f"set_wavelength {wavelength} {wavelength_id}")
+
+    async def get_wavelength(self, wavelength_id: int = 0) -> float:
+        """
+        Get instrument wavelength.
+
+        Args:
+            wavelength_id: wavelength ID flag
+        """
+
+        reply = float(await self.command(f"get_wavelength {wavelength_id}"))
+
+        return reply
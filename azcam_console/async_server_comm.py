@@ -0,0 +1,282 @@
+"""
+Class to communicate with azcamserver using asyncio.
+"""
+
+import asyncio
+import time
+
+import azcam
+import azcam.exceptions
+from azcam_console.command_stats import CommandStats
+from azcam_console.server_comm import parse_reply, tokenize_reply
+
+
+class AsyncServerCommunication(object):
+    """
+    asyncio server connection tool for consoles.
+    azcamserver executes the commands of each client connection sequentially, so several
+    connections are opened and each command uses the next free one. This allows up to
+    `number_connections` commands to be in progress at the same time.
+    """
+
+    def __init__(self, number_connections: int = 4) -> None:
+        """
+        Args:
+            number_connections: number of socket connections to open to the server
+        """
+
+        #: number of socket connections to open to the server
+        self.number_connections = number_connections
+
+        #: termination string for commands
+        self.terminator = "\n"
+
+        #: reply timeout in seconds, None for no timeout
+        self.timeout = None
+
+        #: command statistics, set stats.enabled to True to record
+        self.stats = CommandStats()
+
+        self.host = "localhost"
+        self.port = 2402
+        self.connected = False
+
+        # queue of idle (reader, writer) connections, None for a dropped connection
+        # which is reopened when it is next checked out
+        self._connections: asyncio.Queue | None = None
+        self._streams = []
+
+    async def connect(self, host="localhost", port=2402) -> bool:
+        """
+        Open all connections to azcamserver and register each one as a console.
+
+        Returns:
+            True if all connections were opened.
+        """
+
+        self.host = host
+        self.port = port
+
+        await self.close()
+        self._connections = asyncio.Queue()
+
+        for _ in range(self.number_connections):
+            try:
+                connection = await self._open_connection()
+            except (OSError, azcam.exceptions.AzcamError):
+                await self.close()
+                return False
+            self._connections.put_nowait(connection)
+
+        self.connected = True
+
+        return True
+
+    async def close(self) -> None:
+        """
+        Close all connections to azcamserver.
+        """
+
+        for _, writer in self._streams:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass  # never error on close
+
+        self._streams = []
+        self._connections = None
+        self.connected = False
+
+        return
+
+    async def command(self, command: str):
+        """
+        Send a command to azcamserver and return the reply.
+        Waits for a free connection if all connections are busy.
+
+        Returns None, a string, or a list of strings.
+        """
+
+        start = time.perf_counter()
+        reader, writer = await self._checkout()
+        checkout = time.perf_counter()
+        try:
+            reply = await self._exchange(reader, writer, command)
+        except azcam.exceptions.AzcamError:
+            self._drop(reader, writer)
+            self.stats.record(
+                command,
+                time.perf_counter() - checkout,
+                wait_time=checkout - start,
+                error=True,
+            )
+            raise
+        except BaseException:  # cancelled while the reply may be in flight
+            self._drop(reader, writer)
+            raise
+        self._checkin(reader, writer)
+        received = time.perf_counter()
+
+        error = True
+        try:
+            value = parse_reply(command, tokenize_reply(command, reply))
+            error = False
+        finally:
+            self.stats.record(
+                command,
+                received - checkout,
+                time.perf_counter() - received,
+                checkout - start,
+                len(command.encode()) + 1,
+                len(reply.encode()),
+                error,
+            )
+
+        return value
+
+    async def command_batch(self, commands: list[str]) -> list:
+        """
+        Send a list of commands to azcamserver on one connection and return the replies in order.
+        Failed commands return their AzcamError in place of a reply. A communication error
+        or timeout stops the batch and raises AzcamError.
+
+        Args:
+            commands: list of command strings
+
+        Returns:
+            list of replies for each command.
+        """
+
+        replies = []
+
+        start = time.perf_counter()
+        reader, writer = await self._checkout()
+        wait = time.perf_counter() - start
+        try:
+            for command in commands:
+                sent = time.perf_counter()
+                reply = await self._exchange(reader, writer, command)
+                received = time.perf_counter()
+
+                try:
+                    replies.append(parse_reply(command, tokenize_reply(command, reply)))
+                    error = False
+                except azcam.exceptions.AzcamError as e:
+                    replies.append(e)
+                    error = True
+
+                self.stats.record(
+                    command,
+                    received - sent,
+                    time.perf_counter() - received,
+                    wait,
+                    len(command.encode()) + 1,
+                    len(reply.encode()),
+                    error,
+                )
+                wait = 0.0
+        except BaseException:
+            self._drop(reader, writer)
+            raise
+        self._checkin(reader, writer)
+
+        return replies
+
+    async def _open_connection(self) -> tuple:
+        """
+        Open one connection and register it as a console.
+        """
+
+        reader, writer = await asyncio.open_connection(self.host, int(self.port))
+        self._streams.append((reader, writer))
+
+        try:
+            # check if there is a welcome message
+            try:
+                welcome = await asyncio.wait_for(reader.readline(), 0.2)
+                if len(welcome) > 0:
+                    azcam.log(welcome.decode().strip())
+            except asyncio.TimeoutError:
+                pass
+
+            await self._exchange(reader, writer, "register console")
+        except BaseException:
+            self._streams.remove((reader, writer))
+            writer.close()
+            raise
+
+        return reader, writer
+
+    async def _checkout(self) -> tuple:
+        """
+        Return the next idle connection, reopening it if it was dropped.
+        """
+
+        if self._connections is None:
+            raise azcam.exceptions.AzcamError(
+                "could not open connection to server", error_code=2
+            )
+
+        connections = self._connections
+        connection = await connections.get()
+        if connection is not None:
+            return connection
+
+        try:
+            return await self._open_connection()
+        except BaseException as e:
+            if connections is self._connections:
+                connections.put_nowait(None)
+            if isinstance(e, OSError):
+                raise azcam.exceptions.AzcamError(
+                    "could not open connection to server", error_code=2
+                )
+            raise
+
+    def _checkin(self, reader, writer) -> None:
+        """
+        Return an idle connection, connections closed by close() are not returned.
+        """
+
+        if (reader, writer) in self._streams:
+            self._connections.put_nowait((reader, writer))
+
+        return
+
+    def _drop(self, reader, writer) -> None:
+        """
+        Close a connection whose reply state is unknown, such as after a timeout, and
+        leave a slot which is reopened at the next checkout.
+        """
+
+        try:
+            writer.close()
+        except Exception:
+            pass  # never error on close
+
+        if (reader, writer) in self._streams:
+            self._streams.remove((reader, writer))
+            self._connections.put_nowait(None)
+
+        return
+
+    async def _exchange(self, reader, writer, command: str) -> str:
+        """
+        Send one command on a connection and return the raw reply string.
+        """
+
+        try:
+            writer.write(str.encode(command + self.terminator))
+            await writer.drain()
+            reply = await asyncio.wait_for(reader.readline(), self.timeout)
+        except asyncio.TimeoutError:
+            raise azcam.exceptions.AzcamError(f"Command timeout: {command}")
+        except ConnectionError:
+            raise azcam.exceptions.AzcamError("Connection aborted")
+
+        reply = reply.decode()
+        if len(reply) < 2:
+            raise azcam.exceptions.AzcamError("Invalid command response received")
+
+        return reply.rstrip("\r\n")
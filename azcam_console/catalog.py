@@ -0,0 +1,422 @@
+"""
+Persistent SQLite catalog of image sequence headers.
+
+Image files named as sequences (`ptc.0001.fits`, `qe.0012.fits`, ...) are cataloged with
+their path, root name, sequence number, image type, selected header keywords, and
+optional statistics of each extension. Updates are incremental, only files which are
+new or whose modification time or size changed are read again.
+
+Usage:
+    catalog = HeaderCatalog("/data/catalog.sqlite")
+    catalog.update("/data/2024-05-01")
+    firstfile, seq_num = catalog.find_file_in_sequence("ptc.", "/data/2024-05-01/ptc")
+    rows = catalog.files(imagetype="flat", min_exptime=1.0)
+"""
+
+import json
+import os
+import sqlite3
+import time
+import typing
+
+import numpy
+
+import azcam
+import azcam.utils
+import azcam.exceptions
+from azcam_console.fits_mmap import MappedFits
+from azcam_console.header_table import read_header
+from azcam_console.sequence_index import SequenceIndex
+
+# header keywords stored for each file
+CATALOG_KEYWORDS = [
+    "IMAGETYP",
+    "OBJECT",
+    "DATE-OBS",
+    "UT",
+    "EXPTIME",
+    "CAMTEMP",
+    "DEWTEMP",
+    "WAVLNGTH",
+    "FILTER",
+    "CCDBIN1",
+    "CCDBIN2",
+    "NEXTEND",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    root TEXT NOT NULL,
+    sequence INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    imagetype TEXT,
+    exptime REAL,
+    camtemp REAL,
+    wavelength REAL,
+    keywords TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_sequence ON files (folder, root, sequence);
+CREATE INDEX IF NOT EXISTS files_imagetype ON files (imagetype);
+CREATE TABLE IF NOT EXISTS extensions (
+    path TEXT NOT NULL REFERENCES files (path) ON DELETE CASCADE,
+    extension INTEGER NOT NULL,
+    mean REAL,
+    sdev REAL,
+    minimum REAL,
+    maximum REAL,
+    PRIMARY KEY (path, extension)
+);
+"""
+
+
+class HeaderCatalog(object):
+    """
+    SQLite catalog of image sequence files, keywords, and extension statistics.
+    """
+
+    def __init__(
+        self, database: str = "azcam_catalog.sqlite", keywords: list | None = None
+    ) -> None:
+        """
+        Args:
+            database: SQLite database filename, created if needed
+            keywords: header keywords to store, None for CATALOG_KEYWORDS
+        """
+
+        #: SQLite database filename
+        self.database = database
+
+        #: header keywords stored for each file
+        self.keywords = CATALOG_KEYWORDS if keywords is None else keywords
+
+        #: True to store statistics of each extension, which reads image data
+        self.statistics = True
+
+        self._connection = sqlite3.connect(database)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the catalog database.
+        """
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+        return
+
+    def update(self, folder: str | None = None, recursive: bool = True) -> int:
+        """
+        Catalog new and changed image sequence files of a folder and remove files
+        which no longer exist.
+
+        Args:
+            folder: folder to catalog, None for the current folder
+            recursive: True to include all subfolders
+
+        Returns:
+            number of files added or updated
+        """
+
+        if folder is None:
+            folder = azcam.utils.curdir()
+        folder = azcam.utils.fix_path(os.path.abspath(folder))
+
+        if recursive:
+            folders = [azcam.utils.fix_path(f) for f, _, _ in os.walk(folder)]
+        else:
+            folders = [folder]
+
+        count = 0
+        for f in folders:
+            count += self._update_folder(f)
+
+        if recursive:
+            self._remove_folders(folder, folders)
+
+        return count
+
+    def files(
+        self,
+        folder: str | None = None,
+        root: str | None = None,
+        imagetype: str | None = None,
+        min_exptime: float | None = None,
+        max_exptime: float | None = None,
+    ) -> list[dict]:
+        """
+        Return cataloged files matching all specified values, sorted by folder, root,
+        and sequence number.
+
+        Args:
+            folder: folder, subfolders are not included
+            root: image file root name, such as "ptc."
+            imagetype: image type, case is ignored
+            min_exptime: minimum exposure time
+            max_exptime: maximum exposure time
+
+        Returns:
+            list of {column: value} with "keywords" as a dict
+        """
+
+        conditions = []
+        params = []
+        if folder is not None:
+            conditions.append("folder = ?")
+            params.append(azcam.utils.fix_path(os.path.abspath(folder)))
+        if root is not None:
+            conditions.append("root = ?")
+            params.append(root)
+        if imagetype is not None:
+            conditions.append("lower(imagetype) = ?")
+            params.append(imagetype.lower())
+        if min_exptime is not None:
+            conditions.append("exptime >= ?")
+            params.append(min_exptime)
+        if max_exptime is not None:
+            conditions.append("exptime <= ?")
+            params.append(max_exptime)
+
+        sql = "SELECT * FROM files"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY folder, root, sequence"
+
+        rows = []
+        for row in self._connection.execute(sql, params):
+            row = dict(row)
+            row["keywords"] = json.loads(row["keywords"])
+            rows.append(row)
+
+        return rows
+
+    def sequence(self, root: str, folder: str | None = None) -> list[tuple[int, str]]:
+        """
+        Return the cataloged files of a sequence sorted by sequence number,
+        as SequenceIndex.sequence().
+
+        Args:
+            root: image file root name
+            folder: folder of the sequence, None for the current folder
+
+        Returns:
+            list of (sequence number, filename)
+        """
+
+        if folder is None:
+            folder = azcam.utils.curdir()
+        folder = azcam.utils.fix_path(os.path.abspath(folder))
+
+        rows = self._connection.execute(
+            "SELECT sequence, path FROM files WHERE folder = ? AND root = ? "
+            "ORDER BY sequence",
+            (folder, root),
+        )
+
+        return [(row["sequence"], row["path"]) for row in rows]
+
+    def find_file_in_sequence(
+        self, root: str, folder: str | None = None, file_number: int = 1
+    ) -> tuple:
+        """
+        Returns the Nth file in a cataloged image sequence where N is file_number
+        (1 for first file), as azcam_console.utils.find_file_in_sequence().
+
+        Args:
+            root: image file root name
+            folder: folder of the sequence, None for the current folder
+            file_number: image file number in sequence
+
+        Returns:
+            tuple (filename,sequencenumber).
+        """
+
+        sequence = dict(self.sequence(root, folder))
+        if len(sequence) == 0:
+            raise azcam.exceptions.AzcamError("image sequence not found")
+
+        sequencenumber = min(sequence) + file_number - 1
+        if sequencenumber not in sequence:
+            raise azcam.exceptions.AzcamError("image not found in sequence")
+
+        return (sequence[sequencenumber], sequencenumber)
+
+    def get_keyword(self, filename: str, keyword: str) -> typing.Any:
+        """
+        Return a cataloged keyword value of a file.
+
+        Args:
+            filename: image filename
+            keyword: keyword name
+        """
+
+        filename = azcam.utils.fix_path(
+            os.path.abspath(azcam.utils.make_image_filename(filename))
+        )
+        row = self._connection.execute(
+            "SELECT keywords FROM files WHERE path = ?", (filename,)
+        ).fetchone()
+        if row is None:
+            raise azcam.exceptions.AzcamError(f"file not in catalog: {filename}")
+
+        return json.loads(row["keywords"])[keyword]
+
+    def get_statistics(self, filename: str) -> list[dict]:
+        """
+        Return the cataloged statistics of each extension of a file.
+
+        Args:
+            filename: image filename
+
+        Returns:
+            list of {"extension", "mean", "sdev", "minimum", "maximum"}
+        """
+
+        filename = azcam.utils.fix_path(
+            os.path.abspath(azcam.utils.make_image_filename(filename))
+        )
+        rows = self._connection.execute(
+            "SELECT extension, mean, sdev, minimum, maximum FROM extensions "
+            "WHERE path = ? ORDER BY extension",
+            (filename,),
+        )
+
+        return [dict(row) for row in rows]
+
+    def _update_folder(self, folder: str) -> int:
+        """
+        Catalog one folder without subfolders, returns the number of files updated.
+        """
+
+        index = SequenceIndex(folder, read_headers=False)
+
+        cataloged = {
+            row["path"]: (row["mtime_ns"], row["size"])
+            for row in self._connection.execute(
+                "SELECT path, mtime_ns, size FROM files WHERE folder = ?", (folder,)
+            )
+        }
+
+        count = 0
+        with self._connection:
+            for root in index.roots():
+                for number, filename in index.sequence(root):
+                    stat = os.stat(filename)
+                    file_id = (stat.st_mtime_ns, stat.st_size)
+                    if cataloged.pop(filename, None) == file_id:
+                        continue
+
+                    # a file which fails is not partially cataloged and is read again
+                    # at the next update
+                    self._connection.execute("SAVEPOINT add_file")
+                    try:
+                        self._add_file(folder, root, number, filename, file_id)
+                        count += 1
+                    except Exception as e:
+                        self._connection.execute("ROLLBACK TO add_file")
+                        azcam.log(f"could not catalog {filename}: {e}")
+                    self._connection.execute("RELEASE add_file")
+
+            # remove files which no longer exist
+            self._connection.executemany(
+                "DELETE FROM files WHERE path = ?", [(p,) for p in cataloged]
+            )
+
+        return count
+
+    def _remove_folders(self, folder: str, visited: list) -> None:
+        """
+        Remove the files of a folder and its subfolders which were not visited by
+        an update, such as folders which were deleted.
+        """
+
+        prefix = folder.rstrip("/") + "/"
+        rows = self._connection.execute(
+            "SELECT DISTINCT folder FROM files "
+            "WHERE folder = ? OR substr(folder, 1, ?) = ?",
+            (folder, len(prefix), prefix),
+        )
+        visited = set(visited)
+        removed = [(row["folder"],) for row in rows if row["folder"] not in visited]
+
+        with self._connection:
+            self._connection.executemany("DELETE FROM files WHERE folder = ?", removed)
+
+        return
+
+    def _add_file(
+        self, folder: str, root: str, number: int, filename: str, file_id: tuple
+    ) -> None:
+        """
+        Add or replace one file in the catalog.
+        """
+
+        header = read_header(filename)
+        keywords = {}
+        for keyword in self.keywords:
+            value = header.get(keyword)
+            if value is not None and not isinstance(value, (bool, int, float, str)):
+                value = str(value)
+            keywords[keyword] = value
+
+        self._connection.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                filename,
+                folder,
+                root,
+                number,
+                file_id[0],
+                file_id[1],
+                header.get("IMAGETYP"),
+                _float(header.get("EXPTIME")),
+                _float(header.get("CAMTEMP")),
+                _float(header.get("WAVLNGTH")),
+                json.dumps(keywords),
+                time.time(),
+            ),
+        )
+
+        self._connection.execute("DELETE FROM extensions WHERE path = ?", (filename,))
+        if self.statistics:
+            with MappedFits(filename) as image:
+                _, first_ext, last_ext = image.get_extensions()
+                for ext in range(first_ext, last_ext):
+                    data = image.section(ext, dtype="float64")
+                    self._connection.execute(
+                        "INSERT INTO extensions VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            filename,
+                            ext,
+                            float(data.mean()),
+                            float(data.std()),
+                            float(numpy.min(data)),
+                            float(numpy.max(data)),
+                        ),
+                    )
+
+        return
+
+
+def _float(value) -> float | None:
+    """
+    Return a keyword value as float or None.
+    """
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,269 @@
+"""
+Out-of-core combination of image stacks.
+
+Frames are memory-mapped and combined in tiles of rows sized to a memory budget, so
+stacks which do not fit in memory can be combined and each frame is read only once.
+The combined image and the per-pixel mean, median, and standard deviation images of
+the stack are made in the same pass.
+
+Usage:
+    result = combine(bias_filenames, "superbias.fits", "median", statistics=True)
+    noise_image = result.sdev[0]  # first extension
+"""
+
+import dataclasses
+import time
+import warnings
+
+import numpy
+from astropy.io import fits as pyfits
+
+import azcam
+import azcam.utils
+import azcam.fits
+import azcam.exceptions
+from azcam_console.fits_mmap import MappedFits
+
+
+@dataclasses.dataclass
+class CombineResult:
+    """
+    Combined image and stack statistics images, one [rows, cols] array per extension.
+    Statistics which were not made are None.
+    """
+
+    #: first image extension of the frames
+    first_ext: int
+    #: combined data
+    combined: list
+    #: headers of the first frame with combination history, one per HDU
+    headers: list | None = None
+    #: mean of all frames
+    mean: list | None = None
+    #: median of all frames
+    median: list | None = None
+    #: standard deviation of all frames
+    sdev: list | None = None
+
+
+def combine(
+    file_list: list,
+    out_filename: str | None = "combined.fits",
+    combination_type: str = "median",
+    datatype: str = "float32",
+    statistics: bool = False,
+    memory_bytes: int = 2**28,
+    sigma: float = 3.0,
+    iterations: int = 3,
+) -> CombineResult:
+    """
+    Make a combination image from a list of FITS filenames, as azcam.fits.combine()
+    without overscan correction.
+
+    Args:
+        file_list: list of filenames to combine
+        out_filename: output filename, None to not write the combined image
+        combination_type: combination type, "median", "mean", "sum", or "sigmaclip"
+            (mean after iterative rejection of values more than sigma from the median)
+        datatype: data type of the output image
+        statistics: True to also make mean, median, and sdev images of the stack
+        memory_bytes: approximate maximum memory used for stack data in bytes
+        sigma: rejection limit in standard deviations for "sigmaclip"
+        iterations: maximum number of rejection iterations for "sigmaclip"
+
+    Returns:
+        combined image and statistics images
+    """
+
+    if combination_type not in ["median", "mean", "sum", "sigmaclip"]:
+        raise azcam.exceptions.AzcamError(
+            f"invalid combination type: {combination_type}"
+        )
+
+    numfiles = len(file_list)
+    if numfiles < 2:
+        raise azcam.exceptions.AzcamError("two or more images are required")
+
+    images = [MappedFits(f) for f in file_list]
+    try:
+        numexts, first_ext, last_ext = images[0].get_extensions()
+        for image in images[1:]:
+            if image.get_extensions() != [numexts, first_ext, last_ext]:
+                raise azcam.exceptions.AzcamError("unequal FITS image extensions")
+
+        result = CombineResult(first_ext, [])
+        if statistics:
+            result.mean = []
+            result.median = []
+            result.sdev = []
+
+        for ext in range(first_ext, last_ext):
+            _combine_extension(
+                images,
+                ext,
+                result,
+                combination_type,
+                statistics,
+                memory_bytes,
+                sigma,
+                iterations,
+            )
+
+        result.headers = [images[0].header(ext).copy() for ext in range(0, last_ext)]
+        _add_history(
+            result.headers[0],
+            "COMBINED Data was %s combined from %d images"
+            % (combination_type, numfiles),
+        )
+
+        if out_filename is not None:
+            write_image(out_filename, result.headers, result.combined, datatype)
+    finally:
+        for image in images:
+            image.close()
+
+    return result
+
+
+def _combine_extension(
+    images: list,
+    ext: int,
+    result: CombineResult,
+    combination_type: str,
+    statistics: bool,
+    memory_bytes: int,
+    sigma: float,
+    iterations: int,
+) -> None:
+    """
+    Combine one extension of all images in tiles of rows and append to result.
+    """
+
+    rows, cols = images[0].shape(ext)
+    for image in images[1:]:
+        if image.shape(ext) != (rows, cols):
+            raise azcam.exceptions.AzcamError("unequal FITS image sizes")
+
+    # rows per tile, allowing for temporary copies made by median and std
+    tile_rows = memory_bytes // (len(images) * cols * 4 * 3)
+    tile_rows = max(1, min(rows, tile_rows))
+
+    combined = numpy.empty((rows, cols), dtype="float64")
+    if statistics:
+        mean = numpy.empty((rows, cols), dtype="float32")
+        median = numpy.empty((rows, cols), dtype="float32")
+        sdev = numpy.empty((rows, cols), dtype="float32")
+
+    tile = numpy.empty((len(images), tile_rows, cols), dtype="float32")
+    for row1 in range(0, rows, tile_rows):
+        row2 = min(rows, row1 + tile_rows)
+        stack = tile[:, : row2 - row1]
+        for i, image in enumerate(images):
+            stack[i] = image.section(ext, [row1, row2, 0, cols])
+
+        tile_median = None
+        if combination_type == "median" or statistics:
+            tile_median = numpy.median(stack, axis=0)
+
+        if combination_type == "median":
+            combined[row1:row2] = tile_median
+        elif combination_type == "mean":
+            combined[row1:row2] = stack.mean(axis=0)
+        elif combination_type == "sum":
+            combined[row1:row2] = stack.sum(axis=0, dtype="float64")
+        elif combination_type == "sigmaclip":
+            combined[row1:row2] = _sigma_clip_mean(stack, sigma, iterations)
+
+        if statistics:
+            mean[row1:row2] = stack.mean(axis=0)
+            median[row1:row2] = tile_median
+            sdev[row1:row2] = stack.std(axis=0)
+
+    result.combined.append(combined)
+    if statistics:
+        result.mean.append(mean)
+        result.median.append(median)
+        result.sdev.append(sdev)
+
+    return
+
+
+def _sigma_clip_mean(
+    stack: numpy.ndarray, sigma: float, iterations: int
+) -> numpy.ndarray:
+    """
+    Return the mean along the first axis after iterative rejection of values more than
+    sigma standard deviations from the median.
+    """
+
+    data = stack.copy()
+    for _ in range(iterations):
+        center = numpy.nanmedian(data, axis=0)
+        limit = sigma * numpy.nanstd(data, axis=0)
+        reject = numpy.abs(data - center) > limit
+        if not reject.any():
+            break
+        data[reject] = numpy.nan
+
+    with warnings.catch_warnings():  # all values rejected gives nan
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return numpy.nanmean(data, axis=0)
+
+
+def write_image(
+    filename: str,
+    headers: list,
+    data: list,
+    datatype: str = "float32",
+    history: str | None = None,
+) -> None:
+    """
+    Write image data with the layout and headers of a combined image, such as
+    CombineResult.combined or data derived from it.
+
+    Args:
+        filename: output filename
+        headers: headers of all HDUs, as CombineResult.headers
+        data: data of each image extension as [rows, cols]
+        datatype: data type of the output image, values are not clipped
+        history: optional HISTORY text added to the primary header
+    """
+
+    # data are written unscaled in the output data type
+    headers = [h.copy() for h in headers]
+    for header in headers:
+        for keyword in ["BZERO", "BSCALE"]:
+            if keyword in header:
+                del header[keyword]
+
+    if history is not None:
+        _add_history(headers[0], history)
+
+    hdulist = pyfits.HDUList()
+    if len(headers) == 1:
+        hdulist.append(pyfits.PrimaryHDU(data[0].astype(datatype), headers[0]))
+    else:
+        first_ext = len(headers) - len(data)
+        hdulist.append(pyfits.PrimaryHDU(None, headers[0]))
+        for i, extdata in enumerate(data):
+            hdulist.append(
+                pyfits.ImageHDU(extdata.astype(datatype), headers[first_ext + i])
+            )
+
+    with warnings.catch_warnings():  # surpress warning
+        warnings.simplefilter("ignore")
+        hdulist.writeto(azcam.utils.make_image_filename(filename), overwrite=True)
+
+    return
+
+
+def _add_history(header: pyfits.Header, history: str) -> None:
+    """
+    Add a time stamped HISTORY card to a header.
+    """
+
+    header.add_history(
+        time.strftime("%Y/%m/%d %H:%M:%S ", time.gmtime(time.time())) + history
+    )
+
+    return
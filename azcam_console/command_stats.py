@@ -0,0 +1,217 @@
+"""
+Command statistics for server communication.
+"""
+
+import collections
+import json
+import threading
+
+import numpy
+
+import azcam
+
+# histogram bin edges in seconds, 4 bins per decade from 10 us to 1000 s
+HISTOGRAM_EDGES = numpy.logspace(-5, 3, 33)
+
+
+class CommandStats(object):
+    """
+    Per command verb timing and traffic statistics for a server connection.
+    The verb is the first token of a command string, such as "expose", "get_par" or
+    "exposure.read_header".
+
+    Times recorded for each command are:
+        wait: time waiting for a free pooled connection
+        exchange: time from sending the command until the reply is received (network and server)
+        parse: time to tokenize and check the reply
+
+    Totals are kept since the last reset. Histograms and percentiles use the most recent
+    `window` commands of each verb.
+
+    Usage:
+        azcam.db.server.stats.enabled = True
+        ...
+        azcam.db.server.stats.report()
+        azcam.db.server.stats.write_json("stats.json")
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        """
+        Args:
+            window: number of recent commands of each verb used for histograms
+        """
+
+        #: True to record statistics
+        self.enabled = False
+
+        #: number of recent commands of each verb used for histograms
+        self.window = window
+
+        self._verbs = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        command: str,
+        exchange_time: float,
+        parse_time: float = 0.0,
+        wait_time: float = 0.0,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+        error: bool = False,
+    ) -> None:
+        """
+        Record one command.
+
+        Args:
+            command: command string which was sent
+            exchange_time: time in seconds from send until reply received
+            parse_time: time in seconds to parse the reply
+            wait_time: time in seconds waiting for a connection
+            bytes_sent: number of bytes sent
+            bytes_received: number of bytes received
+            error: True if the command failed
+        """
+
+        if not self.enabled:
+            return
+
+        verb = command.split(" ", 1)[0]
+
+        with self._lock:
+            stats = self._verbs.get(verb)
+            if stats is None:
+                stats = {
+                    "count": 0,
+                    "errors": 0,
+                    "bytes_sent": 0,
+                    "bytes_received": 0,
+                    "wait_time": 0.0,
+                    "exchange_time": 0.0,
+                    "parse_time": 0.0,
+                    "min_time": exchange_time,
+                    "max_time": exchange_time,
+                    "recent": collections.deque(maxlen=self.window),
+                }
+                self._verbs[verb] = stats
+
+            stats["count"] += 1
+            stats["errors"] += int(error)
+            stats["bytes_sent"] += bytes_sent
+            stats["bytes_received"] += bytes_received
+            stats["wait_time"] += wait_time
+            stats["exchange_time"] += exchange_time
+            stats["parse_time"] += parse_time
+            stats["min_time"] = min(stats["min_time"], exchange_time)
+            stats["max_time"] = max(stats["max_time"], exchange_time)
+            stats["recent"].append(exchange_time)
+
+        return
+
+    def reset(self) -> None:
+        """
+        Clear all statistics.
+        """
+
+        with self._lock:
+            self._verbs = {}
+
+        return
+
+    def summary(self) -> dict:
+        """
+        Return statistics for each verb.
+
+        Returns:
+            dict of {verb: stats}, with times in seconds.
+        """
+
+        summary = {}
+
+        with self._lock:
+            for verb, stats in self._verbs.items():
+                count = stats["count"]
+                recent = numpy.array(stats["recent"])
+                histogram, _ = numpy.histogram(recent, HISTOGRAM_EDGES)
+                p50, p90, p99 = numpy.percentile(recent, [50, 90, 99])
+
+                summary[verb] = {
+                    "count": count,
+                    "errors": stats["errors"],
+                    "error_rate": stats["errors"] / count,
+                    "bytes_sent": stats["bytes_sent"],
+                    "bytes_received": stats["bytes_received"],
+                    "total_time": stats["wait_time"]
+                    + stats["exchange_time"]
+                    + stats["parse_time"],
+                    "wait_time": stats["wait_time"],
+                    "exchange_time": stats["exchange_time"],
+                    "parse_time": stats["parse_time"],
+                    "mean_time": stats["exchange_time"] / count,
+                    "min_time": stats["min_time"],
+                    "max_time": stats["max_time"],
+                    "p50_time": float(p50),
+                    "p90_time": float(p90),
+                    "p99_time": float(p99),
+                    "histogram": histogram.tolist(),
+                }
+
+        return summary
+
+    def to_json(self) -> str:
+        """
+        Return statistics and histogram bin edges as a JSON string.
+        """
+
+        data = {
+            "histogram_edges": HISTOGRAM_EDGES.tolist(),
+            "commands": self.summary(),
+        }
+
+        return json.dumps(data, indent=2)
+
+    def write_json(self, filename: str = "command_stats.json") -> None:
+        """
+        Write statistics to a JSON file.
+
+        Args:
+            filename: output filename
+        """
+
+        with open(filename, "w") as fout:
+            fout.write(self.to_json())
+
+        return
+
+    def report(self, histograms: bool = False) -> None:
+        """
+        Print statistics for each verb, largest total time first.
+
+        Args:
+            histograms: True to also print the recent time histogram of each verb
+        """
+
+        summary = self.summary()
+        verbs = sorted(summary, key=lambda v: summary[v]["total_time"], reverse=True)
+
+        azcam.log(
+            f"{'Command':<32s} {'Count':>7s} {'Errors':>6s} {'Total[s]':>9s} "
+            f"{'Mean[ms]':>9s} {'p90[ms]':>9s} {'Max[ms]':>9s} {'Sent':>9s} {'Recv':>9s}"
+        )
+        for verb in verbs:
+            s = summary[verb]
+            azcam.log(
+                f"{verb:<32s} {s['count']:>7d} {s['errors']:>6d} {s['total_time']:>9.3f} "
+                f"{1000*s['mean_time']:>9.3f} {1000*s['p90_time']:>9.3f} "
+                f"{1000*s['max_time']:>9.3f} {s['bytes_sent']:>9d} {s['bytes_received']:>9d}"
+            )
+
+            if histograms:
+                for i, count in enumerate(s["histogram"]):
+                    if count == 0:
+                        continue
+                    low = 1000 * HISTOGRAM_EDGES[i]
+                    high = 1000 * HISTOGRAM_EDGES[i + 1]
+                    azcam.log(f"    {low:10.3f} - {high:10.3f} ms: {count}")
+
+        return
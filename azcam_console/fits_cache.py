@@ -0,0 +1,232 @@
+"""
+Shared cache of decoded FITS image data and headers for analysis.
+
+Testers often read the same file many times, such as the bias image used for every
+pair of a PTC sequence. Files are read once and kept in a size bounded, least recently
+used cache shared by the whole process. Entries are keyed by absolute path and are
+reloaded when the file modification time, size, or inode changes, so files rewritten
+in place (for example by azcam.fits.colbias) are never returned stale.
+
+Cached arrays are read-only. Use `.astype()` or `.copy()` before modifying data.
+
+Usage:
+    from azcam_console.fits_cache import fits_cache
+    means = fits_cache.mean("bias.0001.fits", roi)
+    data = fits_cache.get_data("flat.0002.fits", 1).astype("float32")
+"""
+
+import collections
+import os
+import threading
+import typing
+
+import numpy
+from astropy.io import fits as pyfits
+
+import azcam
+import azcam.utils
+import azcam.fits
+
+
+class FitsCache(object):
+    """
+    Size bounded LRU cache of FITS headers and decoded extension data.
+    """
+
+    def __init__(self, max_bytes: int = 2**30) -> None:
+        """
+        Args:
+            max_bytes: maximum size of cached data in bytes
+        """
+
+        #: True to cache data, False to read files on every call
+        self.enabled = True
+
+        #: maximum size of cached data in bytes, least recently used files are removed first
+        self.max_bytes = max_bytes
+
+        #: number of reads satisfied from the cache
+        self.hits = 0
+
+        #: number of reads which decoded a file
+        self.misses = 0
+
+        # {path: (file_id, headers, data, nbytes)}
+        self._entries = collections.OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def read(self, filename: str) -> tuple:
+        """
+        Return the headers and data of all HDUs in a file, from the cache if valid.
+
+        Args:
+            filename: image filename
+
+        Returns:
+            tuple of (headers, data) lists indexed by HDU number. data items are
+            read-only arrays or None for HDUs without data.
+        """
+
+        filename = os.path.abspath(azcam.utils.make_image_filename(filename))
+        stat = os.stat(filename)
+        file_id = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is not None and entry[0] == file_id:
+                self._entries.move_to_end(filename)
+                self.hits += 1
+                return entry[1], entry[2]
+
+        headers = []
+        data = []
+        with pyfits.open(filename, memmap=False) as hdulist:
+            for hdu in hdulist:
+                headers.append(hdu.header.copy())
+                d = hdu.data
+                if d is not None:
+                    d = numpy.asarray(d)
+                    d.flags.writeable = False
+                data.append(d)
+        nbytes = sum(d.nbytes for d in data if d is not None)
+
+        with self._lock:
+            self.misses += 1
+            self._remove(filename)
+            if self.enabled and nbytes <= self.max_bytes:
+                self._entries[filename] = (file_id, headers, data, nbytes)
+                self._nbytes += nbytes
+                while self._nbytes > self.max_bytes:
+                    self._remove(next(iter(self._entries)))
+
+        return headers, data
+
+    def get_data(self, filename: str, extension: int = 0) -> numpy.ndarray:
+        """
+        Return the read-only data array of one extension.
+
+        Args:
+            filename: image filename
+            extension: extension number
+        """
+
+        return self.read(filename)[1][extension]
+
+    def get_header(self, filename: str, extension: int = 0) -> pyfits.Header:
+        """
+        Return the header of one extension.
+
+        Args:
+            filename: image filename
+            extension: extension number
+        """
+
+        return self.read(filename)[0][extension]
+
+    def get_keyword(
+        self, filename: str, keyword: str, extension: int = 0
+    ) -> typing.Any:
+        """
+        Return a header keyword value, as azcam.fits.get_keyword().
+
+        Args:
+            filename: image filename
+            keyword: keyword name
+            extension: extension number
+        """
+
+        return self.get_header(filename, extension)[keyword]
+
+    def get_extensions(self, filename: str) -> list:
+        """
+        Return the number of image extensions and their indices, as azcam.fits.get_extensions().
+
+        Args:
+            filename: image filename
+
+        Returns:
+            list of [number_exts, first_ext, last_ext]
+        """
+
+        header = self.get_header(filename, 0)
+        if "NEXTEND" in header:
+            num_ext = header["NEXTEND"]
+            first_ext = 0 if num_ext == 0 else 1
+            last_ext = num_ext + 1
+        else:
+            num_ext = 0
+            first_ext = 0
+            last_ext = 1
+
+        return [num_ext, first_ext, last_ext]
+
+    def mean(self, filename: str, roi: list = []) -> list:
+        """
+        Return the mean of an image ROI in every extension, as azcam.fits.mean().
+
+        Args:
+            filename: image filename
+            roi: Region-Of-Interest
+        """
+
+        roi = azcam.fits._get_data_roi(roi)
+        _, first_ext, last_ext = self.get_extensions(filename)
+        data = self.read(filename)[1]
+
+        return [
+            data[chan][roi[0] : roi[1], roi[2] : roi[3]].mean()
+            for chan in range(first_ext, last_ext)
+        ]
+
+    def sdev(self, filename: str, roi: list = []) -> list:
+        """
+        Return the standard deviation of an image ROI in every extension,
+        as azcam.fits.sdev().
+
+        Args:
+            filename: image filename
+            roi: Region-Of-Interest
+        """
+
+        roi = azcam.fits._get_data_roi(roi)
+        _, first_ext, last_ext = self.get_extensions(filename)
+        data = self.read(filename)[1]
+
+        return [
+            data[chan][roi[0] : roi[1], roi[2] : roi[3]].std()
+            for chan in range(first_ext, last_ext)
+        ]
+
+    def invalidate(self, filename: str | None = None) -> None:
+        """
+        Remove a file from the cache, or all files if filename is not specified.
+
+        Args:
+            filename: image filename
+        """
+
+        with self._lock:
+            if filename is None:
+                self._entries.clear()
+                self._nbytes = 0
+            else:
+                filename = os.path.abspath(azcam.utils.make_image_filename(filename))
+                self._remove(filename)
+
+        return
+
+    def _remove(self, filename: str) -> None:
+        """
+        Remove an entry, lock must be held.
+        """
+
+        entry = self._entries.pop(filename, None)
+        if entry is not None:
+            self._nbytes -= entry[3]
+
+        return
+
+
+#: process-wide cache used by testers
+fits_cache = FitsCache()
@@ -0,0 +1,138 @@
+"""
+Memory-mapped read access to FITS image data for analysis.
+
+Image data are memory-mapped and never scaled as a whole, so opening a large
+multi-extension file does not copy any amplifier data. Only the sections which are
+actually used are converted, with BZERO and BSCALE applied to the section.
+
+Usage:
+    with MappedFits("flat.0002.fits") as image:
+        roi_data = image.section(1, [100, 400, 50, 450])  # float32 copy of the ROI
+"""
+
+import numpy
+from astropy.io import fits as pyfits
+
+import azcam
+import azcam.utils
+
+
+class MappedFits(object):
+    """
+    Read-only memory-mapped FITS file.
+    """
+
+    def __init__(self, filename: str) -> None:
+        """
+        Args:
+            filename: image filename
+        """
+
+        #: image filename
+        self.filename = azcam.utils.make_image_filename(filename)
+
+        self._hdulist = pyfits.open(
+            self.filename, memmap=True, do_not_scale_image_data=True
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the file. Views returned by view() are not valid after closing.
+        """
+
+        if self._hdulist is not None:
+            self._hdulist.close()
+            self._hdulist = None
+
+        return
+
+    def header(self, extension: int = 0) -> pyfits.Header:
+        """
+        Return the header of an extension.
+
+        Args:
+            extension: extension number
+        """
+
+        return self._hdulist[extension].header
+
+    def get_extensions(self) -> list:
+        """
+        Return the number of image extensions and their indices, as azcam.fits.get_extensions().
+
+        Returns:
+            list of [number_exts, first_ext, last_ext]
+        """
+
+        header = self.header(0)
+        if "NEXTEND" in header:
+            num_ext = header["NEXTEND"]
+            first_ext = 0 if num_ext == 0 else 1
+            last_ext = num_ext + 1
+        else:
+            num_ext = 0
+            first_ext = 0
+            last_ext = 1
+
+        return [num_ext, first_ext, last_ext]
+
+    def shape(self, extension: int) -> tuple:
+        """
+        Return the image shape of an extension as (rows, cols).
+
+        Args:
+            extension: extension number
+        """
+
+        header = self.header(extension)
+
+        return (header["NAXIS2"], header["NAXIS1"])
+
+    def view(self, extension: int) -> numpy.ndarray:
+        """
+        Return a zero-copy view of the raw stored data of an extension as [rows, cols].
+        BZERO and BSCALE are not applied.
+
+        Args:
+            extension: extension number
+        """
+
+        return self._hdulist[extension].data
+
+    def section(
+        self, extension: int, roi: list | None = None, dtype: str = "float32"
+    ) -> numpy.ndarray:
+        """
+        Return a converted copy of an image section with BZERO and BSCALE applied.
+
+        Args:
+            extension: extension number
+            roi: zero-based numpy section [first_row, last_row, first_col, last_col],
+                last values are exclusive as for slices. None for the entire extension.
+            dtype: data type of the returned array
+
+        Returns:
+            section data as [rows, cols]
+        """
+
+        data = self.view(extension)
+        if roi is not None:
+            data = data[roi[0] : roi[1], roi[2] : roi[3]]
+
+        header = self.header(extension)
+        bscale = header.get("BSCALE", 1)
+        bzero = header.get("BZERO", 0)
+
+        data = data.astype(dtype)
+        if bscale != 1:
+            data *= bscale
+        if bzero != 0:
+            data += bzero
+
+        return data
@@ -0,0 +1,216 @@
+"""
+Bulk extraction of header keywords from many image files.
+
+Only the header blocks of each file are read, image data is never decoded. Files are
+read in parallel threads and keyword values are returned as a columnar table of numpy
+arrays, one array per keyword in file order.
+
+Usage:
+    table = read_sequence_table("itl.", 1, ["UT", "EXPTIME", "CAMTEMP"])
+    seconds = time_to_seconds(table["UT"])
+    exptimes = table["EXPTIME"]  # float64 array
+"""
+
+import concurrent.futures
+import os
+
+import numpy
+from astropy.io import fits as pyfits
+
+import azcam
+import azcam.utils
+import azcam.exceptions
+from azcam_console.sequence_index import SequenceIndex
+
+# FITS header block size in bytes
+_BLOCK_SIZE = 2880
+
+
+def read_header(filename: str, extension: int = 0) -> pyfits.Header:
+    """
+    Read one header of an image file without reading any image data.
+
+    Args:
+        filename: image filename
+        extension: extension number
+
+    Returns:
+        header
+    """
+
+    filename = azcam.utils.make_image_filename(filename)
+
+    if extension != 0:
+        return pyfits.getheader(filename, extension)
+
+    # read primary header blocks up to the END card
+    blocks = []
+    with open(filename, "rb") as f:
+        while True:
+            block = f.read(_BLOCK_SIZE)
+            if len(block) < _BLOCK_SIZE:
+                raise azcam.exceptions.AzcamError(
+                    f"FITS header END not found: {filename}"
+                )
+            blocks.append(block)
+            if _has_end_card(block):
+                break
+
+    return pyfits.Header.fromstring(b"".join(blocks).decode("ascii", "replace"))
+
+
+def read_header_table(
+    filenames: list[str],
+    keywords: list[str],
+    extension: int = 0,
+    types: dict | None = None,
+    number_threads: int = 8,
+) -> dict[str, numpy.ndarray]:
+    """
+    Read keyword values from many files into a columnar table.
+
+    Values are converted to a common type for each keyword: bool, int64, float64
+    (missing values are NaN), or str (missing values are ""). Use types to force
+    a type for a keyword.
+
+    Args:
+        filenames: image filenames
+        keywords: keyword names
+        extension: extension number of the header to read
+        types: optional {keyword: type} such as {"CAMTEMP": float}
+        number_threads: maximum number of threads reading headers
+
+    Returns:
+        {keyword: numpy array} with one value per file in file order and
+        "filename" with the filenames.
+    """
+
+    filenames = [azcam.utils.make_image_filename(f) for f in filenames]
+    types = {} if types is None else types
+
+    def read(filename):
+        header = read_header(filename, extension)
+        return [header.get(keyword) for keyword in keywords]
+
+    number_threads = max(1, min(number_threads, len(filenames)))
+    with concurrent.futures.ThreadPoolExecutor(number_threads) as executor:
+        rows = list(executor.map(read, filenames))
+
+    table = {"filename": numpy.array(filenames, dtype=str)}
+    for col, keyword in enumerate(keywords):
+        values = [row[col] for row in rows]
+        table[keyword] = _make_column(values, types.get(keyword))
+
+    return table
+
+
+def read_sequence_table(
+    file_root: str,
+    starting_sequence: int,
+    keywords: list[str],
+    extension: int = 0,
+    types: dict | None = None,
+    number_threads: int = 8,
+) -> dict[str, numpy.ndarray]:
+    """
+    Read keyword values from a sequence of images into a columnar table.
+    The sequence ends at the first missing sequence number.
+
+    Args:
+        file_root: image file root name, which may include a folder
+        starting_sequence: first sequence number
+        keywords: keyword names
+        extension: extension number of the header to read
+        types: optional {keyword: type} such as {"CAMTEMP": float}
+        number_threads: maximum number of threads reading headers
+
+    Returns:
+        {keyword: numpy array} as read_header_table() with "sequence" numbers
+    """
+
+    folder, root = os.path.split(file_root)
+    index = SequenceIndex(folder or None, read_headers=False)
+
+    numbers = []
+    filenames = []
+    number = int(starting_sequence)
+    while index.exists(root, number):
+        numbers.append(number)
+        filenames.append(index.filename(root, number))
+        number += 1
+
+    table = read_header_table(filenames, keywords, extension, types, number_threads)
+    table["sequence"] = numpy.array(numbers, dtype="int64")
+
+    return table
+
+
+def time_to_seconds(values: numpy.ndarray) -> numpy.ndarray:
+    """
+    Convert time strings as "HH:MM:SS.sss" to seconds. Invalid values are NaN.
+
+    Args:
+        values: time strings
+
+    Returns:
+        float64 array of seconds
+    """
+
+    seconds = numpy.full(len(values), numpy.nan)
+    for i, value in enumerate(values):
+        try:
+            h, m, s = str(value).split(":")
+            seconds[i] = float(s) + 60.0 * float(m) + 3600.0 * float(h)
+        except ValueError:
+            pass
+
+    return seconds
+
+
+def _has_end_card(block: bytes) -> bool:
+    """
+    Return True if a header block contains the END card.
+    """
+
+    for card in range(0, _BLOCK_SIZE, 80):
+        if block[card : card + 8] == b"END     ":
+            return True
+
+    return False
+
+
+def _make_column(values: list, value_type: type | None = None) -> numpy.ndarray:
+    """
+    Return keyword values as a numpy array of a common type.
+    """
+
+    present = [v for v in values if v is not None]
+
+    if value_type is None:
+        if len(present) == 0:
+            value_type = str
+        elif all(isinstance(v, bool) for v in present):
+            value_type = bool
+        elif all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+            value_type = int if len(present) == len(values) else float
+        elif all(isinstance(v, (int, float)) for v in present):
+            value_type = float
+        else:
+            value_type = str
+
+    if value_type is float:
+        column = numpy.full(len(values), numpy.nan)
+        for i, v in enumerate(values):
+            try:
+                column[i] = float(v)
+            except (TypeError, ValueError):
+                pass
+        return column
+
+    if value_type is int:
+        return numpy.array([int(v) for v in values], dtype="int64")
+
+    if value_type is bool:
+        return numpy.array([bool(v) for v in values], dtype=bool)
+
+    return numpy.array(["" if v is None else str(v) for v in values], dtype=str)
@@ -0,0 +1,869 @@
+"""
+Local mock azcamserver for offline testing and benchmarking of the console.
+
+Speaks the azcamserver socket protocol ("OK ..." or "ERROR ..." replies), keeps a
+parameter table, and writes synthetic multi-extension FITS images on exposures.
+
+Usage:
+    python -m azcam_console.mock_server [port] [latency]
+"""
+
+import datetime
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+
+import numpy
+from astropy.io import fits as pyfits
+
+import azcam
+import azcam.utils
+import azcam.exceptions
+
+# exposure flag names, as azcam.db.exposureflags
+EXPOSURE_FLAGS = {
+    0: "NONE",
+    1: "EXPOSING",
+    2: "ABORT",
+    3: "PAUSE",
+    4: "RESUME",
+    5: "READ",
+    6: "PAUSED",
+    7: "READOUT",
+    8: "SETUP",
+    9: "WRITING",
+    10: "GUIDEERROR",
+    11: "ERROR",
+}
+
+
+class MockServer(object):
+    """
+    Mock azcamserver.
+    Commands are "tool.method args" (such as "exposure.expose 1.0 flat title") or a bare
+    method name (such as "expose 1.0 flat title") which is found in the server commands or
+    its tools.
+    Each client connection runs in its own thread and its commands are executed sequentially,
+    like azcamserver.
+    """
+
+    def __init__(self, port: int = 2402, latency: float = 0.0) -> None:
+        """
+        Args:
+            port: socket port to listen on
+            latency: delay in seconds added to every command
+        """
+
+        #: socket port
+        self.port = port
+
+        #: delay in seconds added to every command
+        self.latency = latency
+
+        #: welcome message sent to new connections, None for no message
+        self.welcome_message = None
+
+        #: True to log received commands and replies
+        self.logcommands = 0
+
+        #: parameter table as {name: value}
+        self.parameters = {
+            "imageroot": "itl.",
+            "imageincludesequencenumber": 1,
+            "imagesequencenumber": 1,
+            "imageautoname": 0,
+            "imageautoincrementsequencenumber": 1,
+            "imagetest": 0,
+            "imagetype": "zero",
+            "imagetitle": "",
+            "imageoverwrite": 1,
+            "imagefolder": os.getcwd(),
+            "imagefiletype": "FITS",
+            "systemname": "mockserver",
+        }
+
+        #: server methods which may be called remotely as bare commands
+        self.commands = ["get_par", "set_par", "save_pars", "get_status"]
+
+        #: tools which may be called remotely
+        self.tools = {
+            "exposure": MockExposure(self),
+            "tempcon": MockTempcon(self),
+            "instrument": MockInstrument(self),
+        }
+
+        self.socketnames = {}
+        self.is_running = 0
+        self._server = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Start the server in a thread.
+        """
+
+        self._server = _ThreadedTCPServer(("", self.port), _MockRequestHandler)
+        self._server.mockserver = self
+
+        thread = threading.Thread(
+            target=self._server.serve_forever, name="mockserver", daemon=True
+        )
+        thread.start()
+        self.is_running = 1
+
+        return
+
+    def stop(self) -> None:
+        """
+        Stop the server.
+        """
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.is_running = 0
+
+        return
+
+    def command(self, command: str) -> str:
+        """
+        Execute a command string and return the reply string, always starting with OK or ERROR.
+        """
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        try:
+            tokens = azcam.utils.parse(command, 0)
+            method, args, kwargs = self._find_method(tokens)
+            reply = format_reply(method(*args, **kwargs))
+        except Exception as e:
+            reply = f"ERROR {repr(e)}"
+
+        return reply
+
+    def _find_method(self, tokens: list) -> tuple:
+        """
+        Return the (method, args, kwargs) for a tokenized command.
+        """
+
+        args = []
+        kwargs = {}
+        for token in tokens[1:]:
+            if "=" in token:
+                keyname, value = token.split("=", 1)
+                kwargs[keyname] = value
+            else:
+                args.append(token)
+
+        cmd = tokens[0]
+        if "." in cmd:
+            toolname, methodname = cmd.split(".", 1)
+            if toolname not in self.tools:
+                raise azcam.exceptions.AzcamError(
+                    f"remote call not allowed: {toolname}", 4
+                )
+            objects = [self.tools[toolname]]
+        else:
+            methodname = cmd
+            objects = list(self.tools.values())
+            if methodname in self.commands:
+                objects.insert(0, self)
+
+        for obj in objects:
+            if methodname.startswith("_"):
+                break
+            method = getattr(obj, methodname, None)
+            if callable(method):
+                return method, args, kwargs
+
+        raise azcam.exceptions.AzcamError(f"command not recognized: {cmd}")
+
+    # *************************************************************************
+    #   parameters
+    # *************************************************************************
+
+    def get_par(self, parameter: str, subdict: str | None = None):
+        """
+        Return a parameter value, None if it is not defined.
+        """
+
+        with self._lock:
+            return self.parameters.get(parameter.lower())
+
+    def set_par(self, parameter: str, value="None", subdict: str | None = None):
+        """
+        Set a parameter value.
+        """
+
+        _, value = azcam.utils.get_datatype(value)
+        if value == "None":
+            value = None
+
+        with self._lock:
+            self.parameters[parameter.lower()] = value
+
+        return
+
+    def save_pars(self):
+        """
+        Parameters are not saved by the mock server.
+        """
+
+        return
+
+    def get_status(self):
+        """
+        Return exposure status.
+        """
+
+        return self.tools["exposure"].get_status()
+
+
+class MockExposure(object):
+    """
+    Mock exposure tool which writes synthetic MEF images.
+    The sensor has num_ser_amps x num_par_amps amplifiers, each written to one extension
+    with visible pixels followed by serial overscan columns.
+    """
+
+    def __init__(self, server: MockServer) -> None:
+
+        self.server = server
+
+        #: number of amplifiers in serial (column) direction
+        self.num_ser_amps = 2
+
+        #: number of amplifiers in parallel (row) direction
+        self.num_par_amps = 2
+
+        #: visible columns per amplifier
+        self.numviscols_amp = 512
+
+        #: visible rows per amplifier
+        self.numvisrows_amp = 512
+
+        #: serial overscan columns per amplifier
+        self.numcols_overscan = 32
+
+        #: bias level in DN
+        self.bias_level = 1000.0
+
+        #: read noise in DN
+        self.read_noise = 4.0
+
+        #: gain of each amplifier in electrons/DN
+        self.system_gain = [2.0, 2.1, 1.9, 2.0]
+
+        #: illumination in electrons/pixel/second for flat and object images
+        self.flux = 1000.0
+
+        #: dark current in electrons/pixel/second
+        self.dark_current = 0.01
+
+        #: number of Fe-55 events per amplifier
+        self.fe55_events = 500
+
+        #: readout time in seconds
+        self.readout_time = 0.0
+
+        #: scale factor applied to exposure times when waiting, 0 to not wait
+        self.exposure_time_scale = 0.0
+
+        self.exposure_time = 1.0
+        self.exposure_flag = 0
+        self.col_bin = 1
+        self.row_bin = 1
+
+        self._exposure_start = 0.0
+        self._readout_start = 0.0
+
+        self._rng = numpy.random.default_rng()
+
+    # *************************************************************************
+    #   exposures
+    # *************************************************************************
+
+    def expose(self, exposure_time=-1, imagetype: str = "", title: str = ""):
+        """
+        Make a complete exposure and write the image file.
+        """
+
+        if float(exposure_time) >= 0:
+            self.exposure_time = float(exposure_time)
+        if imagetype != "":
+            self.set_image_type(imagetype)
+        if title != "":
+            self.set_image_title(title)
+
+        self._exposure_start = time.time()
+        self.exposure_flag = 1
+        if self.exposure_time_scale > 0:
+            time.sleep(self.exposure_time * self.exposure_time_scale)
+        self._readout_start = time.time()
+        self.exposure_flag = 7
+        if self.readout_time > 0:
+            time.sleep(self.readout_time)
+        self.exposure_flag = 9
+
+        filename = self.get_filename()
+        try:
+            self.write_image(filename)
+        finally:
+            self.exposure_flag = 0
+
+        if not self.server.get_par("imagetest") and self.server.get_par(
+            "imageautoincrementsequencenumber"
+        ):
+            seqnum = int(self.server.get_par("imagesequencenumber"))
+            self.server.set_par("imagesequencenumber", seqnum + 1)
+
+        return
+
+    def expose1(self, exposure_time=-1, imagetype: str = "", title: str = ""):
+        """
+        Make a complete exposure in a thread with immediate return.
+        """
+
+        threading.Thread(
+            target=self.expose, args=[exposure_time, imagetype, title], daemon=True
+        ).start()
+
+        return
+
+    def test(self, exposure_time=0.0, shutter_state=0):
+        """
+        Make a test exposure, written as test.fits.
+        """
+
+        imagetest = self.server.get_par("imagetest")
+        imagetype = self.get_image_type()
+        self.server.set_par("imagetest", 1)
+        try:
+            self.expose(exposure_time, "object" if int(shutter_state) else "zero")
+        finally:
+            self.server.set_par("imagetest", imagetest)
+            self.server.set_par("imagetype", imagetype)
+
+        return
+
+    def sequence(self, number_exposures=1, flush_array_flag=-1, delay=-1):
+        """
+        Take an exposure sequence using the current exposure time and image type.
+        """
+
+        for loop in range(int(number_exposures)):
+            if loop > 0 and float(delay) > 0:
+                time.sleep(float(delay))
+            self.expose()
+
+        return
+
+    def sequence1(self, number_exposures=1, flush_array_flag=-1, delay=-1):
+        """
+        Take an exposure sequence in a thread with immediate return.
+        """
+
+        threading.Thread(
+            target=self.sequence,
+            args=[number_exposures, flush_array_flag, delay],
+            daemon=True,
+        ).start()
+
+        return
+
+    def flush(self, cycles=1):
+        return
+
+    def abort(self):
+        return
+
+    def pause(self):
+        return
+
+    def resume(self):
+        return
+
+    def pause_exposure(self):
+        return
+
+    def resume_exposure(self):
+        return
+
+    def initialize(self):
+        return
+
+    def reset(self):
+        return
+
+    def set_shutter(self, state=0, shutter_id=0):
+        return
+
+    def roi_reset(self):
+        self.col_bin = 1
+        self.row_bin = 1
+        return
+
+    def get_roi(self, roi_num=0):
+        """
+        Return the ROI as [first_col, last_col, first_row, last_row, col_bin, row_bin].
+        """
+
+        return [
+            1,
+            self.numviscols_amp * self.num_ser_amps,
+            1,
+            self.numvisrows_amp * self.num_par_amps,
+            self.col_bin,
+            self.row_bin,
+        ]
+
+    def set_roi(self, *args):
+        """
+        Only binning is used by the mock server.
+        """
+
+        if len(args) > 5 and int(args[4]) > 0:
+            self.col_bin = int(args[4])
+        if len(args) > 5 and int(args[5]) > 0:
+            self.row_bin = int(args[5])
+
+        return
+
+    def get_exposuretime(self):
+        return self.exposure_time
+
+    def set_exposuretime(self, exposure_time):
+        self.exposure_time = float(exposure_time)
+        return
+
+    def get_exposuretime_remaining(self):
+        if self.exposure_flag != 1 or self.exposure_time_scale <= 0:
+            return 0.0
+        elapsed = (time.time() - self._exposure_start) / self.exposure_time_scale
+        return max(0.0, self.exposure_time - elapsed)
+
+    def get_pixels_remaining(self):
+        if self.exposure_flag != 7 or self.readout_time <= 0:
+            return 0
+        elapsed = (time.time() - self._readout_start) / self.readout_time
+        return int(self._numpix() * max(0.0, 1.0 - elapsed))
+
+    def _numpix(self):
+        return (
+            self.num_ser_amps
+            * self.num_par_amps
+            * self.numvisrows_amp
+            * (self.numviscols_amp + self.numcols_overscan)
+        )
+
+    def get_exposureflag(self):
+        return [self.exposure_flag, EXPOSURE_FLAGS[self.exposure_flag]]
+
+    def get_image_types(self):
+        return ["zero", "object", "flat", "dark", "ramp", "fe55", "test"]
+
+    def get_image_type(self):
+        return self.server.get_par("imagetype")
+
+    def set_image_type(self, imagetype: str = "zero"):
+        self.server.set_par("imagetype", imagetype.lower())
+        return
+
+    def get_image_title(self):
+        return self.server.get_par("imagetitle")
+
+    def set_image_title(self, title: str = ""):
+        with self.server._lock:
+            self.server.parameters["imagetitle"] = title
+        return
+
+    def set_filename(self, filename: str):
+        """
+        Set the image folder, root, and sequence number from a filename.
+        """
+
+        folder, name = os.path.split(os.path.abspath(filename))
+        root = name.split(".")[0]
+        self.server.set_par("imagefolder", folder)
+        self.server.set_par("imageroot", root)
+        self.server.set_par("imageincludesequencenumber", 0)
+
+        return
+
+    def get_filename(self) -> str:
+        """
+        Return the filename of the next image, using azcamserver naming rules.
+        """
+
+        pars = self.server.parameters
+        folder = str(pars["imagefolder"]).replace("\\", "/")
+        if not folder.endswith("/"):
+            folder = folder + "/"
+        root = str(pars["imageroot"])
+        seqnum = int(pars["imagesequencenumber"])
+
+        if pars["imagetest"]:
+            filename = folder + "test.fits"
+        elif pars["imageincludesequencenumber"]:
+            if pars["imageautoname"]:
+                filename = (
+                    f"{folder}{root}.{str(pars['imagetype']).upper()}.{seqnum:04d}.fits"
+                )
+            else:
+                filename = f"{folder}{root}{seqnum:04d}.fits"
+        else:
+            if pars["imageautoname"]:
+                filename = f"{folder}{root}.{str(pars['imagetype']).upper()}.fits"
+            else:
+                filename = f"{folder}{root}.fits"
+
+        return filename
+
+    def get_status(self) -> dict:
+        """
+        Return a variety of system status data in one dictionary.
+        """
+
+        temps = self.server.tools["tempcon"].get_temperatures()
+
+        # state and progress as azcamserver, which names only these states
+        flag = self.exposure_flag
+        expstate = EXPOSURE_FLAGS[flag] if flag in [1, 7, 8] else ""
+        progress = 0.0
+        if flag == 1 and self.exposure_time > 0:
+            progress = 100.0 * self.get_exposuretime_remaining() / self.exposure_time
+        elif flag == 7:
+            progress = int(100.0 * self.get_pixels_remaining() / self._numpix())
+
+        return {
+            "message": expstate,
+            "exposurelabel": "",
+            "exposurecolor": "transparent",
+            "exposurestate": expstate,
+            "progressbar": progress,
+            "camtemp": f"{temps[0]:.1f}",
+            "dewtemp": f"{temps[1]:.1f}",
+            "filename": self.get_filename(),
+            "seqcount": 0,
+            "seqtotal": 0,
+            "timestamp": str(datetime.datetime.now()),
+            "imagetitle": self.get_image_title(),
+            "imagetype": self.get_image_type(),
+            "imagetest": self.server.get_par("imagetest"),
+            "exposuretime": self.exposure_time,
+            "colbin": self.col_bin,
+            "rowbin": self.row_bin,
+            "systemname": self.server.get_par("systemname"),
+            "mode": "mock",
+        }
+
+    # *************************************************************************
+    #   synthetic images
+    # *************************************************************************
+
+    def make_data(self, amp: int) -> numpy.ndarray:
+        """
+        Return synthetic data in DN for one amplifier, including overscan.
+
+        Args:
+            amp: amplifier index, starting at 0
+        """
+
+        imagetype = str(self.get_image_type()).lower()
+        gain = self.system_gain[amp % len(self.system_gain)]
+        numcols = self.numviscols_amp + self.numcols_overscan
+        shape = [self.numvisrows_amp, self.numviscols_amp]
+
+        # signal in electrons
+        electrons = numpy.zeros(shape, dtype="float64")
+        if imagetype in ["flat", "object", "ramp", "test"]:
+            electrons += self.flux * self.exposure_time
+        if imagetype != "zero":
+            electrons += self.dark_current * self.exposure_time
+        electrons = self._rng.poisson(electrons).astype("float64")
+
+        if imagetype == "fe55":
+            rows = self._rng.integers(0, shape[0], self.fe55_events)
+            cols = self._rng.integers(0, shape[1], self.fe55_events)
+            energy = numpy.where(
+                self._rng.random(self.fe55_events) < 0.88, 1620.0, 1778.0
+            )
+            electrons[rows, cols] += energy
+
+        data = numpy.empty([self.numvisrows_amp, numcols], dtype="float64")
+        data[:, : self.numviscols_amp] = electrons / gain
+        data[:, self.numviscols_amp :] = 0.0
+        data += self.bias_level + self._rng.normal(0.0, self.read_noise, data.shape)
+
+        return numpy.clip(data, 0, 65535)
+
+    def write_image(self, filename: str) -> None:
+        """
+        Write a synthetic MEF image.
+        """
+
+        if os.path.exists(filename):
+            if self.server.get_par("imageoverwrite") or filename.endswith("test.fits"):
+                os.remove(filename)
+            else:
+                raise azcam.exceptions.AzcamError(f"image file exists: {filename}")
+
+        numamps = self.num_ser_amps * self.num_par_amps
+        numcols = self.numviscols_amp + self.numcols_overscan
+        temps = self.server.tools["tempcon"].get_temperatures()
+
+        phdr = pyfits.Header()
+        phdr["NEXTEND"] = (numamps, "Number of extensions")
+        phdr["NAMPS"] = (numamps, "Number of amplifiers")
+        phdr["OBJECT"] = (str(self.get_image_title()), "Image title")
+        phdr["IMAGETYP"] = (str(self.get_image_type()), "Image type")
+        phdr["EXPTIME"] = (self.exposure_time, "Exposure time (seconds)")
+        phdr["EXPREQ"] = (self.exposure_time, "Exposure time requested (seconds)")
+        phdr["DATE-OBS"] = (
+            datetime.datetime.now(datetime.timezone.utc).isoformat()[:23],
+            "UTC date at start of exposure",
+        )
+        phdr["CCDBIN1"] = (self.col_bin, "Binning factor along first axis")
+        phdr["CCDBIN2"] = (self.row_bin, "Binning factor along second axis")
+        phdr["CAMTEMP"] = (temps[0], "Camera temperature (C)")
+        phdr["DEWTEMP"] = (temps[1], "Dewar temperature (C)")
+        phdr["WAVLNGTH"] = (
+            self.server.tools["instrument"].get_wavelength(),
+            "Wavelength (nm)",
+        )
+        phdr["SYSTEM"] = (str(self.server.get_par("systemname")), "System name")
+
+        hdus = [pyfits.PrimaryHDU(None, phdr)]
+        for amp in range(numamps):
+            xamp = amp % self.num_ser_amps
+            yamp = amp // self.num_ser_amps
+            x1 = xamp * self.numviscols_amp + 1
+            y1 = yamp * self.numvisrows_amp + 1
+            x2 = x1 + self.numviscols_amp - 1
+            y2 = y1 + self.numvisrows_amp - 1
+
+            hdr = pyfits.Header()
+            hdr["EXTNAME"] = f"im{amp + 1}"
+            hdr["DATASEC"] = f"[1:{self.numviscols_amp},1:{self.numvisrows_amp}]"
+            hdr["BIASSEC"] = (
+                f"[{self.numviscols_amp + 1}:{numcols},1:{self.numvisrows_amp}]"
+            )
+            hdr["CCDSEC"] = f"[{x1}:{x2},{y1}:{y2}]"
+            hdr["DETSEC"] = f"[{x1}:{x2},{y1}:{y2}]"
+            hdr["PRESCAN1"] = 0
+            hdr["OVRSCAN1"] = self.numcols_overscan
+            hdr["PRESCAN2"] = 0
+            hdr["OVRSCAN2"] = 0
+            hdr["GAIN"] = (
+                self.system_gain[amp % len(self.system_gain)],
+                "Gain (e/DN)",
+            )
+
+            data = self.make_data(amp)
+            hdus.append(pyfits.ImageHDU(data.astype("uint16"), hdr))
+
+        pyfits.HDUList(hdus).writeto(filename)
+
+        return
+
+
+class MockTempcon(object):
+    """
+    Mock temperature controller.
+    """
+
+    def __init__(self, server: MockServer) -> None:
+
+        self.server = server
+
+        #: control temperature in Celsius
+        self.control_temperature = -100.0
+
+        #: dewar temperature in Celsius
+        self.dewar_temperature = -180.0
+
+    def get_temperatures(self):
+        return [self.control_temperature, self.dewar_temperature]
+
+    def get_control_temperature(self, temperature_id=-1):
+        return self.control_temperature
+
+    def set_control_temperature(self, temperature="None", temperature_id=-1):
+        if temperature != "None":
+            self.control_temperature = float(temperature)
+        return
+
+
+class MockInstrument(object):
+    """
+    Mock instrument with wavelength and filter selection.
+    """
+
+    def __init__(self, server: MockServer) -> None:
+
+        self.server = server
+
+        self.wavelength = 500.0
+        self.filters = ["clear", "u", "g", "r", "i", "z"]
+        self.filter = "clear"
+        self.pressures = [1.0e-6]
+
+    def get_wavelength(self, wavelength_id=0):
+        return self.wavelength
+
+    def set_wavelength(self, wavelength, wavelength_id=0, nd=-1):
+        try:
+            self.wavelength = float(wavelength)
+        except ValueError:
+            self.wavelength = 0.0
+        return
+
+    def get_filters(self, filter_id=0):
+        return self.filters
+
+    def get_filter(self, filter_id=0):
+        return self.filter
+
+    def set_filter(self, filter_name, filter_id=0):
+        if filter_name not in self.filters:
+            raise azcam.exceptions.AzcamError(f"invalid filter: {filter_name}")
+        self.filter = filter_name
+        return
+
+    def get_pressures(self):
+        return self.pressures
+
+    def comps_on(self):
+        return
+
+    def comps_off(self):
+        return
+
+
+def format_reply(reply) -> str:
+    """
+    Create a reply string for a socket command, as azcamserver does.
+
+    Args:
+        reply: value returned by a command
+
+    Returns:
+        reply string starting with OK or ERROR.
+    """
+
+    if reply is None or reply == "":
+        s = ""
+    elif type(reply) == str:
+        s = reply
+    elif type(reply) == list:
+        s = ""
+        for x in reply:
+            if type(x) == str and " " in x:
+                s = s + " " + "'" + str(x) + "'"
+            else:
+                s = s + " " + str(x)
+        s = s.strip()
+    elif type(reply) == dict:
+        s = json.dumps(reply)
+    else:
+        s = repr(reply).strip()
+
+    if not (s.startswith("OK") or s.startswith("ERROR") or s.startswith("WARNING")):
+        s = "OK " + s
+
+    return s.strip()
+
+
+class _ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _MockRequestHandler(socketserver.BaseRequestHandler):
+    """
+    Handles one client connection, executing its commands sequentially.
+    """
+
+    def handle(self):
+        mockserver = self.server.mockserver
+
+        if mockserver.welcome_message is not None:
+            self.request.send(str.encode(mockserver.welcome_message + "\r\n"))
+
+        buffer = ""
+        while True:
+            try:
+                data = self.request.recv(4096).decode()
+            except OSError:
+                break
+            if data == "":
+                break
+            buffer += data
+
+            while "\n" in buffer:
+                command, buffer = buffer.split("\n", 1)
+                command = command.strip()
+
+                if command == "":
+                    self.request.send(str.encode("OK\r\n"))
+                    return
+
+                if mockserver.logcommands:
+                    azcam.log(command, prefix="Rcv> ")
+
+                lower = command.lower()
+                if lower.startswith("closeconnection"):
+                    self.request.send(str.encode("OK\r\n"))
+                    return
+                elif lower.startswith("register"):
+                    tokens = command.split(" ")
+                    mockserver.socketnames[self.client_address] = (
+                        tokens[1] if len(tokens) > 1 else "unknown"
+                    )
+                    reply = "OK"
+                elif lower.startswith("echo"):
+                    tokens = command.split(" ", 1)
+                    reply = "OK" if len(tokens) == 1 else f"OK {tokens[1]}"
+                else:
+                    reply = mockserver.command(command)
+
+                if mockserver.logcommands:
+                    azcam.log(reply, prefix="Out> ")
+
+                self.request.send(str.encode(reply + "\r\n"))
+
+        return
+
+
+def main(port: int = 2402, latency: float = 0.0):
+    """
+    Run the mock server until interrupted.
+
+    Args:
+        port: socket port to listen on
+        latency: delay in seconds added to every command
+    """
+
+    server = MockServer(int(port), float(latency))
+    server.start()
+    azcam.log(f"Mock azcamserver listening on port {server.port}")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+    server.stop()
+
+    return
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(*args)
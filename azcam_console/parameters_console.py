@@ -4,6 +4,10 @@
 Parameter handling tool for azcam-console.
 """
 
+import collections
+import contextlib
+import threading
+import time
 import typing
 
 import azcam
@@ -27,12 +31,30 @@ class ParametersConsole(Parameters):
 
         Parameters.__init__(self, "azcamconsole")
 
+        #: True to cache parameter values read from the server
+        self.cache_enabled = False
+
+        #: seconds a cached value remains valid, 0 for no expiration
+        self.cache_ttl = 30.0
+
+        #: maximum number of cached values, least recently used are removed first
+        self.cache_size = 256
+
+        #: parameters which change on the server during exposures and are never cached
+        self.cache_exclude = ["imagesequencenumber", "imagetype", "imagetitle"]
+
+        # cached values as {(subdict, parameter): (time, value)}
+        self._cache = collections.OrderedDict()
+        self._cache_lock = threading.Lock()
+
     def get_par(self, parameter: str, subdict=None) -> typing.Any:
         """
         Return the value of a parameter in the parameters dictionary.
+        If cache_enabled is True, a valid cached value is returned without a server command.
 
         Args:
             parameter: name of the parameter
+            subdict: name of the sub-dictionary containing the parameter
 
         Returns:
             value: value of the parameter
@@ -44,6 +66,10 @@ class ParametersConsole(Parameters):
         if subdict is None:
             subdict = self.default_pardict_name
 
+        cached, value = self._cache_get(subdict, parameter)
+        if cached:
+            return value
+
         try:
             reply = azcam.db.api.command(f"get_par {parameter} {subdict}")
         except azcam.exceptions.AzcamError:
@@ -53,15 +79,19 @@ class ParametersConsole(Parameters):
         if type(value) == list:
             value = " ".join(value)
 
+        self._cache_put(subdict, parameter, value)
+
         return value
 
     def set_par(self, parameter: str, value: typing.Any = None, subdict=None) -> None:
         """
         Set the value of a parameter in the parameters dictionary.
+        The parameter cache is updated with the new value.
 
         Args:
             parameter: name of the parameter
             value: value of the parameter.
+            subdict: name of the sub-dictionary containing the parameter
         Returns:
             None
         """
@@ -74,9 +104,211 @@ class ParametersConsole(Parameters):
         try:
             azcam.db.api.command(f"set_par {parameter} {value} {subdict}")
         except azcam.exceptions.AzcamError:
+            self.invalidate(parameter, subdict)
             return
+
+        # write through to cache
+        if value is None:
+            self.invalidate(parameter, subdict)
+        else:
+            _, value = azcam.utils.get_datatype(azcam.utils.dequote(value))
+            self._cache_put(subdict, parameter, value)
+
         return None
 
+    def get_pars(self, parameters: list[str], subdict=None) -> dict:
+        """
+        Return the values of several parameters using one server exchange.
+        Cached values are used when valid and only the others are read from the server.
+
+        Args:
+            parameters: list of parameter names
+            subdict: name of the sub-dictionary containing the parameters
+
+        Returns:
+            dict of {parameter: value}. Parameters which could not be read have a value of None.
+        """
+
+        if subdict is None:
+            subdict = self.default_pardict_name
+
+        values = {}
+        missing = []
+        for parameter in parameters:
+            cached, value = self._cache_get(subdict, parameter.lower())
+            if cached:
+                values[parameter] = value
+            else:
+                missing.append(parameter)
+
+        if len(missing) > 0:
+            try:
+                replies = azcam.db.api.command_batch(
+                    [f"get_par {parameter.lower()} {subdict}" for parameter in missing]
+                )
+            except azcam.exceptions.AzcamError:
+                replies = [None] * len(missing)
+
+            for parameter, reply in zip(missing, replies):
+                if reply is None or isinstance(reply, azcam.exceptions.AzcamError):
+                    values[parameter] = None
+                    continue
+                _, value = azcam.utils.get_datatype(reply)
+                if type(value) == list:
+                    value = " ".join(value)
+                values[parameter] = value
+                self._cache_put(subdict, parameter.lower(), value)
+
+        return {parameter: values[parameter] for parameter in parameters}
+
+    def set_pars(self, parameters: dict, subdict=None) -> None:
+        """
+        Set the values of several parameters using one server exchange.
+        The parameter cache is updated with the new values. All parameters are sent
+        even if one fails, then an AzcamError is raised listing the parameters which
+        could not be set, as API.set_pars().
+
+        Args:
+            parameters: dict of {parameter: value}
+            subdict: name of the sub-dictionary containing the parameters
+        """
+
+        if subdict is None:
+            subdict = self.default_pardict_name
+
+        pars = {parameter.lower(): value for parameter, value in parameters.items()}
+
+        try:
+            replies = azcam.db.api.command_batch(
+                [
+                    f"set_par {parameter} {value} {subdict}"
+                    for parameter, value in pars.items()
+                ]
+            )
+        except azcam.exceptions.AzcamError:
+            for parameter in pars:
+                self.invalidate(parameter, subdict)
+            raise
+
+        # write through to cache
+        failed = []
+        for (parameter, value), reply in zip(pars.items(), replies):
+            if isinstance(reply, azcam.exceptions.AzcamError):
+                failed.append(parameter)
+                self.invalidate(parameter, subdict)
+            elif value is None:
+                self.invalidate(parameter, subdict)
+            else:
+                _, value = azcam.utils.get_datatype(azcam.utils.dequote(value))
+                self._cache_put(subdict, parameter, value)
+
+        if len(failed) > 0:
+            raise azcam.exceptions.AzcamError(
+                f"could not set parameters: {' '.join(failed)}"
+            )
+
+        return
+
+    @contextlib.contextmanager
+    def imagepars(self, parameters: dict | None = None):
+        """
+        Context manager which saves the image parameters (azcam.db.imageparnames), optionally
+        sets new values, and restores the saved values on exit, even if an exception is raised.
+        Replaces the azcam.utils.save_imagepars() and restore_imagepars() pair.
+        Failed sets raise AzcamError as set_pars(), parameters which could not be read
+        are not restored. A failed restore is only logged if the body raised an exception.
+
+        Args:
+            parameters: dict of {parameter: value} to set after saving
+
+        Usage:
+            with azcam.db.parameters.imagepars({"imagetest": 0, "imageroot": "bias."}):
+                azcam.db.tools["exposure"].expose(0, "zero", "bias image")
+        """
+
+        imagepars = self.get_pars(azcam.db.imageparnames)
+        saved = {
+            par: azcam.utils.quoter(value)
+            for par, value in imagepars.items()
+            if value is not None
+        }
+
+        try:
+            if parameters:
+                self.set_pars(parameters)
+            yield imagepars
+        except BaseException:
+            # a failed restore must not replace the original exception
+            try:
+                self.set_pars(saved)
+            except Exception as e:
+                azcam.log(f"could not restore image parameters: {e}")
+            raise
+
+        self.set_pars(saved)
+
+    def invalidate(self, parameter: str | None = None, subdict=None) -> None:
+        """
+        Remove values from the parameter cache.
+        If parameter is not specified, all cached values are removed (only those in subdict
+        if it is specified).
+
+        Args:
+            parameter: name of the parameter
+            subdict: name of the sub-dictionary containing the parameter
+        """
+
+        with self._cache_lock:
+            if parameter is None:
+                if subdict is None:
+                    self._cache.clear()
+                else:
+                    for key in [k for k in self._cache if k[0] == subdict]:
+                        del self._cache[key]
+            else:
+                if subdict is None:
+                    subdict = self.default_pardict_name
+                self._cache.pop((subdict, parameter.lower()), None)
+
+        return
+
+    def _cache_get(self, subdict: str, parameter: str) -> tuple:
+        """
+        Return (True, value) if a valid value is cached, else (False, None).
+        """
+
+        if not self.cache_enabled:
+            return (False, None)
+
+        key = (subdict, parameter)
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return (False, None)
+            if self.cache_ttl > 0 and time.monotonic() - entry[0] > self.cache_ttl:
+                del self._cache[key]
+                return (False, None)
+            self._cache.move_to_end(key)
+
+        return (True, entry[1])
+
+    def _cache_put(self, subdict: str, parameter: str, value: typing.Any) -> None:
+        """
+        Save a value in the cache, removing the least recently used values as needed.
+        """
+
+        if not self.cache_enabled or parameter in self.cache_exclude:
+            return
+
+        key = (subdict, parameter)
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return
+
     def get_local_par(
         self,
         par_dict_id: dict,
@@ -6,7 +6,7 @@ import sys
 
 import azcam
 import azcam_console.plot
-import azcam.fits
+from azcam_console.header_table import read_sequence_table, time_to_seconds
 
 
 def plot_header_times(fileroot="itl.", starting_sequence=1, keyword="UT"):
@@ -29,23 +29,16 @@ def plot_header_times(fileroot="itl.", starting_sequence=1, keyword="UT"):
     starting_sequence = int(starting_sequence)
     keyword = keyword.strip("'")  # in case quotes were used
 
+    # read all headers at once
+    table = read_sequence_table(
+        fileroot, starting_sequence, [keyword], types={keyword: str}
+    )
+    seconds = time_to_seconds(table[keyword])
     times = []
-    i0 = starting_sequence
-    i = i0
-    while True:
-        img = fileroot + "%.4u" % i
-        try:
-            ht = azcam.fits.get_keyword(img, keyword)
-        except IOError:
-            break
-        t = ht.split(":")
-        tms = float(t[2]) + 60.0 * float(t[1]) + 3600.0 * float(t[0])
-        if i == i0:
-            tms0 = tms
-        delta = tms - tms0
+    for i, ht, tms in zip(table["sequence"], table[keyword], seconds):
+        delta = tms - seconds[0]
         print("Image %3d, UT %s, Time: %.3f" % (i, ht, delta))
         times.append(delta)
-        i = i + 1
 
     # plot
     fig, ax = azcam_console.plot.plt.subplots(constrained_layout=True)
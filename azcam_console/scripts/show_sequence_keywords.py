@@ -5,8 +5,7 @@ show keywords from a sequence of images.
 import sys
 
 import azcam
-import azcam.utils
-import azcam.fits
+from azcam_console.header_table import read_sequence_table
 
 
 def show_sequence_keywords(FileRoot="itl.", StartingSequence=1, keyword="OBJECT"):
@@ -15,8 +14,6 @@ def show_sequence_keywords(FileRoot="itl.", StartingSequence=1, keyword="OBJECT"
     Returns data.
     """
 
-    data = []
-
     # inputs
     FileRoot = azcam.db.parameters.get_local_par(
         "show_sequence_keywords", "FileRoot", "prompt", "Enter file root name", FileRoot
@@ -32,21 +29,10 @@ def show_sequence_keywords(FileRoot="itl.", StartingSequence=1, keyword="OBJECT"
         "show_sequence_keywords", "keyword", "prompt", "Enter keyword name", keyword
     )
     StartingSequence = int(StartingSequence)
-    SequenceNumber = StartingSequence
-    i = SequenceNumber
-
-    while True:
-        img = FileRoot + "%.4u" % i
-        img = azcam.utils.make_image_filename(img)
-        if not azcam.fits.file_exists(img):
-            break
-        reply = azcam.fits.get_keyword(img, keyword)
-        value = reply
-
-        data.append(value)
 
-        # print('Image %3d: %s = %s' % (i,keyword,str(value)))
-        i += 1
+    # read all headers at once, values keep their header type
+    table = read_sequence_table(FileRoot, StartingSequence, [keyword])
+    data = table[keyword].tolist()
 
     return data
 
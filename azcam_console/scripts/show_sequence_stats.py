@@ -4,12 +4,14 @@ evaluate image statistics from a sequence of images.
 
 import sys
 
+import numpy
 from matplotlib.ticker import MaxNLocator
 
 import azcam
 import azcam.utils
 import azcam.fits
 import azcam_console.plot
+from azcam_console.header_table import read_sequence_table
 
 
 def show_sequence_stats(file_root="itl.", starting_sequence=1):
@@ -30,41 +32,34 @@ def show_sequence_stats(file_root="itl.", starting_sequence=1):
         starting_sequence,
     )
     starting_sequence = int(starting_sequence)
-    SequenceNumber = starting_sequence
 
     roi = azcam.db.tools["display"].get_rois(-1, "image")[0]  # use only first ROI
 
     means = []
     sigmas = []
-    i = SequenceNumber
+
+    # read all headers at once
+    table = read_sequence_table(
+        file_root, starting_sequence, ["CAMTEMP"], types={"CAMTEMP": float}
+    )
+    temps = numpy.nan_to_num(table["CAMTEMP"], nan=-999.99)
 
     image_numbers = []
-    while True:
-        # img = file_root + "%.4u" % i
-        img = f"{file_root}{i:d}"
+    for i, img, temp in zip(table["sequence"], table["filename"], temps):
         print(img)
-        img = azcam.utils.make_image_filename(img)
-        print(img)
-        if not azcam.fits.file_exists(img):
-            break
         stats = azcam.fits.stat(img, roi)
         if len(stats[0]) == 0:
             break
 
         m = float(stats[0][0])
         sdev = float(stats[1][0])
-        try:
-            temp = float(azcam.fits.get_keyword(img, "CAMTEMP"))
-        except KeyError:
-            temp = -999.99
         means.append(m)
         sigmas.append(sdev)
         print("Image %3d, Mean %6.0f, Sigma: %6.02f, Temp: %6.01f" % (i, m, sdev, temp))
-        image_numbers.append(i)
-        i += 1
+        image_numbers.append(int(i))
 
     # plot
-    if i == SequenceNumber:
+    if len(image_numbers) == 0:
         return "no files analyzed"
 
     fig, ax = azcam_console.plot.plt.subplots(constrained_layout=True)
@@ -0,0 +1,213 @@
+"""
+Index of image sequences in a folder with cached header keywords.
+
+A folder is scanned once and image files named `<root><number>.fits` (such as
+`ptc.0003.fits`) are grouped by root name and sequence number. The primary header of
+every indexed file is read in the same pass, so keyword queries are answered from memory
+instead of reopening each file.
+
+Usage:
+    index = SequenceIndex(folder)
+    firstfile, seq_num = index.find_file_in_sequence("qe.")
+    for seq_num, filename in index.sequence("qe."):
+        exptime = float(index.get_keyword(filename, "EXPTIME"))
+"""
+
+import os
+import re
+import threading
+import typing
+
+from astropy.io import fits as pyfits
+
+import azcam
+import azcam.utils
+import azcam.exceptions
+
+# image filename as root name, sequence number, and .fits extension
+_SEQUENCE_FILE = re.compile(r"^(?P<root>.*?)(?P<number>\d+)\.fits$")
+
+
+class SequenceIndex(object):
+    """
+    Image sequences of one folder grouped by root name and sequence number.
+    """
+
+    def __init__(self, folder: str | None = None, read_headers: bool = True) -> None:
+        """
+        Args:
+            folder: folder to index, None for the current folder
+            read_headers: True to read all primary headers while scanning,
+                False to read headers when first queried
+        """
+
+        if folder is None:
+            folder = azcam.utils.curdir()
+
+        #: indexed folder
+        self.folder = azcam.utils.fix_path(os.path.abspath(folder))
+
+        #: True to read all primary headers while scanning
+        self.read_headers = read_headers
+
+        # {root: {sequence number: filename}}
+        self._sequences = {}
+
+        # {(filename, extension): header}
+        self._headers = {}
+        self._lock = threading.Lock()
+
+        self.scan()
+
+    def scan(self) -> None:
+        """
+        Scan the folder for image sequences, discarding cached headers.
+        """
+
+        sequences = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                match = _SEQUENCE_FILE.match(entry.name)
+                if match is None or not entry.is_file():
+                    continue
+                root = match.group("root")
+                number = int(match.group("number"))
+                sequences.setdefault(root, {})[number] = azcam.utils.fix_path(
+                    os.path.join(self.folder, entry.name)
+                )
+
+        with self._lock:
+            self._sequences = sequences
+            self._headers = {}
+
+        if self.read_headers:
+            for root in sequences:
+                for _, filename in self.sequence(root):
+                    self.get_header(filename)
+
+        return
+
+    def roots(self) -> list[str]:
+        """
+        Return the sorted root names of all sequences in the folder.
+        """
+
+        return sorted(self._sequences)
+
+    def sequence(self, root: str) -> list[tuple[int, str]]:
+        """
+        Return the files of a sequence sorted by sequence number.
+
+        Args:
+            root: image file root name, such as "ptc."
+
+        Returns:
+            list of (sequence number, filename)
+        """
+
+        return sorted(self._sequences.get(root, {}).items())
+
+    def filename(self, root: str, sequence_number: int) -> str | None:
+        """
+        Return the filename of one image of a sequence, or None if it does not exist.
+
+        Args:
+            root: image file root name
+            sequence_number: image sequence number
+        """
+
+        return self._sequences.get(root, {}).get(sequence_number)
+
+    def exists(self, root: str, sequence_number: int) -> bool:
+        """
+        Return True if an image of a sequence exists.
+
+        Args:
+            root: image file root name
+            sequence_number: image sequence number
+        """
+
+        return self.filename(root, sequence_number) is not None
+
+    def find_file_in_sequence(self, root: str, file_number: int = 1) -> tuple:
+        """
+        Returns the Nth file in an image sequence where N is file_number (1 for first file),
+        as azcam_console.utils.find_file_in_sequence().
+
+        Args:
+            root: image file root name.
+            file_number: image file number in sequence.
+
+        Returns:
+            tuple (filename,sequencenumber).
+        """
+
+        sequence = self.sequence(root)
+        if len(sequence) == 0:
+            raise azcam.exceptions.AzcamError("image sequence not found")
+
+        firstnumber, firstfile = sequence[0]
+        sequencenumber = firstnumber + file_number - 1
+        filename = self.filename(root, sequencenumber)
+        if filename is None:
+            # same numbering format as the first file
+            digits = len(os.path.basename(firstfile)) - len(root) - len(".fits")
+            filename = azcam.utils.fix_path(
+                os.path.join(self.folder, f"{root}{sequencenumber:0{digits}d}.fits")
+            )
+
+        return (filename, sequencenumber)
+
+    def get_header(self, filename: str, extension: int = 0) -> pyfits.Header:
+        """
+        Return a header from the cache, reading it if needed.
+        Files outside the index are also read and cached.
+
+        Args:
+            filename: image filename, relative names are in the indexed folder
+            extension: extension number
+        """
+
+        filename = azcam.utils.make_image_filename(os.path.join(self.folder, filename))
+        key = (filename, extension)
+
+        with self._lock:
+            header = self._headers.get(key)
+        if header is None:
+            header = pyfits.getheader(key[0], extension)
+            with self._lock:
+                self._headers[key] = header
+
+        return header
+
+    def get_keyword(
+        self, filename: str, keyword: str, extension: int = 0
+    ) -> typing.Any:
+        """
+        Return a header keyword value, as azcam.fits.get_keyword().
+
+        Args:
+            filename: image filename
+            keyword: keyword name
+            extension: extension number
+        """
+
+        return self.get_header(filename, extension)[keyword]
+
+    def get_keywords(
+        self, root: str, keyword: str, extension: int = 0, default: typing.Any = None
+    ) -> list:
+        """
+        Return a keyword value for every image of a sequence in sequence order.
+
+        Args:
+            root: image file root name
+            keyword: keyword name
+            extension: extension number
+            default: value for images without the keyword
+        """
+
+        return [
+            self.get_header(filename, extension).get(keyword, default)
+            for _, filename in self.sequence(root)
+        ]
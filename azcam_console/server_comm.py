@@ -2,9 +2,138 @@
 Class to communicate with azcamserver.
 """
 
+import contextlib
+import queue
+import shlex
+import socket
+import threading
+import time
+
 import azcam
 import azcam.sockets
 import azcam.exceptions
+from azcam_console.command_stats import CommandStats
+
+
+class SocketPool(object):
+    """
+    Pool of socket connections to azcamserver.
+    Each connection is registered as a console and is checked out by one caller at a time,
+    so threads sharing the pool never interleave commands or replies on a socket.
+    A socket whose exchange raised an exception may still receive a reply, so it is closed
+    when returned and reopened by the next caller.
+    """
+
+    def __init__(self, number_connections: int = 1) -> None:
+        """
+        Args:
+            number_connections: number of socket connections in the pool
+        """
+
+        #: number of socket connections in the pool
+        self.number_connections = number_connections
+
+        #: all socket interfaces in the pool
+        self.sockets: list[azcam.sockets.SocketInterface] = []
+
+        # idle sockets, and generation numbers put by close() to wake waiting checkouts
+        self._idle = queue.Queue()
+        self._generation = 0
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    def open(self, host: str, port: int) -> bool:
+        """
+        Open and register all connections in the pool.
+
+        Returns:
+            True if all connections were opened.
+        """
+
+        self.close()
+
+        for _ in range(self.number_connections):
+            socket1 = azcam.sockets.SocketInterface(host, port)
+            if not open_registered(socket1):
+                self.close()
+                return False
+            self.sockets.append(socket1)
+            self._idle.put(socket1)
+
+        return True
+
+    def close(self) -> None:
+        """
+        Close all connections in the pool.
+        """
+
+        with self._lock:
+            for socket1 in self.sockets:
+                socket1.close()
+            self.sockets = []
+
+            # discard idle sockets and wake each waiting checkout
+            while True:
+                try:
+                    self._idle.get_nowait()
+                except queue.Empty:
+                    break
+            self._generation += 1
+            for _ in range(self._waiting):
+                self._idle.put(self._generation)
+
+        return
+
+    @contextlib.contextmanager
+    def checkout(self, timeout: float | None = None):
+        """
+        Context manager which checks out an idle socket, waiting for one if all are in use.
+        Raises AzcamError if the pool is closed or reopened while waiting.
+
+        Args:
+            timeout: maximum time to wait for a socket in seconds, None to wait forever
+        """
+
+        with self._lock:
+            if len(self.sockets) == 0:
+                raise azcam.exceptions.AzcamError(
+                    "could not open connection to server", error_code=2
+                )
+            generation = self._generation
+            self._waiting += 1
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                if deadline is not None:
+                    timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    socket1 = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    raise azcam.exceptions.AzcamError("no server connection available")
+
+                if not isinstance(socket1, int):
+                    break
+
+                # ignore wakeups from a close() before this checkout started
+                if socket1 > generation:
+                    raise azcam.exceptions.AzcamError("server connection was closed")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        try:
+            yield socket1
+        except BaseException:
+            socket1.close()
+            raise
+        finally:
+            # sockets of a pool closed while checked out are not returned
+            with self._lock:
+                if socket1 in self.sockets:
+                    self._idle.put(socket1)
+                else:
+                    socket1.close()
 
 
 class ServerCommunication(object):
@@ -13,26 +142,44 @@ class ServerCommunication(object):
     Usually implemented as the "server" tool.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, number_connections: int = 1) -> None:
+        """
+        Args:
+            number_connections: number of pooled socket connections to the server
+        """
+
+        #: pool of registered socket connections
+        self.pool = SocketPool(number_connections)
+
+        #: first socket connection in the pool
         self.remserver = azcam.sockets.SocketInterface()
+
+        #: command statistics, set stats.enabled to True to record
+        self.stats = CommandStats()
+
         self.connected = False
 
-    def connect(self, host="localhost", port=2402):
+    def connect(self, host="localhost", port=2402, number_connections: int = -1):
         """
         Connect to azcamserver.
+        Opens a pool of connections so that monitoring and acquisition threads may
+        send commands in parallel.
+
+        Args:
+            host: server host name
+            port: server port number
+            number_connections: number of pooled connections, -1 for no change
         """
 
         self.host = host
         self.port = port
 
-        self.remserver.host = host
-        self.remserver.port = port
+        if number_connections > 0:
+            self.pool.number_connections = number_connections
 
-        if self.remserver.open():
-            connected = True
-            self.remserver.command("register console")
-        else:
-            connected = False
+        connected = self.pool.open(host, port)
+        if connected:
+            self.remserver = self.pool.sockets[0]
 
         self.connected = connected
 
@@ -46,32 +193,184 @@ class ServerCommunication(object):
         Returns None or a string.
         """
 
-        # get tokenized reply - check for comm error
-        try:
-            reply = self.remserver.command(command)
-        except azcam.exceptions.AzcamError as e:
-            if e.error_code == 2:
-                raise
-                # raise azcam.exceptions.AzcamError("could not connect to server")
-            else:
+        start = time.perf_counter()
+        with self.pool.checkout() as remserver, remserver.lock:
+            checkout = time.perf_counter()
+            try:
+                reply = self._exchange(remserver, command)
+            except azcam.exceptions.AzcamError:
+                self.stats.record(
+                    command,
+                    time.perf_counter() - checkout,
+                    wait_time=checkout - start,
+                    error=True,
+                )
                 raise
+        received = time.perf_counter()
 
-        if command in ["exposure.get_status"]:
-            return reply[0][3:]
-
-        # status for socket communications is OK or ERROR
-        if reply[0] == "ERROR":
-            raise azcam.exceptions.AzcamError(f"command error: {reply}")
-        elif reply[0] == "OK":
-            if len(reply) == 1:
-                return None
-            elif len(reply) == 2:
-                return reply[1]
-            else:
-                return reply[1:]
-        else:
+        error = True
+        try:
+            value = parse_reply(command, tokenize_reply(command, reply))
+            error = False
+        finally:
+            self.stats.record(
+                command,
+                received - checkout,
+                time.perf_counter() - received,
+                checkout - start,
+                len(command.encode()) + 1,
+                len(reply.encode()),
+                error,
+            )
+
+        return value
+
+    def command_batch(self, commands: list[str]) -> list:
+        """
+        Send a list of commands to a server process as one batch and return the replies in order.
+        The connection is held for the entire batch so commands from other callers cannot be
+        interleaved with it. azcamserver reads and executes one command at a time, so each reply
+        is received before the next command is sent.
+
+        A command which fails does not stop the batch. Its entry in the returned list is the
+        `AzcamError` describing the failure instead of a reply.
+
+        Args:
+            commands: list of command strings
+
+        Returns:
+            list of replies (None, a string, a list, or an AzcamError) for each command.
+        """
+
+        replies = []
+
+        start = time.perf_counter()
+        with self.pool.checkout() as remserver, remserver.lock:
+            checkout = time.perf_counter()
+            wait = checkout - start
+
+            for command in commands:
+                sent = time.perf_counter()
+                reply = self._exchange(remserver, command)
+                received = time.perf_counter()
+
+                try:
+                    replies.append(parse_reply(command, tokenize_reply(command, reply)))
+                    error = False
+                except azcam.exceptions.AzcamError as e:
+                    replies.append(e)
+                    error = True
+
+                self.stats.record(
+                    command,
+                    received - sent,
+                    time.perf_counter() - received,
+                    wait,
+                    len(command.encode()) + 1,
+                    len(reply.encode()),
+                    error,
+                )
+                wait = 0.0
+
+        return replies
+
+    def _exchange(self, remserver: azcam.sockets.SocketInterface, command: str) -> str:
+        """
+        Send one command on a socket and return the raw reply string.
+        The caller must hold the socket lock.
+        """
+
+        if not open_registered(remserver):
             raise azcam.exceptions.AzcamError(
-                f"invalid server response: { ' '.join(reply)}"
+                "could not open connection to server", error_code=2
             )
 
-        return  # can't get here
+        try:
+            remserver.send(command, "\n")
+            reply = remserver.recv(-1, "\n")
+        except socket.timeout:
+            raise azcam.exceptions.AzcamError(f"Command timeout: {command}")
+        except OSError:
+            raise azcam.exceptions.AzcamError("Connection aborted")
+        remserver.last_response = reply
+
+        return reply
+
+
+def open_registered(remserver: azcam.sockets.SocketInterface) -> bool:
+    """
+    Open a socket connection if it is closed and register it as a console.
+    The caller must hold the socket lock if the socket is shared.
+
+    Args:
+        remserver: socket interface
+
+    Returns:
+        True if the socket is open.
+    """
+
+    if remserver.socket is not None:
+        return True
+
+    if not remserver.open():
+        return False
+
+    try:
+        remserver.send("register console", "\n")
+        remserver.recv(-1, "\n")
+    except (OSError, azcam.exceptions.AzcamError):
+        remserver.close()
+        return False
+
+    return True
+
+
+def tokenize_reply(command: str, reply: str) -> list:
+    """
+    Tokenize a raw server reply string the same way as the socket interface.
+
+    Args:
+        command: command string which was sent
+        reply: reply string received, without terminator
+
+    Returns:
+        list of reply tokens.
+    """
+
+    if command in ["exposure.get_status", "get_status"]:
+        return [reply.strip()]
+
+    return shlex.split(reply)
+
+
+def parse_reply(command: str, reply: list):
+    """
+    Check the status of a tokenized server reply and return its value.
+
+    Args:
+        command: command string which was sent
+        reply: tokenized reply
+
+    Returns:
+        None, a string, or a list of strings.
+    """
+
+    if command in ["exposure.get_status", "get_status"]:
+        return reply[0][3:]
+
+    # status for socket communications is OK or ERROR
+    if reply[0] == "ERROR":
+        raise azcam.exceptions.AzcamError(f"command error: {reply}")
+    elif reply[0] == "OK":
+        if len(reply) == 1:
+            return None
+        elif len(reply) == 2:
+            return reply[1]
+        else:
+            return reply[1:]
+    else:
+        raise azcam.exceptions.AzcamError(
+            f"invalid server response: { ' '.join(reply)}"
+        )
+
+    return  # can't get here
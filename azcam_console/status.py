@@ -0,0 +1,435 @@
+"""
+Exposure status and telemetry for consoles.
+
+`StatusSnapshot` holds system telemetry from the server "get_status" dictionary and
+the few instrument values it does not include, read with four commands on one connection.
+
+azcamserver only answers commands, so a subscription polls the exposure state on its own
+socket connection in a background thread and delivers an event only when the state changes.
+Each poll is one command: the exposure flag alone while idle, or "exposure.get_status" for
+state and progress while an exposure is in progress. A change between the two is polled
+again at once, so short exposures and readouts are not missed.
+"""
+
+import dataclasses
+import json
+import queue
+import threading
+import time
+from typing import Callable, Iterator
+
+import azcam
+import azcam.sockets
+import azcam.exceptions
+from azcam_console.server_comm import parse_reply
+
+# command polled for the exposure state while idle
+EXPOSURE_FLAG_COMMAND = "exposure.get_exposureflag"
+
+# command polled for exposure state and progress during an exposure
+EXPOSURE_STATUS_COMMAND = "exposure.get_status"
+
+# exposure states for which "get_status" reports the state name and progress
+PROGRESS_STATES = ["EXPOSING", "READOUT", "SETUP"]
+
+# commands sent for a status snapshot, "get_status" then the values it does not include
+STATUS_SNAPSHOT_COMMANDS = [
+    "get_status",
+    "instrument.get_pressures",
+    "instrument.get_wavelength 0",
+    "instrument.get_filter 0",
+]
+
+
+@dataclasses.dataclass
+class ExposureEvent:
+    """
+    Exposure state and progress at one time.
+    """
+
+    #: exposure flag value (see azcam.db.exposureflags), -1 if unknown
+    exposureflag: int
+    #: exposure flag name, such as "EXPOSING" or "READOUT"
+    exposurestate: str
+    #: server progress bar value in percent, remaining exposure time or pixels
+    progress: float
+    #: time.time() when the state was read
+    timestamp: float
+
+    def changed(self, other: "ExposureEvent | None") -> bool:
+        """
+        Return True if the state differs from another event (timestamps are ignored).
+        """
+
+        if other is None:
+            return True
+
+        return (self.exposureflag, self.exposurestate, self.progress) != (
+            other.exposureflag,
+            other.exposurestate,
+            other.progress,
+        )
+
+
+def _status_flag(status: dict) -> tuple[int, str]:
+    """
+    Return exposure flag value and name from a "get_status" dictionary.
+    The server names only PROGRESS_STATES, others are returned as NONE with name "".
+    """
+
+    exposurestate = status.get("exposurestate")
+    if exposurestate is None:
+        return -1, ""
+    elif exposurestate == "":
+        return azcam.db.exposureflags["NONE"], ""
+    else:
+        return azcam.db.exposureflags.get(exposurestate, -1), exposurestate
+
+
+def make_exposure_event(command: str, reply) -> ExposureEvent | None:
+    """
+    Create an ExposureEvent from the reply to EXPOSURE_FLAG_COMMAND or
+    EXPOSURE_STATUS_COMMAND. An error reply to EXPOSURE_FLAG_COMMAND gives a flag of -1.
+
+    Args:
+        command: command which was sent
+        reply: parsed reply
+
+    Returns:
+        exposure event, or None if an EXPOSURE_STATUS_COMMAND reply does not name the
+        state and the flag must be read
+    """
+
+    if command == EXPOSURE_STATUS_COMMAND:
+        try:
+            status = json.loads(reply)
+        except (TypeError, ValueError):
+            return None
+        exposureflag, exposurestate = _status_flag(status)
+        if exposurestate not in PROGRESS_STATES:
+            return None
+        try:
+            progress = round(float(status.get("progressbar")), 1)
+        except (TypeError, ValueError):
+            progress = 0.0
+        return ExposureEvent(exposureflag, exposurestate, progress, time.time())
+
+    # flag is [value, name] from current servers, value only from older servers
+    if isinstance(reply, azcam.exceptions.AzcamError) or reply is None:
+        exposureflag, exposurestate = -1, ""
+    elif type(reply) == list:
+        exposureflag, exposurestate = int(reply[0]), reply[1]
+    else:
+        exposureflag = int(reply)
+        flags_rev = {v: k for k, v in azcam.db.exposureflags.items()}
+        exposurestate = flags_rev.get(exposureflag, "")
+
+    return ExposureEvent(exposureflag, exposurestate, 0.0, time.time())
+
+
+def next_poll_command(event: ExposureEvent | None) -> str:
+    """
+    Return the command to poll after an event, which may be None if the state is unknown.
+    """
+
+    if event is not None and event.exposurestate in PROGRESS_STATES:
+        return EXPOSURE_STATUS_COMMAND
+    else:
+        return EXPOSURE_FLAG_COMMAND
+
+
+@dataclasses.dataclass
+class StatusSnapshot:
+    """
+    System telemetry read with STATUS_SNAPSHOT_COMMANDS.
+    Values which could not be read (for example with no instrument) are None.
+    """
+
+    #: exposure flag value (see azcam.db.exposureflags), -1 if unknown
+    exposureflag: int
+    #: exposure flag name, such as "EXPOSING" or "READOUT", "" when idle
+    exposurestate: str
+    #: server progress bar value in percent, remaining exposure time or pixels
+    progress: float
+    #: filename of the next image
+    filename: str | None
+    #: camera and dewar temperatures in Celsius
+    temperatures: list[float] | None
+    #: all instrument pressures
+    pressures: list[float] | None
+    #: instrument wavelength in nm
+    wavelength: float | None
+    #: instrument filter name
+    filter: str | None
+    #: time.time() when the snapshot was read
+    timestamp: float
+
+
+def _float_list(reply) -> list[float] | None:
+    """
+    Return a reply of one or more numbers as a list of floats, or None on error.
+    """
+
+    if reply is None or isinstance(reply, azcam.exceptions.AzcamError):
+        return None
+
+    if type(reply) == str:
+        reply = reply.split(" ")
+
+    try:
+        return [float(x) for x in reply]
+    except ValueError:
+        return None
+
+
+def make_status_snapshot(replies: list) -> StatusSnapshot:
+    """
+    Create a StatusSnapshot from the replies to STATUS_SNAPSHOT_COMMANDS.
+
+    Args:
+        replies: list of parsed replies, the first is the JSON "get_status" reply
+
+    Returns:
+        status snapshot
+    """
+
+    try:
+        status = json.loads(replies[0])
+    except (TypeError, ValueError):
+        status = {}
+
+    pressures, wavelength, filter_name = [
+        None if isinstance(reply, azcam.exceptions.AzcamError) else reply
+        for reply in replies[1:]
+    ]
+
+    exposureflag, exposurestate = _status_flag(status)
+
+    try:
+        progress = float(status.get("progressbar"))
+    except (TypeError, ValueError):
+        progress = 0.0
+
+    if "camtemp" in status and "dewtemp" in status:
+        temperatures = _float_list([status["camtemp"], status["dewtemp"]])
+    else:
+        temperatures = None
+
+    try:
+        wavelength = float(wavelength)
+    except (TypeError, ValueError):
+        wavelength = None
+
+    if type(filter_name) == list:
+        filter_name = " ".join(filter_name)
+
+    return StatusSnapshot(
+        exposureflag,
+        exposurestate,
+        progress,
+        status.get("filename"),
+        temperatures,
+        _float_list(pressures),
+        wavelength,
+        filter_name,
+        time.time(),
+    )
+
+
+class StatusSubscription(object):
+    """
+    Subscription to exposure state and readout progress events.
+    A dedicated socket connection is used so polling never waits on console commands.
+
+    Usage:
+        with azcam.db.tools["exposure"].subscribe() as subscription:
+            azcam.db.tools["exposure"].expose1(10, "flat", "flat")
+            for event in subscription.events(timeout=60):
+                print(event.exposurestate, event.progress)
+                if event.exposurestate == "NONE":
+                    break
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 2402,
+        active_interval: float = 0.25,
+        idle_interval: float = 0.1,
+        queue_size: int = 1000,
+    ) -> None:
+        """
+        Args:
+            host: server host name
+            port: server port number
+            active_interval: poll interval in seconds while an exposure is in progress
+            idle_interval: poll interval in seconds when idle
+            queue_size: maximum number of undelivered events, oldest are discarded first
+        """
+
+        self.host = host
+        self.port = port
+
+        #: poll interval in seconds while an exposure is in progress
+        self.active_interval = active_interval
+
+        #: poll interval in seconds when idle
+        self.idle_interval = idle_interval
+
+        #: most recent event
+        self.latest: ExposureEvent | None = None
+
+        #: True while the subscription is running
+        self.is_running = False
+
+        self._events = queue.Queue(queue_size)
+        self._callbacks = []
+        self._socket = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self) -> None:
+        """
+        Open the status connection and start polling.
+        """
+
+        if self.is_running:
+            return
+
+        self._socket = azcam.sockets.SocketInterface(self.host, self.port)
+        if not self._socket.open():
+            raise azcam.exceptions.AzcamError(
+                "could not open connection to server", error_code=2
+            )
+        self._socket.command("register console")
+
+        self._stop.clear()
+        self.is_running = True
+        self._thread = threading.Thread(
+            target=self._run, name="status_subscription", daemon=True
+        )
+        self._thread.start()
+
+        return
+
+    def stop(self) -> None:
+        """
+        Stop polling and close the status connection.
+        """
+
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+        return
+
+    def add_callback(self, callback: Callable[[ExposureEvent], None]) -> None:
+        """
+        Add a function called from the polling thread with each new event.
+
+        Args:
+            callback: function with one ExposureEvent argument
+        """
+
+        self._callbacks.append(callback)
+
+        return
+
+    def events(self, timeout: float | None = None) -> Iterator[ExposureEvent]:
+        """
+        Generator which yields events as they occur, until the subscription is stopped.
+
+        Args:
+            timeout: maximum time in seconds to wait for the next event, None to wait forever
+        """
+
+        while True:
+            try:
+                event = self._events.get(timeout=timeout)
+            except queue.Empty:
+                return
+
+            if event is None:
+                return
+
+            yield event
+
+    def _run(self) -> None:
+        """
+        Poll the exposure state until stopped.
+        """
+
+        try:
+            command = EXPOSURE_FLAG_COMMAND
+            repolled = False
+            while not self._stop.is_set():
+                try:
+                    reply = parse_reply(command, self._socket.command(command))
+                except azcam.exceptions.AzcamError as e:
+                    reply = e
+
+                event = make_exposure_event(command, reply)
+                if event is not None and event.changed(self.latest):
+                    self.latest = event
+                    self._deliver(event)
+
+                # state changed between idle and in progress, poll again at once
+                poll_command = next_poll_command(event)
+                if poll_command != command and not repolled:
+                    command, repolled = poll_command, True
+                    continue
+                command, repolled = poll_command, False
+
+                if self.latest.exposureflag > 0:
+                    self._stop.wait(self.active_interval)
+                else:
+                    self._stop.wait(self.idle_interval)
+        except Exception as e:
+            azcam.log(f"status subscription stopped: {e}")
+        finally:
+            self.is_running = False
+            self._put(None)
+
+        return
+
+    def _deliver(self, event: ExposureEvent) -> None:
+        """
+        Queue an event and call callbacks.
+        """
+
+        self._put(event)
+
+        for callback in self._callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                azcam.log(f"status callback error: {e}")
+
+        return
+
+    def _put(self, event: ExposureEvent | None) -> None:
+        """
+        Queue an event, discarding the oldest if the queue is full.
+        """
+
+        while True:
+            try:
+                self._events.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._events.get_nowait()
+                except queue.Empty:
+                    pass
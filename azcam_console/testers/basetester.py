@@ -1,3 +1,4 @@
+import concurrent.futures
 import json
 
 import azcam
@@ -51,6 +52,15 @@ class Tester(Tools, Report):
         self.create_plots = True
         """True to generate plots during analysis"""
 
+        self.pipelined = False
+        """True to analyze each image in a worker thread while the next is acquired"""
+
+        self.number_workers = 1
+        """number of processes for overscan correction and channel analysis, 1 to not use processes"""
+
+        self._pipeline = None
+        self._pipeline_futures = []
+
         # all testers are initialized and reset at creation
         self.initialize()
         self.reset()
@@ -87,6 +97,71 @@ class Tester(Tools, Report):
 
         raise NotImplementedError("analyze() not defined")
 
+    def analyze_frame(self, filename):
+        """
+        Analyze one newly acquired image in pipelined mode.
+        Called in acquisition order from a worker thread, so it must use absolute
+        filenames and not change the current folder.
+        """
+
+        raise NotImplementedError("analyze_frame() not defined")
+
+    def pipeline_start(self):
+        """
+        Start the pipelined analysis worker.
+        """
+
+        # discard a worker left by a failed acquisition
+        if self._pipeline is not None:
+            self._pipeline.shutdown(cancel_futures=True)
+
+        self._pipeline = concurrent.futures.ThreadPoolExecutor(
+            1, thread_name_prefix=self.tool_id
+        )
+        self._pipeline_futures = []
+
+        return
+
+    def pipeline_expose(self, exposure_time, imagetype, title):
+        """
+        Make an exposure. If the pipeline is running, the finished image is then
+        queued for analyze_frame() while acquisition continues.
+        expose() returns only after the server has written the image, so no
+        other completion notification is needed.
+        Returns the image filename.
+        """
+
+        exposure = azcam.db.tools["exposure"]
+
+        filename = exposure.get_filename()
+        exposure.expose(exposure_time, imagetype, title)
+
+        if self._pipeline is not None:
+            self._pipeline_futures.append(
+                self._pipeline.submit(self.analyze_frame, filename)
+            )
+
+        return filename
+
+    def pipeline_finish(self):
+        """
+        Wait for all queued images to be analyzed and stop the worker.
+        Raises the first error from analyze_frame().
+        """
+
+        if self._pipeline is None:
+            return
+
+        try:
+            for future in self._pipeline_futures:
+                future.result()
+        finally:
+            self._pipeline.shutdown()
+            self._pipeline = None
+            self._pipeline_futures = []
+
+        return
+
     def write_datafile(self):
         """
         Write data file as a json dump.
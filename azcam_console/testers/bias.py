@@ -1,5 +1,4 @@
 import os
-import shutil
 import time
 
 import numpy
@@ -10,8 +9,11 @@ import azcam.utils
 import azcam.fits
 import azcam.image
 import azcam_console.utils
+import azcam_console.combine
 from azcam_console.plot import plt, save_figure
 from azcam_console.testers.basetester import Tester
+from azcam_console.testers.calibration import assemble_data
+from azcam_console.testers.workspace import colbias_data
 
 
 class Bias(Tester):
@@ -50,11 +52,8 @@ class Bias(Tester):
 
         self.imageplot_scale = 3.0
 
-        #: list of image data from all frames [N][y][x]
-        self.datacube = numpy.array
-
-        #: list of azcam images
-        self.bias_images = []
+        #: maximum memory used to combine images [bytes]
+        self.memory_bytes = 2**28
 
         #: list of all bias filenames
         self.bias_filenames = []
@@ -88,36 +87,37 @@ class Bias(Tester):
 
         azcam.log("Acquiring bias sequence")
 
-        # save pars to be changed
-        impars = {}
-        azcam.utils.save_imagepars(impars)
-
-        # create subfolder
-        currentfolder, subfolder = azcam_console.utils.make_file_folder("bias")
-        azcam.utils.curdir(subfolder)
-        azcam.db.parameters.set_par("imagefolder", subfolder)
-        azcam.db.parameters.set_par("imageroot", "bias.")
-        azcam.db.parameters.set_par("imageincludesequencenumber", 1)
-        azcam.db.parameters.set_par("imageautoname", 0)
-        azcam.db.parameters.set_par("imageautoincrementsequencenumber", 1)
-        azcam.db.parameters.set_par("imagetest", 0)
-
-        # clear sensor
-        azcam.db.tools["exposure"].test(0)
-
-        # take bias images
-        azcam.db.parameters.set_par("imagetype", "zero")
-        for i in range(self.number_images_acquire):
-            filename = os.path.basename(azcam.db.tools["exposure"].get_filename())
-            azcam.log(
-                f"Taking bias image {i + 1}/{self.number_images_acquire}: {filename}"
+        # save image pars, restored on exit
+        with azcam.db.parameters.imagepars():
+            # create subfolder
+            currentfolder, subfolder = azcam_console.utils.make_file_folder("bias")
+            azcam.utils.curdir(subfolder)
+            azcam.db.parameters.set_pars(
+                {
+                    "imagefolder": subfolder,
+                    "imageroot": "bias.",
+                    "imageincludesequencenumber": 1,
+                    "imageautoname": 0,
+                    "imageautoincrementsequencenumber": 1,
+                    "imagetest": 0,
+                }
             )
-            azcam.db.tools["exposure"].expose(0, "zero", "bias image")
-            if i < self.number_images_acquire - 1:
-                time.sleep(self.delay)
+
+            # clear sensor
+            azcam.db.tools["exposure"].test(0)
+
+            # take bias images
+            azcam.db.parameters.set_par("imagetype", "zero")
+            for i in range(self.number_images_acquire):
+                filename = os.path.basename(azcam.db.tools["exposure"].get_filename())
+                azcam.log(
+                    f"Taking bias image {i + 1}/{self.number_images_acquire}: {filename}"
+                )
+                azcam.db.tools["exposure"].expose(0, "zero", "bias image")
+                if i < self.number_images_acquire - 1:
+                    time.sleep(self.delay)
 
         # finish
-        azcam.utils.restore_imagepars(impars)
         azcam.utils.curdir(currentfolder)
 
         azcam.log("Bias sequence finished")
@@ -165,20 +165,22 @@ class Bias(Tester):
             )
             nextfile = azcam.utils.fix_path(nextfile)
 
-        # make assembled images
-        self.bias_images = []
-        for frame in self.bias_filenames:
-            im = azcam.image.Image(frame)
-            im.assemble(1)  # assembled an trim overscan
-            self.bias_images.append(im)
-
-        # indices are: [imagenum][y][x]
-        self.datacube = numpy.stack([im.buffer for im in self.bias_images])
+        # combine all frames in one pass, making superbias and statistics images
+        azcam.log(f"Creating superbias image: {self.superbias_filename}")
+        result = azcam_console.combine.combine(
+            self.bias_filenames,
+            self.superbias_filename,
+            self.combination_type,
+            datatype="uint16",
+            statistics=True,
+            memory_bytes=self.memory_bytes,
+        )
 
-        # create 2D images from stats, index is extension
-        self.mean_image = self.datacube.mean(axis=0)
-        self.median_image = numpy.median(self.datacube, axis=0)
-        self.sdev_image = self.datacube.std(axis=0)
+        # create assembled 2D images from stats
+        template = azcam.image.Image(self.bias_filenames[0])
+        self.mean_image = assemble_data(template, result.mean)
+        self.median_image = assemble_data(template, result.median)
+        self.sdev_image = assemble_data(template, result.sdev)
 
         # get list of status for each ext
         self.mean = self.mean_image.mean()
@@ -187,24 +189,25 @@ class Bias(Tester):
         self.mean_noise = self.sdev_image.mean()
         self.median_noise = numpy.median(self.sdev_image)
 
-        # make superbias
-        azcam.log(f"Creating superbias image: {self.superbias_filename}")
-        azcam.fits.combine(
-            self.bias_filenames,
-            self.superbias_filename,
-            "median",
-            overscan_correct=0,
-            datatype="uint16",
-        )
-
-        # make debiased image (superbias with debias)
+        # make debiased image (superbias with debias) from the combined data,
+        # superbias values as written to the uint16 superbias image
         azcam.log(f"Creating debiased image: {self.debiased_filename}")
+        debiased = [data.astype("uint16").astype("float32") for data in result.combined]
         if self.overscan_correct == 1:
-            shutil.copy(self.superbias_filename, self.debiased_filename)
-            azcam.fits.colbias(self.debiased_filename, self.fit_order)
+            header = result.headers[result.first_ext]
+            for data in debiased:
+                colbias_data(data, header, self.fit_order)
+            azcam_console.combine.write_image(
+                self.debiased_filename,
+                result.headers,
+                debiased,
+                "float32",
+                "COLBIAS data was column overscan corrected",
+            )
         else:
-            azcam.fits.arith(
-                self.superbias_filename, "-", self.mean, self.debiased_filename
+            debiased = [numpy.clip(data - self.mean, 0, 2**16) for data in debiased]
+            azcam_console.combine.write_image(
+                self.debiased_filename, result.headers, debiased, "uint16"
             )
 
         self.plot()
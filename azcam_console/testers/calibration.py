@@ -0,0 +1,229 @@
+"""
+In-memory calibration chain for tester analysis.
+
+A chain is a list of calibration steps applied in order to the amplifier data of an
+image read once from disk. No intermediate files are written, the calibrated image is
+written only when an output filename is given.
+
+Usage:
+    chain = CalibrationChain()
+    chain.overscan(fit_order=3).superbias("debiased.fits").gain(system_gain).assemble()
+    image = chain.apply("prnu.0002.fits", "prnu_500.fits")
+    mean = image.buffer.mean()
+"""
+
+import os
+
+import numpy
+
+import azcam
+import azcam.utils
+import azcam.image
+import azcam.exceptions
+from azcam_console.fits_cache import fits_cache
+from azcam_console.fits_mmap import MappedFits
+from azcam_console.testers.workspace import colbias_data
+
+
+class CalibrationChain(object):
+    """
+    Ordered calibration steps applied to azcam.image.Image data in memory.
+    Step methods return the chain so steps may be composed in one statement.
+    """
+
+    def __init__(self) -> None:
+        #: list of (step name, function) in order of application
+        self.steps = []
+
+    def overscan(self, fit_order: int = 3, margin_cols: int = 0) -> "CalibrationChain":
+        """
+        Add column overscan correction, as azcam.fits.colbias().
+
+        Args:
+            fit_order: polynomial fit order, use 0 to remove median not fitted value
+            margin_cols: number of overscan columns to skip before correction
+        """
+
+        def step(image, amps):
+            header = image.hdulist[_first_ext(image)].header
+            for data in amps:
+                colbias_data(data, header, fit_order, margin_cols)
+
+        self.steps.append(("overscan", step))
+
+        return self
+
+    def superbias(self, filename: str, cache: bool = True) -> "CalibrationChain":
+        """
+        Add subtraction of a superbias or zero image.
+
+        Args:
+            filename: image filename with the same extensions as calibrated images
+            cache: True to keep the image in fits_cache, False for images used only once
+        """
+
+        self.steps.append(("superbias", _subtract_image_step(filename, 1.0, cache)))
+
+        return self
+
+    def dark(self, filename: str, scale: float = 1.0) -> "CalibrationChain":
+        """
+        Add subtraction of a dark image.
+
+        Args:
+            filename: dark image filename with the same extensions as calibrated images
+            scale: scale factor applied to the dark image, such as an exposure time ratio
+        """
+
+        self.steps.append(("dark", _subtract_image_step(filename, scale)))
+
+        return self
+
+    def gain(
+        self, gains: list[float], offsets: list[float] | None = None
+    ) -> "CalibrationChain":
+        """
+        Add scaling to electrons as (data - offset) * gain for each amplifier,
+        as azcam.image.Image.set_scaling().
+
+        Args:
+            gains: system gain of each amplifier in [e/DN]
+            offsets: offset or bias value of each amplifier, None for no offset
+        """
+
+        def step(image, amps):
+            for chan, data in enumerate(amps):
+                if offsets is not None:
+                    data -= offsets[chan]
+                data *= gains[chan]
+
+        self.steps.append(("gain", step))
+
+        return self
+
+    def assemble(self, trim: int = 1) -> "CalibrationChain":
+        """
+        Add assembly of all amplifiers into image.buffer, as azcam.image.Image.assemble().
+        This must be the last step.
+
+        Args:
+            trim: 1 to remove prescan and overscan pixels
+        """
+
+        def step(image, amps):
+            image.set_scaling(None, None)
+            image.assemble(trim)
+
+        self.steps.append(("assemble", step))
+
+        return self
+
+    def apply(
+        self, filename: str, output_filename: str | None = None
+    ) -> azcam.image.Image:
+        """
+        Read an image and apply all calibration steps.
+
+        Args:
+            filename: image filename, which is not changed
+            output_filename: filename for the calibrated image, None to not write it.
+                Assembled images are written as a single float image, others as MEF.
+
+        Returns:
+            calibrated image, assembled data is in .buffer and amplifier data in .data
+        """
+
+        filename = azcam.utils.make_image_filename(filename)
+        image = azcam.image.Image(filename)
+        amps = get_amplifier_data(image)
+
+        for _, step in self.steps:
+            step(image, amps)
+
+        if output_filename is not None:
+            image.save_data_format = -32
+            if image.assembled:
+                image.write_file(output_filename, 6)
+            else:
+                image.write_file(output_filename, 1)
+
+        return image
+
+
+def get_amplifier_data(image: azcam.image.Image) -> list[numpy.ndarray]:
+    """
+    Return views of the data of each amplifier of an image as [rows, cols].
+    Changing a view changes image.data.
+
+    Args:
+        image: image read from a file
+    """
+
+    rows = image.focalplane.numrows_amp
+    cols = image.focalplane.numcols_amp
+
+    return [data.reshape(rows, cols) for data in image.data]
+
+
+def assemble_data(
+    image: azcam.image.Image, amps: list[numpy.ndarray], trim: int = 1
+) -> numpy.ndarray:
+    """
+    Assemble amplifier data with the geometry of an image, as azcam.image.Image.assemble().
+    The data of the image are replaced.
+
+    Args:
+        image: image read from a file with the same geometry as amps
+        amps: data of each amplifier as [rows, cols]
+        trim: 1 to remove prescan and overscan pixels
+
+    Returns:
+        assembled data as [rows, cols]
+    """
+
+    image.data = numpy.array([data.ravel() for data in amps], dtype="float32")
+    image.assembled = 0
+    image.set_scaling(None, None)
+    image.assemble(trim)
+
+    return image.buffer
+
+
+def _first_ext(image: azcam.image.Image) -> int:
+    """
+    Return the HDU number of the first amplifier of an image.
+    """
+
+    return 0 if image.num_extensions == 0 else 1
+
+
+def _subtract_image_step(filename: str, scale: float, cache: bool = True):
+    """
+    Return a step which subtracts a scaled image, read once and cached unless cache
+    is False, in which case each extension is read from a memory map when applied.
+    """
+
+    filename = os.path.abspath(azcam.utils.make_image_filename(filename))
+
+    def subtract(amp, data):
+        if scale == 1.0:
+            amp -= data
+        else:
+            amp -= scale * data.astype("float32")
+
+    def step(image, amps):
+        first_ext = _first_ext(image)
+        if cache:
+            data = fits_cache.read(filename)[1]
+            if len(data) - first_ext < len(amps):
+                raise azcam.exceptions.AzcamError("unequal FITS image extensions")
+            for chan, amp in enumerate(amps):
+                subtract(amp, data[first_ext + chan])
+        else:
+            with MappedFits(filename) as subimage:
+                if subimage.get_extensions()[2] - first_ext < len(amps):
+                    raise azcam.exceptions.AzcamError("unequal FITS image extensions")
+                for chan, amp in enumerate(amps):
+                    subtract(amp, subimage.section(first_ext + chan))
+
+    return step
@@ -1,4 +1,3 @@
-import glob
 import os
 import shutil
 
@@ -9,8 +8,10 @@ import azcam.utils
 import azcam.fits
 import azcam.image
 import azcam_console.plot
+import azcam_console.combine
 from azcam_console.plot import plt
 from azcam_console.testers.basetester import Tester
+from azcam_console.testers.workspace import AnalysisWorkspace
 
 
 class Dark(Tester):
@@ -31,6 +32,9 @@ class Dark(Tester):
         self.fit_order = 3
         """fit order for overscan correction"""
 
+        self.memory_bytes = 2**28
+        """maximum memory used to combine images [bytes]"""
+
         self.mean_dark_spec = -1  # spec on mean dark signal
         self.grade_dark_signal = 1
         self.dark_signal_grade = "UNKNOWN"
@@ -96,49 +100,46 @@ class Dark(Tester):
 
         exposure, tempcon = azcam_console.utils.get_tools(["exposure", "tempcon"])
 
-        # save pars to be changed
-        impars = {}
-        azcam.utils.save_imagepars(impars)
-
-        # create new subfolder
-        currentfolder, newfolder = azcam_console.utils.make_file_folder("dark")
-        azcam.db.parameters.set_par("imagefolder", newfolder)
-
-        # clear device
-        exposure.test(0)
-
-        azcam.db.parameters.set_par("imageroot", "dark.")  # for automatic data analysis
-        azcam.db.parameters.set_par(
-            "imageincludesequencenumber", 1
-        )  # use sequence numbers
-        azcam.db.parameters.set_par("imageautoname", 0)  # manually set name
-        azcam.db.parameters.set_par(
-            "imageautoincrementsequencenumber", 1
-        )  # inc sequence numbers
-        azcam.db.parameters.set_par("imagetest", 0)  # turn off TestImage
-
-        # loop through images
-        for imgnum in range(self.number_images_acquire):
-            # pre-dark bias
-            azcam.db.parameters.set_par("imagetype", "dark")  # for GetFilename
-            filename = os.path.basename(exposure.get_filename())
-            azcam.log(f"Taking pre-dark image: {filename}")
-            temp = tempcon.get_temperatures()
-            azcam.log(f"Current temperatures: {temp}")
-            exposure.expose(0, "zero", "pre-dark bias image")
-
-            # take dark image
-            azcam.db.parameters.set_par("imagetype", "dark")
-            filename = os.path.basename(exposure.get_filename())
-            azcam.log(
-                f"Taking dark image {imgnum + 1}/{self.number_images_acquire} for {self.exposure_time:0.3f} seconds: {filename}"
+        # save image pars, restored on exit
+        with azcam.db.parameters.imagepars():
+            # create new subfolder
+            currentfolder, newfolder = azcam_console.utils.make_file_folder("dark")
+            azcam.db.parameters.set_par("imagefolder", newfolder)
+
+            # clear device
+            exposure.test(0)
+
+            azcam.db.parameters.set_pars(
+                {
+                    "imageroot": "dark.",  # for automatic data analysis
+                    "imageincludesequencenumber": 1,  # use sequence numbers
+                    "imageautoname": 0,  # manually set name
+                    "imageautoincrementsequencenumber": 1,  # inc sequence numbers
+                    "imagetest": 0,  # turn off TestImage
+                }
             )
-            temp = tempcon.get_temperatures()
-            azcam.log(f"  Current temperatures: {temp}")
-            exposure.expose(self.exposure_time, "dark", "dark image")
+
+            # loop through images
+            for imgnum in range(self.number_images_acquire):
+                # pre-dark bias
+                azcam.db.parameters.set_par("imagetype", "dark")  # for GetFilename
+                filename = os.path.basename(exposure.get_filename())
+                azcam.log(f"Taking pre-dark image: {filename}")
+                temp = tempcon.get_temperatures()
+                azcam.log(f"Current temperatures: {temp}")
+                exposure.expose(0, "zero", "pre-dark bias image")
+
+                # take dark image
+                azcam.db.parameters.set_par("imagetype", "dark")
+                filename = os.path.basename(exposure.get_filename())
+                azcam.log(
+                    f"Taking dark image {imgnum + 1}/{self.number_images_acquire} for {self.exposure_time:0.3f} seconds: {filename}"
+                )
+                temp = tempcon.get_temperatures()
+                azcam.log(f"  Current temperatures: {temp}")
+                exposure.expose(self.exposure_time, "dark", "dark image")
 
         # finish
-        azcam.utils.restore_imagepars(impars)
         azcam.utils.curdir(currentfolder)
         azcam.log("Dark sequence finished")
 
@@ -173,11 +174,11 @@ class Dark(Tester):
             self.units_scale = 1
             self.units_text = "e/pix/sec"
 
-        # copy files to analysis subfolder
-        azcam.log("Making copy of image files for analysis")
+        # link sequence files into analysis subfolder, corrected images replace links,
+        # output files of a previous analysis are not linked as they are written here
         startingfolder, subfolder = azcam_console.utils.make_file_folder(subfolder)
-        for filename in glob.glob(os.path.join(startingfolder, "*.fits")):
-            shutil.copy(filename, subfolder)
+        workspace = AnalysisWorkspace(startingfolder, subfolder)
+        workspace.add_files(rootname + "*.fits")
         currentfolder = azcam.utils.curdir(subfolder)  # move to analysis folder
 
         # analyze a sequence
@@ -214,21 +215,30 @@ class Dark(Tester):
                 break
         numdarks = len(darklist)
 
+        # overscan correct images before combining, originals are not changed
+        if self.overscan_correct:
+            workspace.colbias_files(
+                biaslist + darklist,
+                fit_order=self.fit_order,
+                number_workers=self.number_workers,
+            )
+
         # median combine all bias images
         masterbias = self.bias_filename
         if numdarks == 1:
             s = f"One bias image found: {darklist[0]}"
+            if os.path.lexists(masterbias):
+                os.remove(masterbias)  # never write through a link
             shutil.copyfile(darklist[0], masterbias)
             if self.overscan_correct:
                 azcam.fits.colbias(masterbias, fit_order=self.fit_order)
         else:
-            azcam.fits.combine(
+            azcam_console.combine.combine(
                 biaslist,
                 masterbias,
                 "median",
-                overscan_correct=self.overscan_correct,
-                fit_order=self.fit_order,
                 datatype="float32",
+                memory_bytes=self.memory_bytes,
             )
             s = f"Number of bias images combined into {masterbias}: {numdarks}"
         azcam.log(s)
@@ -237,17 +247,18 @@ class Dark(Tester):
         masterdark = self.dark_filename
         if numdarks == 1:
             s = f"One dark image found: {darklist[0]}"
+            if os.path.lexists(masterdark):
+                os.remove(masterdark)  # never write through a link
             shutil.copyfile(darklist[0], masterdark)
             if self.overscan_correct:
                 azcam.fits.colbias(masterdark, fit_order=self.fit_order)
         else:
-            azcam.fits.combine(
+            azcam_console.combine.combine(
                 darklist,
                 masterdark,
                 "median",
-                overscan_correct=self.overscan_correct,
-                fit_order=self.fit_order,
                 datatype="float32",
+                memory_bytes=self.memory_bytes,
             )
             s = f"Number of dark images combined into {masterdark}: {numdarks}"
         azcam.log(s)
@@ -1,9 +1,9 @@
 import numpy
-from astropy.io import fits as pyfits
 
 import azcam
 import azcam.utils
 import azcam.fits
+from azcam_console.fits_mmap import MappedFits
 from azcam_console.testers.basetester import Tester
 
 
@@ -64,11 +64,12 @@ class Eper(Tester):
         _, first_ext, last_ext = azcam.fits.get_extensions(filename)
 
         # get image data (superflat is already bias corrected)
-        eperim = pyfits.open(filename)
+        eperim = MappedFits(filename)
 
         if self.dark_correct:
-            darkim = pyfits.open(self.dark_file)  # assume scaled correctly for now
-            self.darkim = darkim
+            darkim = MappedFits(self.dark_file)  # assume scaled correctly for now
+        else:
+            darkim = None
 
         # CTE is 1.0 - (Signal Overscan1 + Overscan2) / (Signal Last Row/Col) / (total shifts)
 
@@ -77,14 +78,9 @@ class Eper(Tester):
         self.hcte = []
         self.MeanData = []
 
-        self.imbufs = []
-        self.darkbufs = []
-
         for chan, ext in enumerate(range(first_ext, last_ext)):
             # get this image section size (all zero based)
-            hdr = eperim[ext].header
-            ncols = hdr["NAXIS1"]
-            nrows = hdr["NAXIS2"]
+            nrows, ncols = eperim.shape(ext)
 
             FirstBiasCol, _, FirstBiasRow, LastBiasRow = azcam.fits.get_section(
                 filename, "BIASSEC", chan + 1
@@ -97,23 +93,21 @@ class Eper(Tester):
             # BIASSEC keyword does not contain overscan row info
             FirstBiasRow = LastDataRow + 1
 
-            # get bias subtracted data as [rows,cols]
-            imbuf = numpy.reshape(eperim[ext].data, [nrows, ncols])
-
-            if self.dark_correct:
-                darkbuf = numpy.reshape(darkim[ext].data, [nrows, ncols])
-                self.darkbufs.append(darkbuf)
-                self.imbufs.append(imbuf)
-                imbuf = imbuf - darkbuf
-
             # vcte
             numvshifts = LastDataRow + 1 + self.number_prescan_rows
 
-            vdata = imbuf[LastDataRow, :]
+            vdata = self._get_section(
+                eperim, darkim, ext, [LastDataRow, LastDataRow + 1, 0, ncols]
+            )[0]
             sumvdata = vdata.sum()
             meanvdata = sumvdata / len(vdata)  # mean per pixel, should remove cols also
 
-            vbias = imbuf[FirstBiasRow : FirstBiasRow + self.number_bias_rows + 1, :]
+            vbias = self._get_section(
+                eperim,
+                darkim,
+                ext,
+                [FirstBiasRow, FirstBiasRow + self.number_bias_rows + 1, 0, ncols],
+            )
             vbias = vbias.sum(0)
             vbiasmean = vbias.mean()
             # azcam.log('vbias mean is',vbiasmean)
@@ -134,22 +128,27 @@ class Eper(Tester):
             numhshifts = LastDataCol + 1 + self.number_prescan_cols
 
             # sumhdata=imbuf[:,LastDataCol].sum()
-            sumhdata = imbuf[0:LastBiasRow, LastDataCol].sum()
-            meanhdata = sumhdata / len(
-                imbuf[0:LastBiasRow, LastDataCol]
-            )  # mean per pixel
+            hdata = self._get_section(
+                eperim, darkim, ext, [0, LastBiasRow, LastDataCol, LastDataCol + 1]
+            )[:, 0]
+            sumhdata = hdata.sum()
+            meanhdata = sumhdata / len(hdata)  # mean per pixel
 
             # sumhbias=imbuf[:,FirstBiasCol:FirstBiasCol+self.number_bias_cols+1].sum()
-            sumhbias = imbuf[
-                0:LastBiasRow, FirstBiasCol : FirstBiasCol + self.number_bias_cols + 1
-            ].sum()
-            sumhbias = max(sumhbias, 0.0)
-            meanhbias = sumhbias / len(
-                imbuf[
-                    0:LastBiasRow,
-                    FirstBiasCol : FirstBiasCol + self.number_bias_cols + 1,
-                ]
+            hbias = self._get_section(
+                eperim,
+                darkim,
+                ext,
+                [
+                    0,
+                    LastBiasRow,
+                    FirstBiasCol,
+                    FirstBiasCol + self.number_bias_cols + 1,
+                ],
             )
+            sumhbias = hbias.sum()
+            sumhbias = max(sumhbias, 0.0)
+            meanhbias = sumhbias / len(hbias)
 
             hcte = 1.0 - meanhbias / meanhdata / numhshifts
             hcte = min(hcte, 1.0)
@@ -159,6 +158,10 @@ class Eper(Tester):
             meandata = (meanhdata + meanvdata) / 2.0
             self.MeanData.append(meandata)
 
+        eperim.close()
+        if darkim is not None:
+            darkim.close()
+
         # log results
         for chan, vcte in enumerate(self.vcte):
             azcam.log(f"Chan. {chan:02d} VCTE: {vcte:.06f}")
@@ -211,6 +214,18 @@ class Eper(Tester):
 
         return
 
+    def _get_section(self, eperim, darkim, ext, roi):
+        """
+        Return a dark corrected image section as [rows,cols].
+        Only the section is read from the memory-mapped images.
+        """
+
+        data = eperim.section(ext, roi, "float64")
+        if darkim is not None:
+            data = data - darkim.section(ext, roi, "float64")
+
+        return data
+
     def report(self):
         """
         Write report file.
@@ -1,20 +1,21 @@
-import glob
+import concurrent.futures
 import math
 import os
 import shutil
-import warnings
+from multiprocessing import shared_memory
 
 import numpy
-import scipy.ndimage
-import scipy.ndimage.filters
-import scipy.optimize
-from astropy.io import fits as pyfits
 
 import azcam
 import azcam.utils
 import azcam.fits
+import azcam.exceptions
 import azcam_console.plot
+from azcam_console.fits_mmap import MappedFits
 from azcam_console.testers.basetester import Tester
+from azcam_console.testers import fe55_events
+from azcam_console.testers.workspace import AnalysisWorkspace
+from azcam_console.testers.calibration import CalibrationChain, get_amplifier_data
 
 # constants
 CON1 = 2.0 * numpy.sqrt(2.0 * numpy.log(2.0))  # 2.355 for sigma <=> FWHM
@@ -37,8 +38,8 @@ class Fe55(Tester):
         self.exposure_type = "fe55"
         self.gain_estimate = []
         self.bin_size = 4
-        self.max_images = -1  # limit numbe of image files analyzed
-        self.max_events = -1  # limit number events analyzed per channel
+        self.max_images = -1  # limit number of image pairs combined
+        self.max_events = -1  # limit number events fitted per channel for all images
 
         self.fit_order = 3
         """fit order for overscan correction"""
@@ -70,6 +71,11 @@ class Fe55(Tester):
         self.noise_threshold = 1.26  # threshhold factor above noise sigma
 
         self.data_file = "fe55.txt"
+
+        #: event catalog file written by analyze() and read by analyze_events(),
+        #: empty to not write it
+        self.events_file = "fe55_events.npz"
+
         self.report_file = "fe55"
         self.report_include_plots = 0  # include plots in report file
         self.make_plots = ["events", "histogram", "cte"]  # list of plots to generate
@@ -81,7 +87,7 @@ class Fe55(Tester):
 
         self.overscan_correct = 0
         self.zero_correct = 0
-        self.combine_images = 0  # True to sum Fe55 images into one image
+        self.combine_images = 0  # True to combine events of all bias/Fe55 image pairs
 
         self.system_gain = []
         self.means = []
@@ -101,6 +107,22 @@ class Fe55(Tester):
         # [yevents, xevents, zevents, fwhms, sigmas, fwhm_a, fwhm_b, angles] for each channel
         self.event_data = []
 
+        #: selected events of each channel as fe55_events.EVENT_DTYPE arrays
+        self.events = []
+
+        #: gaussian fits of events of each channel as fe55_events.GAUSSIAN_DTYPE arrays,
+        #: empty when fit_psf is not set
+        self.gaussians = []
+
+        #: event catalog of each channel as fe55_events.CATALOG_DTYPE arrays
+        self.catalogs = []
+
+        # channel image shape as [rows, cols], channels analyzed, and event detection
+        # parameters of the last analysis
+        self._image_shape = (0, 0)
+        self._channels_analyzed = []
+        self._detection = {}
+
         return
 
     def acquire(self):
@@ -112,51 +134,51 @@ class Fe55(Tester):
 
         azcam.log("Acquiring Fe-55 sequence")
 
-        # save pars to be changed
-        impars = {}
-        azcam.utils.save_imagepars(impars)
-
-        # create new subfolder
-        currentfolder, subfolder = azcam_console.utils.make_file_folder("fe55")
-        azcam.db.parameters.set_par("imagefolder", subfolder)
-
-        azcam.db.parameters.set_par("imageroot", "fe55.")  # for automatic data analysis
-        azcam.db.parameters.set_par(
-            "imageincludesequencenumber", 1
-        )  # use sequence numbers
-        azcam.db.parameters.set_par("imageautoname", 0)  # manually set name
-        azcam.db.parameters.set_par(
-            "imageautoincrementsequencenumber", 1
-        )  # inc sequence numbers
-        azcam.db.parameters.set_par("imagetest", 0)  # turn off TestImage
-
-        # clear device
-        azcam.db.tools["exposure"].test(0)
-
-        # loop through images
-        for imgnum in range(self.number_images_acquire):
-            azcam.log(
-                "Image set %d of %d for %.3f seconds..."
-                % (imgnum + 1, self.number_images_acquire, self.exposure_time)
+        # save image pars, restored on exit
+        with azcam.db.parameters.imagepars():
+            # create new subfolder
+            currentfolder, subfolder = azcam_console.utils.make_file_folder("fe55")
+            azcam.db.parameters.set_pars(
+                {
+                    "imagefolder": subfolder,
+                    "imageroot": "fe55.",  # for automatic data analysis
+                    "imageincludesequencenumber": 1,  # use sequence numbers
+                    "imageautoname": 0,  # manually set name
+                    "imageautoincrementsequencenumber": 1,  # inc sequence numbers
+                    "imagetest": 0,  # turn off TestImage
+                }
             )
 
-            # take bias image
-            azcam.db.parameters.set_par("imagetype", "zero")
-            azcam.log("Taking bias image")
-            azcam.db.tools["exposure"].expose(0, "zero", "bias image")
+            # clear device
+            azcam.db.tools["exposure"].test(0)
 
-            # take x-ray image
-            azcam.db.parameters.set_par("imagetype", "fe55")
-            azcam.log("Taking Fe-55 image")
-            azcam.db.tools["exposure"].expose(self.exposure_time, "fe55", "Fe55 image")
+            # loop through images
+            for imgnum in range(self.number_images_acquire):
+                azcam.log(
+                    "Image set %d of %d for %.3f seconds..."
+                    % (imgnum + 1, self.number_images_acquire, self.exposure_time)
+                )
 
-        if self.acquire_darks:
-            azcam.db.parameters.set_par("imagetype", "dark")
-            azcam.log("Taking dark image")
-            azcam.db.tools["exposure"].expose(self.exposure_time, "dark", "dark image")
+                # take bias image
+                azcam.db.parameters.set_par("imagetype", "zero")
+                azcam.log("Taking bias image")
+                azcam.db.tools["exposure"].expose(0, "zero", "bias image")
+
+                # take x-ray image
+                azcam.db.parameters.set_par("imagetype", "fe55")
+                azcam.log("Taking Fe-55 image")
+                azcam.db.tools["exposure"].expose(
+                    self.exposure_time, "fe55", "Fe55 image"
+                )
+
+            if self.acquire_darks:
+                azcam.db.parameters.set_par("imagetype", "dark")
+                azcam.log("Taking dark image")
+                azcam.db.tools["exposure"].expose(
+                    self.exposure_time, "dark", "dark image"
+                )
 
         # finish
-        azcam.utils.restore_imagepars(impars)
         azcam.utils.curdir(currentfolder)
         azcam.log("Fe-55 finished")
 
@@ -172,11 +194,7 @@ class Fe55(Tester):
         rootname = "fe55."
         subfolder = "analysis"
 
-        # these arrays are for every chan, maybe for multiple images
-        self.event_data = []
-        self.system_gain = []
-        self.mean_fwhm = []  # array for each channel
-        self.mean_sigma = []  # array for each channel
+        self._reset_results()
         middle = (self.neighborhood_size - 1) / 2  # size should be odd
         middle = int(middle)
 
@@ -185,10 +203,9 @@ class Fe55(Tester):
         # create analysis subfolder
         startingfolder, subfolder = azcam_console.utils.make_file_folder(subfolder)
 
-        # copy all image files to analysis folder
-        azcam.log("Making copy of image files for analysis")
-        for filename in glob.glob(os.path.join(startingfolder, "*.fits")):
-            shutil.copy(filename, subfolder)
+        # link image files into analysis folder, corrected images replace links
+        workspace = AnalysisWorkspace(startingfolder, subfolder)
+        workspace.add_files("*.fits")
 
         azcam.utils.curdir(
             subfolder
@@ -201,7 +218,6 @@ class Fe55(Tester):
         # get noise roi
         nroi = azcam_console.utils.get_image_roi()[1]
         self.noise_dn = []
-        self.read_noise = []
 
         # first image is a zero, use it for noise
         zerofilename = rootname + "%04d" % StartingSequence
@@ -210,38 +226,36 @@ class Fe55(Tester):
         self.num_chans = last_ext - first_ext
 
         # get overscan noise from zero
-        with pyfits.open(zerofilename, lazy_load_hdus=False) as zeroim:
+        with MappedFits(zerofilename) as zeroim:
             for chan, ext in enumerate(range(first_ext, last_ext)):
-                hdr = zeroim[ext].header
-                ncols = hdr["NAXIS1"]
-                nrows = hdr["NAXIS2"]
-                imbuf = numpy.reshape(zeroim[ext].data, [nrows, ncols])  # [rows,cols]
-                noise = imbuf[nroi[2] : nroi[3], nroi[0] : nroi[1]].std()
+                roi = [nroi[2], nroi[3], nroi[0], nroi[1]]
+                noise = zeroim.section(ext, roi, "float64").std()
                 self.noise_dn.append(noise)
 
-        SequenceNumber += 1
-
-        # bias correct fe55 image
-        filename = (
-            os.path.join(currentfolder, rootname + "%04d" % SequenceNumber) + ".fits"
-        )
-        NumExt, first_ext, last_ext = azcam.fits.get_extensions(filename)
-
-        azcam.log("bias correct image: %s" % os.path.basename(filename))
-        zerosub = "zerosub.fits"
-        azcam.fits.sub(filename, zerofilename, zerosub)
-        os.remove(filename)
-        os.rename(zerosub, filename)
-
-        # overscan_correct image second
-        if self.overscan_correct:
-            azcam.log("overscan_correct image: %s" % os.path.basename(filename))
-            azcam.fits.colbias(filename, fit_order=self.fit_order)
+        # bias and Fe55 image pairs, only the first pair unless combine_images
+        pairs = []
+        while True:
+            filename = (
+                os.path.join(currentfolder, rootname + "%04d" % (SequenceNumber + 1))
+                + ".fits"
+            )
+            if not os.path.exists(filename):
+                break
+            zerofilename = (
+                os.path.join(currentfolder, rootname + "%04d" % SequenceNumber)
+                + ".fits"
+            )
+            pairs.append((zerofilename, filename))
+            SequenceNumber += 2
+            if not self.combine_images or len(pairs) == self.max_images:
+                break
+        if len(pairs) == 0:
+            raise azcam.exceptions.AzcamError("Fe55 image not found")
 
         self.grade = "UNKNOWN"
-        azcam.log("Analyzing image %s" % os.path.basename(filename))
 
         # get image info
+        filename = pairs[0][1]
         NumExt, first_ext, last_ext = azcam.fits.get_extensions(filename)
 
         # get this image section size
@@ -258,34 +272,9 @@ class Fe55(Tester):
             yedges.append(i)
             yedges.append(reply[3] + i)
 
-        # get image data
-        fe55im = pyfits.open(filename)
-        hdr = fe55im[ext].header
-        ncols = hdr["NAXIS1"]
-        nrows = hdr["NAXIS2"]
-        first_col = 1
-        first_row = 1
-        last_col = ncols
-        last_row = nrows
-
-        # setup
-        self.number_events = []
-
         azcam.log("neighborhood_size is %d pixels" % self.neighborhood_size)
         azcam.log("Threshold is %.0f DN" % self.threshold)
 
-        # data buffers for plots
-        self.imbufs = []
-        self.hist_x = []
-        self.hist_y = []
-        self.xevents = []
-        self.yevents = []
-        self.z = []
-        self.hcte = []
-        self.vcte = []
-        self.fit_yhcte = []
-        self.fit_yvcte = []
-
         # new gain estimate
         if self.gain_estimate == []:
             self.gain_estimate = azcam.db.tools["gain"].system_gain
@@ -298,270 +287,264 @@ class Fe55(Tester):
                     self.noise_threshold * sd for sd in azcam.db.tools["bias"].sdev
                 ]
 
-        # process each channel
-        self.chansanalyzed = 0
-        for chan, ext in enumerate(range(first_ext, last_ext)):
+        # settings of each channel
+        self._detection = self._detection_parameters()
+        channels = []
+        for chan in range(last_ext - first_ext):
             # check if analyzing only one ext
-            if self.ext_analyze != -1:
-                if self.ext_analyze != chan:
-                    self.event_data.append([0, 0, 0, 0, 0, 0, 0, 0])
-                    continue
+            if self.ext_analyze != -1 and self.ext_analyze != chan:
+                continue
+            channels.append(
+                (chan, self._channel_settings(chan, self._detection, xedges, yedges))
+            )
+        settings_chan = dict(channels)
+        self._channels_analyzed = list(settings_chan)
+
+        # find events of each image pair, only the events are kept
+        found, amps = self._find_pair_events(pairs, channels)
+
+        # measure each channel from the events of all images
+        if len(pairs) > 1:
+            azcam.log("Combining events of %d images" % len(pairs))
+        self._image_shape = amps[0].shape
+        for chan in range(last_ext - first_ext):
+            if chan not in found:
+                self.catalogs.append(numpy.zeros(0, fe55_events.CATALOG_DTYPE))
+                self._merge_channel(chan, None)
+                continue
+            events = numpy.concatenate([r["events"] for r in found[chan]])
+            gaussians = numpy.concatenate([r["gaussians"] for r in found[chan]])
+            self.catalogs.append(
+                numpy.concatenate(
+                    [
+                        fe55_events.make_catalog(
+                            r["events"], r["gaussians"], self.pixel_size
+                        )
+                        for r in found[chan]
+                    ]
+                )
+            )
+            if len(pairs) > 1:
+                azcam.log(
+                    "Total number of events for channel %d = %d" % (chan, len(events))
+                )
+            result = _measure_channel(
+                events, gaussians, settings_chan[chan], amps[0].shape
+            )
+            for message in result["messages"]:
+                azcam.log(message)
 
-            # get data for each channel
-            azcam.log("Analyzing channel %d " % chan)
+            # data of last image for plots
+            self.imbufs.append(amps[chan])
+            self._merge_channel(chan, result)
 
-            # get data as [rows,cols]
-            imbuf = numpy.reshape(fe55im[ext].data, [nrows, ncols])
-            self.imbufs.append(imbuf)
+        self._grade_results(self._detection)
 
-            # new code for clusters
-            data_max = scipy.ndimage.filters.maximum_filter(
-                imbuf, self.neighborhood_size
-            )
-            maxima = imbuf == data_max
-            data_min = scipy.ndimage.filters.minimum_filter(
-                imbuf, self.neighborhood_size
+        # make plots
+        self.plot()
+
+        # copy analysis output to starting fold
+        if startingfolder != subfolder:
+            try:
+                shutil.copy(
+                    "fe55.fits", startingfolder
+                )  # filename perhaps, but overwrites
+            except Exception:
+                pass
+            for f in list(self.plot_files.values()):
+                try:
+                    shutil.copy(f, startingfolder)
+                except Exception:
+                    pass
+
+        # write output files
+        azcam.utils.curdir(startingfolder)
+        if self.events_file:
+            self.write_events(
+                metadata={"images": [os.path.basename(f) for _, f in pairs]}
             )
-            diff = (data_max - data_min) > self.threshold
-            maxima[diff == 0] = 0
-
-            labeled, num_objects = scipy.ndimage.label(maxima)  # point 0 or 1
-            slices = scipy.ndimage.find_objects(labeled)  # vertices containing objects
-
-            # show events
-            if self.show_events:
-                azcam_console.plot.plt.figure()
-                azcam_console.plot.plt.imshow(labeled, cmap="gray")
-
-            # these arrays are for each channel
-            xevents, yevents, zevents, fwhms, sigmas, gaussians = [], [], [], [], [], []
-            xevents1, yevents1, zevents1 = [], [], []
-            fwhm_a, fwhm_b, angles = [], [], []
-
-            # analyze neighborhoods
-            for dy, dx in slices:
-                if 1:
-                    x_center = (dx.start + dx.stop - 1) / 2
-                    y_center = (dy.start + dy.stop - 1) / 2
-                else:
-                    x_center = dx
-                    y_center = dy
-
-                if x_center in xedges:
-                    continue
-                if y_center in yedges:
-                    continue
-
-                # get sum of neighborhood
-                z = 0
-                for i in range(-middle + 1, middle):
-                    row = y_center + i
-                    row = int(row)
-                    if row >= nrows:
-                        continue
-                    for j in range(-middle + 1, middle):
-                        col = x_center + j
-                        col = int(col)
-                        if col >= ncols:
-                            continue
-                        z += imbuf[row][col]
-
-                xevents1.append(x_center)
-                yevents1.append(y_center)
-                zevents1.append(z)
-
-            # get rid of outliers
-            nevents = len(xevents1)
-            s = "Number of raw events found = %d" % (nevents)
-            azcam.log(s)
+        self.write_datafile()
+        if self.create_reports:
+            self.report()
 
-            m1 = (self.xray_lines["K-alpha"] / self.gain_estimate[chan]) * 0.80
-            m2 = (self.xray_lines["K-alpha"] / self.gain_estimate[chan]) * 1.2
+        del self.imbufs  # new, may help file lock 07sep16
 
-            # save coords
-            for i in range(nevents):
-                if (zevents1[i] >= m1) and (zevents1[i] <= m2):
-                    xevents.append(xevents1[i])
-                    yevents.append(yevents1[i])
-                    zevents.append(zevents1[i])
-                else:
-                    pass  # exclude
-            self.yevents.append(yevents)
-            self.xevents.append(xevents)
-
-            # trouble can happen here...
-            if len(zevents) == 0:
-                azcam.log("No events in channel %d" % chan)
-                self.event_data.append([0, 0, 0, 0, 0, 0, 0, 0])
-                self.hist_x.append(numpy.array(0))
-                self.hist_y.append(numpy.array(0))
-                self.system_gain.append(self.gain_estimate[chan])
-                continue
+        self.is_valid = True
 
-            azcam.log("Removed %d of %d values" % (nevents - len(xevents), nevents))
-            nevents = len(xevents)
-            s = "Total number of events = %d" % (nevents)
-            azcam.log(s)
+        return
 
-            # gaussian fit each event for PSF analysis
-            if self.fit_psf:
-                if self.max_events != -1:  # limit events per chan
-                    nevents = min(nevents, self.max_events)
-                self.number_events.append(nevents)
-                azcam.log("Fitting gaussians for %d events" % nevents)
-                with warnings.catch_warnings():  # surpress warning
-                    warnings.simplefilter("ignore")
-                    for i in range(nevents):
-                        # if i%100==0:
-                        #    azcam.log('Events remaining: %05d\r' % (nevents-i)),
-                        r1 = yevents[i] - middle
-                        r2 = r1 + self.neighborhood_size
-                        r1 = int(r1)
-                        r2 = int(r2)
-                        c1 = xevents[i] - middle
-                        c2 = c1 + self.neighborhood_size
-                        c1 = int(c1)
-                        c2 = int(c2)
-
-                        reply = self._fit_gauss_elliptical(
-                            [xevents[i], yevents[i]], imbuf[r1:r2, c1:c2]
-                        )  # was box
-                        fwhm = self.pixel_size * math.sqrt(
-                            0.5 * (reply[5] ** 2 + reply[6] ** 2)
-                        )
+    def write_events(self, filename: str = "", metadata: dict | None = None) -> None:
+        """
+        Write the event catalogs of the last analysis to a numpy .npz file with
+        fe55_events.CATALOG_DTYPE columns for each channel, which analyze_events()
+        reads to analyze the events again without images.
 
-                        sigma = fwhm / CON1
-                        sigmas.append(sigma)
-                        fwhms.append(fwhm)
-                        gaussians.append(reply)
+        Args:
+            filename: catalog filename, default is events_file
+            metadata: additional JSON serializable information to save
+        """
 
-                # make numpy arrays
-                fwhm_a = [x[5] for x in gaussians]
-                fwhm_b = [x[6] for x in gaussians]
-                angles = [x[7] for x in gaussians]
+        filename = filename or self.events_file
 
-                fm = numpy.array(fwhms).mean()  # mean for this channel
-                sm = numpy.array(sigmas).mean()
+        info = {
+            "shape": list(self._image_shape),
+            "channels": self._channels_analyzed,
+        }
+        info.update(self._detection)
+        if metadata is not None:
+            info.update(metadata)
 
-                # from Jim Chiang for LSST
-                fm = math.sqrt(fm**2 - ((1.0 / 6.0) * self.pixel_size) ** 2)
-                sm = math.sqrt(sm**2 - ((1.0 / 6.0) * self.pixel_size) ** 2)
+        fe55_events.write_catalogs(filename, self.catalogs, info)
 
-                self.mean_fwhm = self.mean_fwhm.append(fm)
-                self.mean_sigma = self.mean_sigma.append(sm)
+        return
 
-                s = "FWHM_%d = %5.3f (sigma = %.2f um)" % (chan, fm, sm)
-                azcam.log(s)
+    def analyze_events(self, filename: str = "") -> None:
+        """
+        Analyze an Fe55 event catalog written by analyze() without reading images.
+        Gain, read noise, CTE, and PSF size are measured again using the current
+        xray_lines, bin_size, pixel_size, and system_noise_correction. The event
+        detection parameters saved in the catalog are used for this analysis only,
+        the tester attributes are not changed.
+
+        Args:
+            filename: catalog filename, default is events_file
+        """
 
-            else:
-                sigmas = []
-                fwhms = []
-                fwhm_a = []
-                fwhm_b = []
-                gaussians = []
-                angles = []
-                fm = 0.0
-                sm = 0.0
-                self.mean_fwhm = []
-                self.mean_sigma = []
-
-            # make single data array
-            self.event_data.append(
-                [yevents, xevents, zevents, fwhms, sigmas, fwhm_a, fwhm_b, angles]
-            )
+        filename = filename or self.events_file
+        azcam.log("Analyzing fe55 events in %s" % filename)
 
-            # calculate and save shape info
-            if self.fit_psf:
-                shape1 = (
-                    self.event_data[chan][5].mean() / self.event_data[chan][6].mean()
-                )  # fwhm_a / fwhm_b
-                shape2 = numpy.array(self.event_data[chan][7]).mean()
-                self.shape.append([shape1, shape2])
-                azcam.log("Shape: %5.03f, %7.03f" % (shape1, shape2))
-
-            # make new image with only summed events
-            events = numpy.zeros([nrows, ncols])
-            for i in range(len(xevents)):
-                events[int(yevents[i])][int(xevents[i])] = zevents[i]
-            self.Events = events
-
-            # calc histogram
-            bmin = int(numpy.array(zevents).min() - 100)
-            bmax = int(numpy.array(zevents).max() + 100)
-            numbins = int((bmax - bmin + 1) / self.bin_size)  # sum bins for nice plot
-            N, bins = numpy.histogram(zevents, numbins, range=(bmin, bmax))  # -1 new
-            self.N = N
-            self.Bins = bins
-
-            # get gain from histogram max
-            bin_max = numpy.where(N == N.max())
-            maxvalue = bins[bin_max][0]
-            g = self.xray_lines["K-alpha"] / maxvalue
-            self.system_gain.append(g)
-            s = "Gain_%d = %.2f" % (chan, g)
-            azcam.log(s)
+        catalogs, metadata = fe55_events.read_catalogs(filename)
 
-            # correct readnoise
-            noise = self.noise_dn[chan]
-            if self.system_noise_correction == []:
-                self.read_noise.append(noise * g)
-            else:
-                rn = g * math.sqrt(noise**2 - self.system_noise_correction[chan] ** 2)
-                self.read_noise.append(rn)
-
-            # save for histogram plot
-            self.hist_x.append(bins[1:])
-            self.hist_y.append(N)
-
-            # HCTE plot with line fit
-            z = []
-            for i, c in enumerate(self.event_data[chan][1]):  # loop over column number
-                r = self.event_data[chan][0][i]  # row number
-                r = int(r)
-                c = int(c)
-                z.append(events[r][c])
-            self.z.append(numpy.array(z))
-            coefs = numpy.polyfit(self.event_data[chan][1], z, 1)
-            fit_y = numpy.polyval(coefs, list(range(first_col, last_col + 1)))
-            self.fit_yhcte.append(fit_y)
-
-            hslope = coefs[0]
-            hcte = 1.0 + g * (hslope / self.xray_lines["K-alpha"])
-            hcte = min(1.0, hcte)
-            self.hcte.append(hcte)
-            s = "HCTE_%d = %0.6f" % (chan, hcte)
-            azcam.log(s)
+        self._reset_results()
+        self.grade = "UNKNOWN"
+        self._detection = {
+            name: metadata[name] for name in self._detection_parameters()
+        }
+        self.noise_dn = self._detection["noise_dn"]  # measured by analyze()
+        self.num_chans = len(catalogs)
+        self._image_shape = tuple(metadata["shape"])
+        self._channels_analyzed = metadata["channels"]
+
+        for chan, catalog in enumerate(catalogs):
+            self.catalogs.append(catalog)
+            if chan not in self._channels_analyzed:
+                self._merge_channel(chan, None)
+                continue
+            azcam.log("Analyzing channel %d " % chan)
+            events, gaussians = fe55_events.split_catalog(catalog)
+            settings = self._channel_settings(chan, self._detection)
+            result = _measure_channel(events, gaussians, settings, self._image_shape)
+            for message in result["messages"]:
+                azcam.log(message)
+            self._merge_channel(chan, result)
+
+        self._grade_results(self._detection)
+        self.plot()
+        self.write_datafile()
+        if self.create_reports:
+            self.report()
 
-            # VCTE line fit
-            z = []
-            for i, r in enumerate(self.event_data[chan][0]):  # loop over row number
-                c = self.event_data[chan][1][i]  # col number
-                r = int(r)
-                c = int(c)
-                z.append(events[r][c])
-            coefs = numpy.polyfit(self.event_data[chan][0], z, 1)
-            fit_y = numpy.polyval(coefs, list(range(first_row, last_row + 1)))
-            self.fit_yvcte.append(fit_y)
-
-            vslope = coefs[0]
-            vcte = 1.0 + g * (vslope / self.xray_lines["K-alpha"])
-            vcte = min(1.0, vcte)
-            self.vcte.append(vcte)
-            s = "VCTE_%d = %0.6f" % (chan, vcte)
-            azcam.log(s)
+        self.is_valid = True
 
-            self.chansanalyzed += 1
+        return
 
-            if self.spec_by_cte:
-                if self.grade == "FAIL":  # already failed on a previous amp
-                    pass
-                else:
-                    if vcte >= self.vcte_limit and hcte >= self.hcte_limit:
-                        self.grade = "PASS"
-                    else:
-                        self.grade = "FAIL"
+    def _reset_results(self) -> None:
+        """
+        Clear the results of each channel before an analysis.
+        """
 
-        if self.fit_psf:
+        # these arrays are for every chan, maybe for multiple images
+        self.event_data = []
+        self.events = []
+        self.gaussians = []
+        self.catalogs = []
+        self.system_gain = []
+        self.mean_fwhm = []  # array for each channel
+        self.mean_sigma = []  # array for each channel
+        self.read_noise = []
+        self.number_events = []
+        self.chansanalyzed = 0
+
+        # data buffers for plots
+        self.imbufs = []
+        self.hist_x = []
+        self.hist_y = []
+        self.xevents = []
+        self.yevents = []
+        self.z = []
+        self.hcte = []
+        self.vcte = []
+        self.fit_yhcte = []
+        self.fit_yvcte = []
+
+        return
+
+    def _detection_parameters(self) -> dict:
+        """
+        Return the event detection parameters of the tester, which are saved with
+        the event catalog.
+        """
+
+        return {
+            "neighborhood_size": self.neighborhood_size,
+            "threshold": self.threshold,
+            "gain_estimate": list(self.gain_estimate),
+            "fit_psf": self.fit_psf,
+            "noise_dn": list(self.noise_dn),
+        }
+
+    def _channel_settings(
+        self,
+        chan: int,
+        detection: dict,
+        xedges: list | None = None,
+        yedges: list | None = None,
+    ) -> dict:
+        """
+        Return the analysis parameters of one channel for the module functions.
+
+        Args:
+            chan: channel number
+            detection: event detection parameters as _detection_parameters()
+            xedges: event columns rejected as image edges
+            yedges: event rows rejected as image edges
+        """
+
+        threshold = detection["threshold"]
+        if isinstance(threshold, (list, tuple)):
+            threshold = threshold[chan]
+
+        return {
+            "chan": chan,
+            "neighborhood_size": detection["neighborhood_size"],
+            "threshold": threshold,
+            "xedges": [] if xedges is None else xedges,
+            "yedges": [] if yedges is None else yedges,
+            "k_alpha": self.xray_lines["K-alpha"],
+            "gain_estimate": detection["gain_estimate"][chan],
+            "fit_psf": detection["fit_psf"],
+            "max_events": self.max_events,
+            "pixel_size": self.pixel_size,
+            "bin_size": self.bin_size,
+            "noise": detection["noise_dn"][chan],
+            "system_noise_correction": (
+                None
+                if self.system_noise_correction == []
+                else self.system_noise_correction[chan]
+            ),
+            "show_events": self.show_events,
+        }
+
+    def _grade_results(self, detection: dict) -> None:
+        """
+        Grade the measured channels and define the dataset.
+
+        Args:
+            detection: event detection parameters as _detection_parameters()
+        """
+
+        fit_psf = detection["fit_psf"]
+        if fit_psf:
             fm = numpy.array(self.mean_fwhm).mean()
             sm = numpy.array(self.mean_sigma).mean()
             s = "Mean FWHM for all channels: %5.2f (sigma = %.2f um)" % (fm, sm)
@@ -570,7 +553,7 @@ class Fe55(Tester):
         if not self.grade_sensor:
             self.grade = "UNDEFINED"
         else:
-            if not self.spec_by_cte and (self.spec_sigma != -1 and self.fit_psf):
+            if not self.spec_by_cte and (self.spec_sigma != -1 and fit_psf):
                 if sm <= self.spec_sigma:
                     self.grade = "PASS"
                 else:
@@ -588,38 +571,19 @@ class Fe55(Tester):
         if not self.grade_sensor:
             self.grade_read_noise = "UNDEFINED"
 
-        # close image file
-        fe55im.close()
-
         # stats over multiple images
-        if self.fit_psf:
+        if fit_psf:
             self.mean_fwhmTotal = numpy.array(self.mean_fwhm).mean()
             self.mean_sigmaTotal = numpy.array(self.mean_sigma).mean()
 
-        # make plots
-        self.plot()
-
-        # copy analysis output to starting fold
-        if startingfolder != subfolder:
-            try:
-                shutil.copy(
-                    "fe55.fits", startingfolder
-                )  # filename perhaps, but overwrites
-            except Exception:
-                pass
-            for f in list(self.plot_files.values()):
-                try:
-                    shutil.copy(f, startingfolder)
-                except Exception:
-                    pass
-
         # define dataset
         self.dataset = {
             "data_file": self.data_file,
+            "events_file": self.events_file,
             "grade": self.grade,
             "chansanalyzed": self.chansanalyzed,
-            "neighborhood_size": self.neighborhood_size,
-            "threshhold": self.threshold,
+            "neighborhood_size": detection["neighborhood_size"],
+            "threshhold": detection["threshold"],
             "system_gain": self.system_gain,
             "noise_dn": self.noise_dn,
             "grade_read_noise": self.grade_read_noise,
@@ -634,15 +598,222 @@ class Fe55(Tester):
             # 'event_data': self.event_data,
         }
 
-        # write output files
-        azcam.utils.curdir(startingfolder)
-        self.write_datafile()
-        if self.create_reports:
-            self.report()
+        return
 
-        del self.imbufs  # new, may help file lock 07sep16
+    def _find_pair_events(self, pairs: list, channels: list) -> tuple[dict, list]:
+        """
+        Find the events of channels of all bias/Fe55 image pairs. If number_workers > 1
+        the channels are analyzed in one process pool for all images, which receives
+        the image data through one shared memory block.
 
-        self.is_valid = True
+        Args:
+            pairs: list of (bias filename, Fe55 filename)
+            channels: list of (chan, settings) to analyze
+
+        Returns:
+            tuple ({chan: list of results as _find_channel_events()}, amplifier data
+            of the last image)
+        """
+
+        found = {chan: [] for chan, _ in channels}
+        executor = None
+        shm = None
+
+        try:
+            for zerofilename, filename in pairs:
+                # bias correct image first, overscan_correct image second
+                # each zero is used once so it is not kept in fits_cache
+                azcam.log("bias correct image: %s" % os.path.basename(filename))
+                chain = CalibrationChain().superbias(zerofilename, cache=False)
+                if self.overscan_correct:
+                    azcam.log("overscan_correct image: %s" % os.path.basename(filename))
+                    chain.overscan(fit_order=self.fit_order)
+                fe55im = chain.apply(filename)
+                amps = get_amplifier_data(fe55im)
+
+                azcam.log("Analyzing image %s" % os.path.basename(filename))
+
+                # channels are analyzed in worker processes if number_workers > 1
+                if executor is None and self.number_workers > 1 and len(channels) > 1:
+                    executor = concurrent.futures.ProcessPoolExecutor(
+                        min(self.number_workers, len(channels))
+                    )
+                    shm = shared_memory.SharedMemory(
+                        create=True, size=fe55im.data.nbytes
+                    )
+
+                # max_events limits the events fitted for all images
+                frame_channels = channels
+                if self.max_events != -1:
+                    frame_channels = [
+                        (
+                            chan,
+                            dict(
+                                settings,
+                                max_events=self.max_events
+                                - sum(len(r["gaussians"]) for r in found[chan]),
+                            ),
+                        )
+                        for chan, settings in channels
+                    ]
+
+                results = self._find_events(
+                    fe55im.data, amps[0].shape, frame_channels, executor, shm
+                )
+                for chan, result in results.items():
+                    found[chan].append(result)
+
+                    # show events
+                    if result["labeled"] is not None:
+                        azcam_console.plot.plt.figure()
+                        azcam_console.plot.plt.imshow(result["labeled"], cmap="gray")
+                        result["labeled"] = None
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+        return found, amps
+
+    def _find_events(
+        self,
+        data: numpy.ndarray,
+        shape: tuple,
+        channels: list,
+        executor: concurrent.futures.Executor | None = None,
+        shm: shared_memory.SharedMemory | None = None,
+    ) -> dict:
+        """
+        Find the events of channels of one image serially or in the processes of an
+        executor which share the image data. Messages are logged in channel order.
+
+        Args:
+            data: amplifier data as [chans, pixels]
+            shape: amplifier shape as [rows, cols]
+            channels: list of (chan, settings) to analyze
+            executor: process pool, None to analyze serially
+            shm: shared memory block of at least data.nbytes used with executor
+
+        Returns:
+            {chan: result} as _find_channel_events()
+        """
+
+        results = {}
+
+        if executor is None:
+            for chan, settings in channels:
+                azcam.log("Analyzing channel %d " % chan)
+                imbuf = data[chan].reshape(shape)
+                results[chan] = _find_channel_events(imbuf, settings)
+                for message in results[chan]["messages"]:
+                    azcam.log(message)
+            return results
+
+        if shm.size < data.nbytes:
+            raise azcam.exceptions.AzcamError("unequal FITS image sizes")
+
+        cube_shape = (len(data),) + tuple(shape)
+        cube = numpy.ndarray(cube_shape, dtype=data.dtype, buffer=shm.buf)
+        cube[:] = data.reshape(cube_shape)
+        del cube
+
+        futures = [
+            executor.submit(
+                _analyze_shared_channel,
+                shm.name,
+                cube_shape,
+                str(data.dtype),
+                chan,
+                settings,
+            )
+            for chan, settings in channels
+        ]
+        try:
+            for (chan, _), future in zip(channels, futures):
+                results[chan] = future.result()
+                azcam.log("Analyzing channel %d " % chan)
+                for message in results[chan]["messages"]:
+                    azcam.log(message)
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+        return results
+
+    def _merge_channel(self, chan: int, result: dict | None) -> None:
+        """
+        Save the results of one channel from _measure_channel(),
+        None for a channel which was not analyzed.
+        """
+
+        if result is None:
+            self.event_data.append([0, 0, 0, 0, 0, 0, 0, 0])
+            self.events.append(numpy.zeros(0, fe55_events.EVENT_DTYPE))
+            self.gaussians.append(numpy.zeros(0, fe55_events.GAUSSIAN_DTYPE))
+            return
+
+        events = result["events"]
+        self.events.append(events)
+        self.gaussians.append(result["gaussians"])
+        self.xevents.append(events["x"])
+        self.yevents.append(events["y"])
+
+        # trouble can happen here...
+        if len(events) == 0:
+            self.event_data.append([0, 0, 0, 0, 0, 0, 0, 0])
+            self.hist_x.append(numpy.array(0))
+            self.hist_y.append(numpy.array(0))
+            self.system_gain.append(result["gain"])
+            return
+
+        if "mean_fwhm" in result:  # fit_psf
+            self.number_events.append(result["number_fitted"])
+            self.mean_fwhm.append(result["mean_fwhm"])
+            self.mean_sigma.append(result["mean_sigma"])
+            self.shape.append(result["shape"])
+        else:
+            self.mean_fwhm = []
+            self.mean_sigma = []
+
+        # make single data array
+        self.event_data.append(
+            [events["y"], events["x"], events["z"]]
+            + [result[name] for name in ["fwhms", "sigmas", "fwhm_a", "fwhm_b"]]
+            + [result["angles"]]
+        )
+
+        self.Events = result["event_image"]
+        self.N = result["histogram"]
+        self.Bins = result["bins"]
+        self.system_gain.append(result["gain"])
+        self.read_noise.append(result["read_noise"])
+
+        # save for histogram plot
+        self.hist_x.append(result["bins"][1:])
+        self.hist_y.append(result["histogram"])
+
+        self.z.append(result["z"])
+        self.fit_yhcte.append(result["fit_yhcte"])
+        self.hcte.append(result["hcte"])
+        self.fit_yvcte.append(result["fit_yvcte"])
+        self.vcte.append(result["vcte"])
+
+        self.chansanalyzed += 1
+
+        if self.spec_by_cte:
+            if self.grade == "FAIL":  # already failed on a previous amp
+                pass
+            else:
+                if (
+                    result["vcte"] >= self.vcte_limit
+                    and result["hcte"] >= self.hcte_limit
+                ):
+                    self.grade = "PASS"
+                else:
+                    self.grade = "FAIL"
 
         return
 
@@ -731,8 +902,8 @@ class Fe55(Tester):
             medium_font = 16
             small_font = 14
 
-        # plot raw events
-        if "events" in self.make_plots:
+        # plot raw events, not available from an event catalog
+        if "events" in self.make_plots and len(self.imbufs) > 0:
             fig_events = azcam_console.plot.plt.figure()
             fignum = fig_events.number
             azcam_console.plot.move_window(fignum)
@@ -864,8 +1035,7 @@ class Fe55(Tester):
             azcam_console.plot.save_figure(fignum, "%s" % self.plot_files["histogram"])
 
         if "cte" in self.make_plots:
-            last_col = len(self.imbufs[0][0])
-            last_row = len(self.imbufs[0])
+            last_row, last_col = self._image_shape
 
             # HCTE
             fig_cte = azcam_console.plot.plt.figure()
@@ -1051,101 +1221,216 @@ class Fe55(Tester):
 
         return
 
-    def _fit_gauss_elliptical(self, xy, data):
-        """
-        Purpose
-
-        Fitting a star with a 2D elliptical gaussian PSF.
-
-        Inputs
-        * xy (list) = list with the form [x,y] where x and y are the integer positions in the complete image of
-        the first pixel (the one with x=0 and y=0) of the small subimage that is used for fitting.
-        * data (2D Numpy array) = small subimage, obtained from the full FITS image by slicing. It must contain
-        a single object : the star to be fitted, placed approximately at the center.
-
-        Output (list) = list with 8 elements, in the form:
-        [maxi, floor, height, mean_x, mean_y, fwhm_small, fwhm_large, angle].
-        The list elements are respectively:
-        - maxi is the value of the star maximum signal,
-        - floor is the level of the sky background (fit result),
-        - height is the PSF amplitude (fit result),
-        - mean_x and mean_y are the star centroid x and y positions, on the full image (fit results),
-        - fwhm_small is the smallest full width half maximum of the elliptical gaussian PSF (fit result) in pixels
-        - fwhm_large is the largest full width half maximum of the elliptical gaussian PSF (fit result) in pixels
-        - angle is the angular direction of the largest fwhm, measured clockwise starting from the vertical direction
-          (fit result) and expressed in degrees. The direction of the smallest fwhm is obtained by adding 90 deg to angle.
-        """
 
-        # find starting values
-        dat = data.flatten()
-        maxi = data.max()
-        floor = numpy.ma.median(dat)
-        height = maxi - floor
-        if (
-            height == 0.0
-        ):  # if star is saturated it could be that median value is 32767 or 65535 --> height=0
-            floor = numpy.mean(dat)
-            height = maxi - floor
-
-        mean_x = (numpy.shape(data)[0] - 1) / 2
-        mean_y = (numpy.shape(data)[1] - 1) / 2
-
-        fwhm = numpy.sqrt(numpy.sum((data > floor + height / 2.0).flatten()))
-        fwhm_1 = fwhm
-        fwhm_2 = fwhm
-        sig_1 = fwhm_1 / CON1
-        sig_2 = fwhm_2 / CON1
-
-        angle = 0.0
-
-        p0 = floor, height, mean_x, mean_y, sig_1, sig_2, angle
-
-        # ---------------------------------------------------------------------------------
-        # fitting gaussian
-        def gauss(floor, height, mean_x, mean_y, sig_1, sig_2, angle):
-            A = (numpy.cos(angle) / sig_1) ** 2.0 + (numpy.sin(angle) / sig_2) ** 2.0
-            B = (numpy.sin(angle) / sig_1) ** 2.0 + (numpy.cos(angle) / sig_2) ** 2.0
-            C = (
-                2.0
-                * numpy.sin(angle)
-                * numpy.cos(angle)
-                * (1.0 / (sig_1**2.0) - 1.0 / (sig_2**2.0))
-            )
+def _find_channel_events(imbuf: numpy.ndarray, settings: dict) -> dict:
+    """
+    Find, select, and fit the Fe55 events of one channel of one image.
+    This is a module function so channels may be analyzed in worker processes.
 
-            # do not forget factor 0.5 in exp(-0.5*r**2./sig**2.)
-            return lambda x, y: floor + height * numpy.exp(
-                -0.5
-                * (
-                    A * ((x - mean_x) ** 2)
-                    + B * ((y - mean_y) ** 2)
-                    + C * (x - mean_x) * (y - mean_y)
-                )
+    Args:
+        imbuf: channel data as [rows, cols]
+        settings: analysis parameters of the channel made by Fe55.analyze()
+
+    Returns:
+        events, gaussian fits, and log messages of the channel
+    """
+
+    messages = []
+    neighborhood_size = settings["neighborhood_size"]
+    k_alpha = settings["k_alpha"]
+
+    labeled, num_objects = fe55_events.label_maxima(
+        imbuf, neighborhood_size, settings["threshold"]
+    )
+    events = fe55_events.extract_events(
+        imbuf,
+        labeled,
+        num_objects,
+        neighborhood_size,
+        settings["xedges"],
+        settings["yedges"],
+    )
+
+    result = {
+        "messages": messages,
+        "labeled": labeled if settings["show_events"] else None,
+        "gaussians": numpy.zeros(0, fe55_events.GAUSSIAN_DTYPE),
+    }
+
+    # get rid of outliers
+    nevents = len(events)
+    messages.append("Number of raw events found = %d" % (nevents))
+
+    m1 = (k_alpha / settings["gain_estimate"]) * 0.80
+    m2 = (k_alpha / settings["gain_estimate"]) * 1.2
+
+    events = events[fe55_events.select_energy(events, m1, m2)]
+    result["events"] = events
+
+    if len(events) == 0:
+        return result
+
+    messages.append("Removed %d of %d values" % (nevents - len(events), nevents))
+    nevents = len(events)
+    messages.append("Total number of events = %d" % (nevents))
+
+    # gaussian fit each event for PSF analysis
+    if settings["fit_psf"]:
+        if settings["max_events"] != -1:  # limit events per chan
+            nevents = max(0, min(nevents, settings["max_events"]))
+        messages.append("Fitting gaussians for %d events" % nevents)
+        if nevents > 0:
+            stamps, valid = fe55_events.extract_stamps(
+                imbuf, events[:nevents], neighborhood_size
+            )
+            result["gaussians"] = fe55_events.fit_gaussians(
+                stamps, events[:nevents], valid
             )
 
-        def err(p, data):
-            return numpy.ravel(gauss(*p)(*numpy.indices(data.shape)) - data)
+    return result
+
 
-        p = scipy.optimize.leastsq(err, p0, args=(data), maxfev=200)
-        p = p[0]
+def _measure_channel(
+    events: numpy.ndarray, gaussians: numpy.ndarray, settings: dict, shape: tuple
+) -> dict:
+    """
+    Measure gain, read noise, CTE, and PSF size of one channel from its events,
+    which may be combined from several images.
+
+    Args:
+        events: selected events as fe55_events.EVENT_DTYPE array
+        gaussians: gaussian fits as fe55_events.GAUSSIAN_DTYPE array
+        settings: analysis parameters of the channel made by Fe55.analyze()
+        shape: channel image shape as [rows, cols]
+
+    Returns:
+        results and log messages of the channel
+    """
+
+    messages = []
+    chan = settings["chan"]
+    k_alpha = settings["k_alpha"]
+    nrows, ncols = shape
+
+    result = {
+        "messages": messages,
+        "events": events,
+        "gaussians": gaussians,
+        "number_fitted": len(gaussians),
+        "fwhms": [],
+        "sigmas": [],
+        "fwhm_a": [],
+        "fwhm_b": [],
+        "angles": [],
+    }
+
+    if len(events) == 0:
+        messages.append("No events in channel %d" % chan)
+        result["gain"] = settings["gain_estimate"]
+        return result
+
+    if settings["fit_psf"]:
+        pixel_size = settings["pixel_size"]
+        fwhm_a = gaussians["fwhm_small"]
+        fwhm_b = gaussians["fwhm_large"]
+        fwhms = pixel_size * numpy.sqrt(0.5 * (fwhm_a**2 + fwhm_b**2))
+        sigmas = fwhms / CON1
+        result.update(
+            fwhms=fwhms,
+            sigmas=sigmas,
+            fwhm_a=fwhm_a,
+            fwhm_b=fwhm_b,
+            angles=gaussians["angle"],
+        )
+
+        # stamps outside the image are not fitted
+        fm = numpy.nanmean(fwhms)  # mean for this channel
+        sm = numpy.nanmean(sigmas)
+
+        # from Jim Chiang for LSST
+        fm = math.sqrt(fm**2 - ((1.0 / 6.0) * pixel_size) ** 2)
+        sm = math.sqrt(sm**2 - ((1.0 / 6.0) * pixel_size) ** 2)
+        result["mean_fwhm"] = fm
+        result["mean_sigma"] = sm
+        messages.append("FWHM_%d = %5.3f (sigma = %.2f um)" % (chan, fm, sm))
+
+        # shape info
+        shape1 = numpy.nanmean(fwhm_a) / numpy.nanmean(fwhm_b)  # fwhm_a / fwhm_b
+        shape2 = numpy.nanmean(gaussians["angle"])
+        result["shape"] = [shape1, shape2]
+        messages.append("Shape: %5.03f, %7.03f" % (shape1, shape2))
+
+    # make new image with only summed events
+    result["event_image"] = fe55_events.event_image(events, [nrows, ncols])
+
+    # calc histogram
+    zevents = events["z"]
+    bmin = int(zevents.min() - 100)
+    bmax = int(zevents.max() + 100)
+    numbins = int((bmax - bmin + 1) / settings["bin_size"])  # sum bins for nice plot
+    N, bins = numpy.histogram(zevents, numbins, range=(bmin, bmax))  # -1 new
+    result["histogram"] = N
+    result["bins"] = bins
+
+    # get gain from histogram max
+    bin_max = numpy.where(N == N.max())
+    maxvalue = bins[bin_max][0]
+    g = float(k_alpha / maxvalue)
+    result["gain"] = g
+    messages.append("Gain_%d = %.2f" % (chan, g))
+
+    # correct readnoise
+    noise = settings["noise"]
+    if settings["system_noise_correction"] is None:
+        result["read_noise"] = noise * g
+    else:
+        result["read_noise"] = g * math.sqrt(
+            noise**2 - settings["system_noise_correction"] ** 2
+        )
+
+    # HCTE plot with line fit
+    result["z"] = zevents
+    coefs = numpy.polyfit(events["x"], zevents, 1)
+    result["fit_yhcte"] = numpy.polyval(coefs, list(range(1, ncols + 1)))
+
+    hslope = coefs[0]
+    hcte = 1.0 + g * (hslope / k_alpha)
+    result["hcte"] = min(1.0, hcte)
+    messages.append("HCTE_%d = %0.6f" % (chan, result["hcte"]))
+
+    # VCTE line fit
+    coefs = numpy.polyfit(events["y"], zevents, 1)
+    result["fit_yvcte"] = numpy.polyval(coefs, list(range(1, nrows + 1)))
 
-        # ---------------------------------------------------------------------------------
-        # formatting results
-        floor = p[0]
-        height = p[1]
-        mean_x = p[2] + xy[0]
-        mean_y = p[3] + xy[1]
+    vslope = coefs[0]
+    vcte = 1.0 + g * (vslope / k_alpha)
+    result["vcte"] = min(1.0, vcte)
+    messages.append("VCTE_%d = %0.6f" % (chan, result["vcte"]))
 
-        # angle gives the direction of the p[4]=sig_1 axis, starting from x (vertical) axis, clockwise in direction of y (horizontal) axis
-        if numpy.abs(p[4]) > numpy.abs(p[5]):
-            fwhm_large = numpy.abs(p[4]) * CON1
-            fwhm_small = numpy.abs(p[5]) * CON1
-            angle = numpy.arctan(numpy.tan(p[6]))
+    return result
 
-        else:  # then sig_1 is the smallest : we want angle to point to sig_y, the largest
-            fwhm_large = numpy.abs(p[5]) * CON1
-            fwhm_small = numpy.abs(p[4]) * CON1
-            angle = numpy.arctan(numpy.tan(p[6] + numpy.pi / 2.0))
 
-        output = [maxi, floor, height, mean_x, mean_y, fwhm_small, fwhm_large, angle]
+def _analyze_shared_channel(
+    shm_name: str, shape: tuple, dtype: str, chan: int, settings: dict
+) -> dict:
+    """
+    Find the events of one channel of image data in shared memory,
+    as _find_channel_events().
+
+    Args:
+        shm_name: name of the shared memory block with data as [chans, rows, cols]
+        shape: shape of the shared data
+        dtype: data type of the shared data
+        chan: channel to analyze
+        settings: analysis parameters of the channel
+    """
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        cube = numpy.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        result = _find_channel_events(cube[chan], settings)
+        del cube
+    finally:
+        shm.close()
 
-        return output
+    return result
@@ -0,0 +1,481 @@
+"""
+Vectorized Fe55 X-ray event extraction.
+
+Local maxima of an amplifier image are labeled, the center of each labeled object is
+found from its bounding box, and the signal of each event is the sum of the
+neighborhood around its center read from a box-summed image. Events are returned as
+one structured array with EVENT_DTYPE fields so selections are boolean masks.
+
+Usage:
+    labeled, num_objects = label_maxima(imbuf, 5, threshold)
+    events = extract_events(imbuf, labeled, num_objects, 5, xedges, yedges)
+    events = events[select_energy(events, 0.8 * kalpha, 1.2 * kalpha)]
+    image = event_image(events, imbuf.shape)
+    stamps, valid = extract_stamps(imbuf, events, 5)
+    gaussians = fit_gaussians(stamps, events, valid)
+    write_catalogs("fe55_events.npz", [make_catalog(events, gaussians)], metadata)
+"""
+
+import json
+
+import numpy
+import scipy.ndimage
+
+#: Fe55 event center column and row and summed signal
+EVENT_DTYPE = numpy.dtype([("x", "f8"), ("y", "f8"), ("z", "f8")])
+
+#: elliptical gaussian fit of an event stamp, widths in pixels and angle in radians
+GAUSSIAN_DTYPE = numpy.dtype(
+    [
+        ("maxi", "f8"),
+        ("floor", "f8"),
+        ("height", "f8"),
+        ("mean_x", "f8"),
+        ("mean_y", "f8"),
+        ("fwhm_small", "f8"),
+        ("fwhm_large", "f8"),
+        ("angle", "f8"),
+    ]
+)
+
+#: saved event catalog columns, gaussian columns are NaN for events not fitted
+#: and fwhm and sigma are in pixel size units
+CATALOG_DTYPE = numpy.dtype(
+    EVENT_DTYPE.descr
+    + [("fitted", "?")]
+    + GAUSSIAN_DTYPE.descr
+    + [("fwhm", "f8"), ("sigma", "f8")]
+)
+
+# sigma <=> FWHM
+_CON1 = 2.0 * numpy.sqrt(2.0 * numpy.log(2.0))
+
+
+def label_maxima(
+    data: numpy.ndarray, neighborhood_size: int = 5, threshold: float = 0.0
+) -> tuple[numpy.ndarray, int]:
+    """
+    Label local maxima of an image whose neighborhood range exceeds a threshold.
+
+    Args:
+        data: image data as [rows, cols]
+        neighborhood_size: size of the neighborhood in pixels, an odd number
+        threshold: minimum difference of neighborhood maximum and minimum
+
+    Returns:
+        tuple (labeled, num_objects) as scipy.ndimage.label()
+    """
+
+    data_max = scipy.ndimage.maximum_filter(data, neighborhood_size)
+    data_min = scipy.ndimage.minimum_filter(data, neighborhood_size)
+    maxima = (data == data_max) & ((data_max - data_min) > threshold)
+
+    return scipy.ndimage.label(maxima)
+
+
+def neighborhood_sum(data: numpy.ndarray, neighborhood_size: int = 5) -> numpy.ndarray:
+    """
+    Return the sum of the event box around every pixel, which is
+    neighborhood_size - 2 pixels on a side. Pixels outside the image are zero.
+
+    Args:
+        data: image data as [rows, cols]
+        neighborhood_size: size of the neighborhood in pixels, an odd number
+
+    Returns:
+        float64 box sum as [rows, cols]
+    """
+
+    weights = numpy.ones(neighborhood_size - 2)
+    boxsum = scipy.ndimage.correlate1d(
+        numpy.asarray(data, dtype="float64"), weights, axis=0, mode="constant"
+    )
+
+    return scipy.ndimage.correlate1d(boxsum, weights, axis=1, mode="constant")
+
+
+def extract_events(
+    data: numpy.ndarray,
+    labeled: numpy.ndarray,
+    num_objects: int,
+    neighborhood_size: int = 5,
+    xedges: list | None = None,
+    yedges: list | None = None,
+) -> numpy.ndarray:
+    """
+    Return the events of labeled objects in label order.
+
+    Args:
+        data: image data as [rows, cols]
+        labeled: labeled maxima from label_maxima()
+        num_objects: number of labeled objects
+        neighborhood_size: size of the neighborhood in pixels, an odd number
+        xedges: event center columns to exclude
+        yedges: event center rows to exclude
+
+    Returns:
+        events as EVENT_DTYPE array
+    """
+
+    if num_objects == 0:
+        return numpy.zeros(0, dtype=EVENT_DTYPE)
+
+    # bounding box center of each object, labels are 1 to num_objects
+    rows, cols = numpy.nonzero(labeled)
+    labels = labeled[rows, cols]
+    order = numpy.argsort(labels, kind="stable")
+    rows, cols, labels = rows[order], cols[order], labels[order]
+    starts = numpy.flatnonzero(numpy.r_[True, labels[1:] != labels[:-1]])
+
+    events = numpy.zeros(len(starts), dtype=EVENT_DTYPE)
+    events["x"] = (
+        numpy.minimum.reduceat(cols, starts) + numpy.maximum.reduceat(cols, starts)
+    ) / 2
+    events["y"] = (
+        numpy.minimum.reduceat(rows, starts) + numpy.maximum.reduceat(rows, starts)
+    ) / 2
+
+    keep = numpy.ones(len(events), dtype=bool)
+    if xedges is not None:
+        keep &= ~numpy.isin(events["x"], xedges)
+    if yedges is not None:
+        keep &= ~numpy.isin(events["y"], yedges)
+    events = events[keep]
+
+    boxsum = neighborhood_sum(data, neighborhood_size)
+    events["z"] = boxsum[events["y"].astype(int), events["x"].astype(int)]
+
+    return events
+
+
+def select_energy(events: numpy.ndarray, low: float, high: float) -> numpy.ndarray:
+    """
+    Return a mask of events whose signal is in an energy window.
+
+    Args:
+        events: events as EVENT_DTYPE array
+        low: minimum signal
+        high: maximum signal
+    """
+
+    return (events["z"] >= low) & (events["z"] <= high)
+
+
+def event_image(events: numpy.ndarray, shape: tuple) -> numpy.ndarray:
+    """
+    Return an image with the signal of each event at its center pixel.
+
+    Args:
+        events: events as EVENT_DTYPE array
+        shape: image shape as [rows, cols]
+    """
+
+    image = numpy.zeros(shape)
+    image[events["y"].astype(int), events["x"].astype(int)] = events["z"]
+
+    return image
+
+
+def extract_stamps(
+    data: numpy.ndarray, events: numpy.ndarray, neighborhood_size: int = 5
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Return the neighborhood stamp of each event as a cube.
+
+    Args:
+        data: image data as [rows, cols]
+        events: events as EVENT_DTYPE array
+        neighborhood_size: size of the stamps in pixels, an odd number
+
+    Returns:
+        tuple (stamps, valid) with stamps as float64 [events, rows, cols] and valid
+        False for events whose stamp is not entirely inside the image
+    """
+
+    middle = (neighborhood_size - 1) // 2
+    r1 = (events["y"] - middle).astype(int)
+    c1 = (events["x"] - middle).astype(int)
+    nrows, ncols = data.shape
+    valid = (
+        (r1 >= 0)
+        & (c1 >= 0)
+        & (r1 + neighborhood_size <= nrows)
+        & (c1 + neighborhood_size <= ncols)
+    )
+
+    offsets = numpy.arange(neighborhood_size)
+    rows = numpy.clip(r1[:, None] + offsets, 0, nrows - 1)
+    cols = numpy.clip(c1[:, None] + offsets, 0, ncols - 1)
+    stamps = data[rows[:, :, None], cols[:, None, :]].astype("float64")
+
+    return stamps, valid
+
+
+def fit_gaussians(
+    stamps: numpy.ndarray,
+    events: numpy.ndarray | None = None,
+    valid: numpy.ndarray | None = None,
+    max_iterations: int = 100,
+    tolerance: float = 1.49012e-08,
+) -> numpy.ndarray:
+    """
+    Fit an elliptical gaussian to every stamp of a cube together, with
+    Levenberg-Marquardt iterations vectorized over all stamps.
+
+    The model and results are those of a single stamp fit with scipy.optimize.leastsq:
+    floor + height * exp(-0.5 * (A*dx**2 + B*dy**2 + C*dx*dy)) where x is the row
+    and y the column index of a stamp. The angle is the direction of fwhm_large.
+
+    Args:
+        stamps: stamps as [events, rows, cols]
+        events: events as EVENT_DTYPE array, added to mean_x and mean_y
+        valid: False for stamps not to be fitted, their results are NaN
+        max_iterations: maximum number of iterations
+        tolerance: relative change of the sum of squares or parameters for convergence
+
+    Returns:
+        fit results as GAUSSIAN_DTYPE array
+    """
+
+    nstamps, nrows, ncols = stamps.shape
+    data = stamps.reshape(nstamps, -1)
+    x, y = [i.ravel().astype("float64") for i in numpy.indices((nrows, ncols))]
+
+    # starting values
+    maxi = data.max(axis=1)
+    floor = numpy.median(data, axis=1)
+    height = maxi - floor
+    flat = height == 0.0  # saturated stamps may have median at maximum
+    floor[flat] = data[flat].mean(axis=1)
+    height = maxi - floor
+    fwhm = numpy.sqrt(numpy.sum(data > (floor + height / 2.0)[:, None], axis=1))
+
+    params = numpy.zeros((nstamps, 7))
+    params[:, 0] = floor
+    params[:, 1] = height
+    params[:, 2] = (nrows - 1) / 2
+    params[:, 3] = (ncols - 1) / 2
+    params[:, 4] = fwhm / _CON1
+    params[:, 5] = fwhm / _CON1
+
+    active = numpy.ones(nstamps, dtype=bool) if valid is None else valid.copy()
+    damping = numpy.full(nstamps, 1e-3)
+    scale = numpy.zeros((nstamps, 7))
+    with numpy.errstate(all="ignore"):
+        cost = numpy.sum((_gaussian_model(params, x, y) - data) ** 2, axis=1)
+
+        for _ in range(max_iterations):
+            if not active.any():
+                break
+            index = numpy.flatnonzero(active)
+            model, jac = _gaussian_model(params[index], x, y, True)
+            resid = model - data[index]
+
+            jtj = jac @ jac.transpose(0, 2, 1)
+            jtr = (jac @ resid[:, :, None])[:, :, 0]
+            # parameter scaling by jacobian column norms, never decreasing
+            scale[index] = numpy.maximum(
+                scale[index], numpy.sqrt(numpy.einsum("nii->ni", jtj))
+            )
+            diag = numpy.maximum(scale[index] ** 2, 1e-12)
+            jtj[:, numpy.arange(7), numpy.arange(7)] += damping[index, None] * diag
+            try:
+                step = numpy.linalg.solve(jtj, -jtr[:, :, None])[:, :, 0]
+            except numpy.linalg.LinAlgError:
+                step = numpy.stack(
+                    [numpy.linalg.lstsq(a, -b, rcond=None)[0] for a, b in zip(jtj, jtr)]
+                )
+
+            trial = params[index] + step
+            trial_cost = numpy.sum(
+                (_gaussian_model(trial, x, y) - data[index]) ** 2, axis=1
+            )
+
+            better = trial_cost < cost[index]
+            accepted = index[better]
+            # convergence as the scipy.optimize.leastsq default tolerances
+            reduction = (cost[index] - trial_cost) / cost[index]
+            change = numpy.linalg.norm(scale[index] * step, axis=1)
+            size = numpy.linalg.norm(scale[index] * params[index], axis=1)
+            converged = (
+                (better & (reduction <= tolerance))
+                | (change <= tolerance * size)
+                | (damping[index] > 1e10)
+            )
+
+            params[accepted] = trial[better]
+            cost[accepted] = trial_cost[better]
+            damping[index] = numpy.where(
+                better, damping[index] / 10.0, damping[index] * 10.0
+            )
+            active[index[converged]] = False
+
+    # widths and direction of the largest width
+    sig_1 = numpy.abs(params[:, 4])
+    sig_2 = numpy.abs(params[:, 5])
+    first_large = sig_1 > sig_2
+
+    results = numpy.zeros(nstamps, dtype=GAUSSIAN_DTYPE)
+    results["maxi"] = maxi
+    results["floor"] = params[:, 0]
+    results["height"] = params[:, 1]
+    results["mean_x"] = params[:, 2]
+    results["mean_y"] = params[:, 3]
+    if events is not None:
+        results["mean_x"] += events["x"]
+        results["mean_y"] += events["y"]
+    results["fwhm_large"] = numpy.where(first_large, sig_1, sig_2) * _CON1
+    results["fwhm_small"] = numpy.where(first_large, sig_2, sig_1) * _CON1
+    results["angle"] = numpy.arctan(
+        numpy.tan(numpy.where(first_large, params[:, 6], params[:, 6] + numpy.pi / 2))
+    )
+
+    if valid is not None:
+        for name in GAUSSIAN_DTYPE.names:
+            results[name][~valid] = numpy.nan
+
+    return results
+
+
+def _gaussian_model(
+    params: numpy.ndarray, x: numpy.ndarray, y: numpy.ndarray, jacobian: bool = False
+):
+    """
+    Return the elliptical gaussian model as [stamps, pixels] for parameters
+    [floor, height, mean_x, mean_y, sig_1, sig_2, angle] of each stamp, and if
+    jacobian is True also its jacobian as [stamps, parameters, pixels].
+    """
+
+    floor, height, mean_x, mean_y, sig_1, sig_2, angle = [p[:, None] for p in params.T]
+    cos = numpy.cos(angle)
+    sin = numpy.sin(angle)
+    inv_1 = 1.0 / sig_1**2
+    inv_2 = 1.0 / sig_2**2
+
+    a = cos**2 * inv_1 + sin**2 * inv_2
+    b = sin**2 * inv_1 + cos**2 * inv_2
+    c = 2.0 * sin * cos * (inv_1 - inv_2)
+
+    dx = x - mean_x
+    dy = y - mean_y
+    dx2 = dx**2
+    dy2 = dy**2
+    dxy = dx * dy
+
+    expo = numpy.exp(-0.5 * (a * dx2 + b * dy2 + c * dxy))
+    model = floor + height * expo
+    if not jacobian:
+        return model
+
+    gq = -0.5 * height * expo  # derivative of the model for the quadratic form
+
+    # derivatives of a, b, c for the widths
+    inv3_1 = -2.0 / sig_1**3
+    inv3_2 = -2.0 / sig_2**3
+
+    jac = numpy.empty((model.shape[0], 7, model.shape[1]))
+    jac[:, 0] = 1.0
+    jac[:, 1] = expo
+    jac[:, 2] = gq * (-2.0 * a * dx - c * dy)
+    jac[:, 3] = gq * (-2.0 * b * dy - c * dx)
+    jac[:, 4] = gq * inv3_1 * (cos**2 * dx2 + sin**2 * dy2 + 2.0 * sin * cos * dxy)
+    jac[:, 5] = gq * inv3_2 * (sin**2 * dx2 + cos**2 * dy2 - 2.0 * sin * cos * dxy)
+    jac[:, 6] = gq * (
+        -c * dx2 + c * dy2 + 2.0 * numpy.cos(2.0 * angle) * (inv_1 - inv_2) * dxy
+    )
+
+    return model, jac
+
+
+def make_catalog(
+    events: numpy.ndarray, gaussians: numpy.ndarray, pixel_size: float = 1.0
+) -> numpy.ndarray:
+    """
+    Return an event catalog of one image.
+
+    Args:
+        events: events as EVENT_DTYPE array
+        gaussians: gaussian fits of the first len(gaussians) events
+        pixel_size: pixel size for the fwhm and sigma columns
+
+    Returns:
+        catalog as CATALOG_DTYPE array
+    """
+
+    catalog = numpy.zeros(len(events), dtype=CATALOG_DTYPE)
+    for name in EVENT_DTYPE.names:
+        catalog[name] = events[name]
+
+    nfitted = len(gaussians)
+    catalog["fitted"][:nfitted] = True
+    for name in GAUSSIAN_DTYPE.names:
+        catalog[name] = numpy.nan
+        catalog[name][:nfitted] = gaussians[name]
+
+    catalog["fwhm"] = pixel_size * numpy.sqrt(
+        0.5 * (catalog["fwhm_small"] ** 2 + catalog["fwhm_large"] ** 2)
+    )
+    catalog["sigma"] = catalog["fwhm"] / _CON1
+
+    return catalog
+
+
+def split_catalog(catalog: numpy.ndarray) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Return the events and gaussian fits of an event catalog.
+
+    Args:
+        catalog: catalog as CATALOG_DTYPE array
+
+    Returns:
+        tuple (events, gaussians) as EVENT_DTYPE and GAUSSIAN_DTYPE arrays
+    """
+
+    events = numpy.zeros(len(catalog), dtype=EVENT_DTYPE)
+    for name in EVENT_DTYPE.names:
+        events[name] = catalog[name]
+
+    fitted = catalog[catalog["fitted"]]
+    gaussians = numpy.zeros(len(fitted), dtype=GAUSSIAN_DTYPE)
+    for name in GAUSSIAN_DTYPE.names:
+        gaussians[name] = fitted[name]
+
+    return events, gaussians
+
+
+def write_catalogs(filename: str, catalogs: list, metadata: dict) -> None:
+    """
+    Write the event catalog of each channel to a numpy .npz file.
+
+    Args:
+        filename: output filename
+        catalogs: CATALOG_DTYPE array for each channel
+        metadata: JSON serializable analysis information
+    """
+
+    metadata = dict(metadata, num_chans=len(catalogs))
+    arrays = {"chan%d" % chan: catalog for chan, catalog in enumerate(catalogs)}
+    arrays["metadata"] = numpy.array(json.dumps(metadata, default=float))
+
+    with open(filename, "wb") as f:
+        numpy.savez_compressed(f, **arrays)
+
+    return
+
+
+def read_catalogs(filename: str) -> tuple[list, dict]:
+    """
+    Read event catalogs written by write_catalogs().
+
+    Args:
+        filename: catalog filename
+
+    Returns:
+        tuple (catalogs, metadata) with a CATALOG_DTYPE array for each channel
+    """
+
+    with numpy.load(filename) as npz:
+        metadata = json.loads(str(npz["metadata"]))
+        catalogs = [npz["chan%d" % chan] for chan in range(metadata["num_chans"])]
+
+    return catalogs, metadata
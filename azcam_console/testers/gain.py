@@ -3,12 +3,13 @@ import os
 import shutil
 
 import numpy
-from astropy.io import fits as pyfits
 
 import azcam
 import azcam.utils
 import azcam.fits
 import azcam_console.utils
+from azcam_console.fits_cache import fits_cache
+from azcam_console.fits_mmap import MappedFits
 from azcam_console.testers.basetester import Tester
 
 
@@ -90,76 +91,76 @@ class Gain(Tester):
         else:
             ExposureTime = self.exposure_time
 
-        # save pars to be changed
-        impars = {}
-        azcam.utils.save_imagepars(impars)
-
-        # create new subfolder
-        if self.overwrite:
-            if os.path.exists("gain"):
-                shutil.rmtree("gain")
-        currentfolder, subfolder = azcam_console.utils.make_file_folder("gain")
-        azcam.db.parameters.set_par("imagefolder", subfolder)
-
-        self.imagefolder = subfolder
-
-        azcam.db.parameters.set_par("imageincludesequencenumber", 1)
-        azcam.db.parameters.set_par("imageautoincrementsequencenumber", 1)
-        azcam.db.parameters.set_par("imageautoname", 0)  # manually set name
-        azcam.db.parameters.set_par("imagetest", 0)  # turn off TestImage
-        azcam.db.parameters.set_par("imageoverwrite", 1)
-
-        # clear device
-        if self.clear_arrray:
-            azcam.db.tools["exposure"].test(0)
-
-        # set wavelength
-        if self.wavelength > 0:
-            wave = int(self.wavelength)
-            wave1 = azcam.db.tools["instrument"].get_wavelength()
-            wave1 = int(wave1)
-            if wave1 != wave:
-                azcam.log(f"Setting wavelength to {wave} nm")
-                azcam.db.tools["instrument"].set_wavelength(wave)
-                wave1 = azcam.db.tools["instrument"].get_wavelength()
-                wave1 = int(wave1)
-            azcam.log(f"Current wavelength is {wave1} nm")
-
-        azcam.db.parameters.set_par("imageroot", "ptc.")
-        for loop in range(self.number_pairs):
-            if self.number_pairs > 1:
-                azcam.log(f"Starting gain sequence {loop + 1}/{self.number_pairs}")
+        # save image pars, restored on exit
+        with azcam.db.parameters.imagepars():
+            # create new subfolder
+            if self.overwrite:
+                if os.path.exists("gain"):
+                    shutil.rmtree("gain")
+            currentfolder, subfolder = azcam_console.utils.make_file_folder("gain")
+            self.imagefolder = subfolder
+
+            azcam.db.parameters.set_pars(
+                {
+                    "imagefolder": subfolder,
+                    "imageincludesequencenumber": 1,
+                    "imageautoincrementsequencenumber": 1,
+                    "imageautoname": 0,  # manually set name
+                    "imagetest": 0,  # turn off TestImage
+                    "imageoverwrite": 1,
+                }
+            )
 
-            # bias image
-            azcam.db.parameters.set_par("imagetype", "zero")
-            zerofilename = azcam.db.tools["exposure"].get_filename()
-            self.image_zero = zerofilename
-            azcam.log("Taking bias exposure")
-            azcam.db.tools["exposure"].expose(0, "zero", "PTC bias")
+            # clear device
+            if self.clear_arrray:
+                azcam.db.tools["exposure"].test(0)
 
-            # take dark
-            if self.include_dark_images:
-                self.dark_frame = azcam.db.tools["exposure"].get_filename()
-                azcam.db.tools["exposure"].expose(ExposureTime, "dark", "PTC dark")
-
-            # take flats
-            azcam.db.parameters.set_par("imagetype", self.exposure_type)
-            azcam.log(f"Taking two flats for {ExposureTime:0.3f} seconds")
-            flat1filename = azcam.db.tools["exposure"].get_filename()
-            self.image_flat1 = flat1filename
-            azcam.db.tools["exposure"].expose(
-                ExposureTime, self.exposure_type, "PTC frame 1"
-            )
-            azcam.log("Image 1 finished")
-            flat2filename = azcam.db.tools["exposure"].get_filename()
-            self.image_flat2 = flat2filename
-            azcam.db.tools["exposure"].expose(
-                ExposureTime, self.exposure_type, "PTC frame 2"
-            )
-            azcam.log("Image 2 finished")
+            # set wavelength
+            if self.wavelength > 0:
+                wave = int(self.wavelength)
+                wave1 = azcam.db.tools["instrument"].get_wavelength()
+                wave1 = int(wave1)
+                if wave1 != wave:
+                    azcam.log(f"Setting wavelength to {wave} nm")
+                    azcam.db.tools["instrument"].set_wavelength(wave)
+                    wave1 = azcam.db.tools["instrument"].get_wavelength()
+                    wave1 = int(wave1)
+                azcam.log(f"Current wavelength is {wave1} nm")
+
+            azcam.db.parameters.set_par("imageroot", "ptc.")
+            for loop in range(self.number_pairs):
+                if self.number_pairs > 1:
+                    azcam.log(f"Starting gain sequence {loop + 1}/{self.number_pairs}")
+
+                # bias image
+                azcam.db.parameters.set_par("imagetype", "zero")
+                zerofilename = azcam.db.tools["exposure"].get_filename()
+                self.image_zero = zerofilename
+                azcam.log("Taking bias exposure")
+                azcam.db.tools["exposure"].expose(0, "zero", "PTC bias")
+
+                # take dark
+                if self.include_dark_images:
+                    self.dark_frame = azcam.db.tools["exposure"].get_filename()
+                    azcam.db.tools["exposure"].expose(ExposureTime, "dark", "PTC dark")
+
+                # take flats
+                azcam.db.parameters.set_par("imagetype", self.exposure_type)
+                azcam.log(f"Taking two flats for {ExposureTime:0.3f} seconds")
+                flat1filename = azcam.db.tools["exposure"].get_filename()
+                self.image_flat1 = flat1filename
+                azcam.db.tools["exposure"].expose(
+                    ExposureTime, self.exposure_type, "PTC frame 1"
+                )
+                azcam.log("Image 1 finished")
+                flat2filename = azcam.db.tools["exposure"].get_filename()
+                self.image_flat2 = flat2filename
+                azcam.db.tools["exposure"].expose(
+                    ExposureTime, self.exposure_type, "PTC frame 2"
+                )
+                azcam.log("Image 2 finished")
 
         # finish
-        azcam.utils.restore_imagepars(impars)
         azcam.utils.curdir(currentfolder)
         azcam.log("Gain sequence finished")
 
@@ -292,6 +293,9 @@ class Gain(Tester):
     def measure_gain(self, Zero, Flat1, Flat2, Dark=None):
         """
         Calculate gain and noise from a bias and photon transfer image pair.
+        The bias is read through the shared FITS cache, so a bias used for many pairs
+        is decoded only once. Flats and darks are memory-mapped and only their ROI data
+        are converted.
         """
 
         Zero = azcam.utils.make_image_filename(Zero)
@@ -302,7 +306,7 @@ class Gain(Tester):
             Dark = azcam.utils.make_image_filename(Dark)
 
         # extensions are elements 1 -> NumExt
-        NumExt, first_ext, last_ext = azcam.fits.get_extensions(Zero)
+        NumExt, first_ext, last_ext = fits_cache.get_extensions(Zero)
         if NumExt == 0:
             data_ffci = []
             gain = []
@@ -327,46 +331,33 @@ class Gain(Tester):
         self.roi = azcam_console.utils.get_image_roi()
 
         # get zero mean and sigma
-        zmean = azcam.fits.mean(Zero, self.roi[1])
-        zsdev = azcam.fits.sdev(Zero, self.roi[1])
+        zmean = fits_cache.mean(Zero, self.roi[1])
+        zsdev = fits_cache.sdev(Zero, self.roi[1])
 
-        if self.include_dark_images:
-            dmean = azcam.fits.mean(Dark, self.roi[0])
-
-        # get flat mean for each extension
-        fmean = azcam.fits.mean(Flat1, self.roi[0])
-        for ext in range(first_ext, last_ext):
-            if self.include_dark_images:
-                flat_mean.append(fmean[ext - 1] - dmean[ext - 1])
-            else:
-                flat_mean.append(fmean[ext - 1] - zmean[ext - 1])
-
-        # open files
-        imf1 = pyfits.open(Flat1)
-        imf2 = pyfits.open(Flat2)
-        if self.include_dark_images:
-            dark1 = pyfits.open(Dark)
+        # numpy sections for means and ffci stats
+        mean_roi = azcam.fits._get_data_roi(self.roi[0])
+        roi = self.roi[0]
+        ffci_roi = [roi[2], roi[3], roi[0], roi[1]]
 
-        # make ffci data
+        # get flat mean and ffci data in ROI of each extension
         #   order is .data[] order, not EXT/IM order
-        for ext in range(first_ext, last_ext):
-            imf1[ext].data = imf1[ext].data.astype("float32")
-            imf2[ext].data = imf2[ext].data.astype("float32")
-            if self.include_dark_images:
-                dark1[ext].data = dark1[ext].data.astype("float32")
-                data_ffci.append(imf1[ext].data - dark1[ext].data)
-            else:
-                data_ffci.append(imf1[ext].data - imf2[ext].data)
+        second_file = Dark if self.include_dark_images else Flat2
+        with MappedFits(Flat1) as imf1, MappedFits(second_file) as imf2:
+            for ext in range(first_ext, last_ext):
+                fmean = imf1.section(ext, mean_roi).mean(dtype="float64")
+                if self.include_dark_images:
+                    dmean = imf2.section(ext, mean_roi).mean(dtype="float64")
+                    flat_mean.append(fmean - dmean)
+                else:
+                    flat_mean.append(fmean - zmean[ext - 1])
 
-        imf1.close()
-        imf2.close()
+                data_ffci.append(
+                    imf1.section(ext, ffci_roi) - imf2.section(ext, ffci_roi)
+                )
 
         # get stats in same ROI of each section
-        roi = self.roi[0]
         for ext in range(first_ext, last_ext):
-            ffci_sdev.append(
-                data_ffci[ext][roi[2] : roi[3], roi[0] : roi[1]].std() / math.sqrt(2.0)
-            )
+            ffci_sdev.append(data_ffci[ext].std() / math.sqrt(2.0))
             try:
                 g = flat_mean[ext] / (ffci_sdev[ext] ** 2 - zsdev[ext - 1] ** 2)
                 if numpy.isnan(g):
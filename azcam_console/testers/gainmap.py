@@ -84,59 +84,60 @@ class GainMap(Tester):
         else:
             et = self.exposure_time
 
-        # save pars to be changed
-        impars = {}
-        azcam.utils.save_imagepars(impars)
-
-        # create new subfolder
-        if self.overwrite:
-            if os.path.exists("gainmap"):
-                shutil.rmtree("gainmap")
-        currentfolder, subfolder = azcam_console.utils.make_file_folder("gainmap")
-        azcam.db.parameters.set_par("imagefolder", subfolder)
-        self.imagefolder = subfolder
-
-        azcam.db.parameters.set_par("imageincludesequencenumber", 1)
-        azcam.db.parameters.set_par("imageautoincrementsequencenumber", 1)
-        azcam.db.parameters.set_par("imageautoname", 0)  # manually set name
-        azcam.db.parameters.set_par("imagetest", 0)  # turn off TestImage
-        azcam.db.parameters.set_par("imageoverwrite", 1)
-
-        # set wavelength
-        if self.wavelength > 0:
-            wave = int(self.wavelength)
-            wave1 = azcam.db.tools["instrument"].get_wavelength()
-            wave1 = int(wave1)
-            if wave1 != wave:
-                azcam.log(f"Setting wavelength to {wave} nm")
-                azcam.db.tools["instrument"].set_wavelength(wave)
+        # save image pars, restored on exit
+        with azcam.db.parameters.imagepars():
+            # create new subfolder
+            if self.overwrite:
+                if os.path.exists("gainmap"):
+                    shutil.rmtree("gainmap")
+            currentfolder, subfolder = azcam_console.utils.make_file_folder("gainmap")
+            self.imagefolder = subfolder
+
+            azcam.db.parameters.set_pars(
+                {
+                    "imagefolder": subfolder,
+                    "imageincludesequencenumber": 1,
+                    "imageautoincrementsequencenumber": 1,
+                    "imageautoname": 0,  # manually set name
+                    "imagetest": 0,  # turn off TestImage
+                    "imageoverwrite": 1,
+                }
+            )
+
+            # set wavelength
+            if self.wavelength > 0:
+                wave = int(self.wavelength)
                 wave1 = azcam.db.tools["instrument"].get_wavelength()
                 wave1 = int(wave1)
-            azcam.log(f"Current wavelength is {wave1} nm")
-
-        # clear device
-        if self.clear_arrray:
-            azcam.db.tools["exposure"].test(0)
-
-        # bias images
-        azcam.db.parameters.set_par("imageroot", "bias.")
-        for loop in range(self.number_bias_images):
-            azcam.db.parameters.set_par("imagetype", "zero")
-            azcam.log(f"Taking bias exposure {loop+1}/{self.number_bias_images}")
-            azcam.db.tools["exposure"].expose(0, "zero", "Gainmap bias frame")
-
-        # flat images
-        azcam.db.parameters.set_par("imageroot", "gainmap.")
-        for loop in range(self.number_flat_images):
-            azcam.db.parameters.set_par("imagetype", self.exposure_type)
-            azcam.log(f"Taking flats {loop+1}/{self.number_flat_images}")
-            azcam.db.tools["exposure"].expose(
-                et, self.exposure_type, f"Gainmap frame {loop}"
-            )
-            azcam.log(f"Image {loop} finished")
+                if wave1 != wave:
+                    azcam.log(f"Setting wavelength to {wave} nm")
+                    azcam.db.tools["instrument"].set_wavelength(wave)
+                    wave1 = azcam.db.tools["instrument"].get_wavelength()
+                    wave1 = int(wave1)
+                azcam.log(f"Current wavelength is {wave1} nm")
+
+            # clear device
+            if self.clear_arrray:
+                azcam.db.tools["exposure"].test(0)
+
+            # bias images
+            azcam.db.parameters.set_par("imageroot", "bias.")
+            for loop in range(self.number_bias_images):
+                azcam.db.parameters.set_par("imagetype", "zero")
+                azcam.log(f"Taking bias exposure {loop+1}/{self.number_bias_images}")
+                azcam.db.tools["exposure"].expose(0, "zero", "Gainmap bias frame")
+
+            # flat images
+            azcam.db.parameters.set_par("imageroot", "gainmap.")
+            for loop in range(self.number_flat_images):
+                azcam.db.parameters.set_par("imagetype", self.exposure_type)
+                azcam.log(f"Taking flats {loop+1}/{self.number_flat_images}")
+                azcam.db.tools["exposure"].expose(
+                    et, self.exposure_type, f"Gainmap frame {loop}"
+                )
+                azcam.log(f"Image {loop} finished")
 
         # finish
-        azcam.utils.restore_imagepars(impars)
         azcam.utils.curdir(currentfolder)
         azcam.log("Gainmap sequence finished")
 
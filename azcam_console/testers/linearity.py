@@ -1,4 +1,3 @@
-import glob
 import os
 import shutil
 
@@ -8,7 +7,9 @@ import azcam
 import azcam.utils
 import azcam.fits
 import azcam_console.plot
+from azcam_console.fits_cache import fits_cache
 from azcam_console.testers.basetester import Tester
+from azcam_console.testers.workspace import AnalysisWorkspace
 
 
 class Linearity(Tester):
@@ -77,110 +78,119 @@ class Linearity(Tester):
 
         self.max_residual = 0.0
 
+        self.analysis_folder = ""
+        self._zero_file = ""
+        self._workspace = None
+
     def acquire(self, NumberExposures="prompt", max_exposure="prompt"):
         """
         Acquire a series of flats at increasing exposure levels to determine lnearity.
         Assumes that filename, timing code, and binning are already set as desired.
         NumberExposures is the number of exposure levels in sequence
         max_exposure is the maximum exposure time in seconds.
+        If pipelined is True, each flat is analyzed while the next is acquired.
         """
 
         azcam.log("Acquiring Linearity sequence")
 
-        # save pars to be changed
-        impars = {}
-        azcam.utils.save_imagepars(impars)
-
-        # create new subfolder
-        currentfolder, newfolder = azcam_console.utils.make_file_folder("linearity")
-        azcam.log(f"Linearity folder is {newfolder}")
-        azcam.db.parameters.set_par("imagefolder", newfolder)
-
-        # clear device
-        azcam.db.tools["exposure"].test(0)
-        imname = "test.fits"
-        bin1 = int(azcam.fits.get_keyword(imname, "CCDBIN1"))
-        bin2 = int(azcam.fits.get_keyword(imname, "CCDBIN2"))
-        binning = bin1 * bin2
-
-        azcam.db.parameters.set_par(
-            "imageroot", "linearity."
-        )  # for automatic data analysis
-        azcam.db.parameters.set_par(
-            "imageincludesequencenumber", 1
-        )  # use sequence numbers
-        azcam.db.parameters.set_par("imageautoname", 0)  # manually set name
-        azcam.db.parameters.set_par(
-            "imageautoincrementsequencenumber", 1
-        )  # inc sequence numbers
-        azcam.db.parameters.set_par("imagetest", 0)  # turn off TestImage
-
-        # bias image
-        azcam.log(
-            "Taking Linearity bias: %s"
-            % os.path.basename(azcam.db.tools["exposure"].get_filename())
-        )
-        azcam.db.tools["exposure"].expose(0, "zero", "Linearity bias")
+        # save image pars, restored on exit
+        with azcam.db.parameters.imagepars():
+            # create new subfolder
+            currentfolder, newfolder = azcam_console.utils.make_file_folder("linearity")
+            azcam.log(f"Linearity folder is {newfolder}")
+            azcam.db.parameters.set_par("imagefolder", newfolder)
+
+            # clear device
+            azcam.db.tools["exposure"].test(0)
+            imname = "test.fits"
+            bin1 = int(azcam.fits.get_keyword(imname, "CCDBIN1"))
+            bin2 = int(azcam.fits.get_keyword(imname, "CCDBIN2"))
+            binning = bin1 * bin2
+
+            azcam.db.parameters.set_pars(
+                {
+                    "imageroot": "linearity.",  # for automatic data analysis
+                    "imageincludesequencenumber": 1,  # use sequence numbers
+                    "imageautoname": 0,  # manually set name
+                    "imageautoincrementsequencenumber": 1,  # inc sequence numbers
+                    "imagetest": 0,  # turn off TestImage
+                }
+            )
 
-        azcam.db.parameters.set_par("imagetype", self.exposure_type)
+            # start analysis of images as they are acquired
+            if self.pipelined:
+                self._start_analysis(newfolder)
+                self.pipeline_start()
 
-        # Try exposure_level to get ExposureTime
-        if len(self.exposure_levels) > 0:
-            detcal = azcam.db.tools["detcal"]
-            if not azcam.db.tools["detcal"].is_valid:
-                azcam.log("Detector not calibrated, cannot use exposure_level")
-            else:
-                meancounts = azcam.db.tools["detcal"].mean_counts[self.wavelength]
+            # bias image
+            azcam.log(
+                "Taking Linearity bias: %s"
+                % os.path.basename(azcam.db.tools["exposure"].get_filename())
+            )
+            self.pipeline_expose(0, "zero", "Linearity bias")
 
-                if self.wavelength == -1:
-                    wave = azcam.db.tools["instrument"].get_wavelength()
-                    wave = int(wave)
+            azcam.db.parameters.set_par("imagetype", self.exposure_type)
 
+            # Try exposure_level to get ExposureTime
+            if len(self.exposure_levels) > 0:
+                detcal = azcam.db.tools["detcal"]
+                if not azcam.db.tools["detcal"].is_valid:
+                    azcam.log("Detector not calibrated, cannot use exposure_level")
                 else:
-                    wave = self.wavelength
+                    meancounts = azcam.db.tools["detcal"].mean_counts[self.wavelength]
 
-                self.exposure_times = (
-                    numpy.array(self.exposure_levels) / meancounts / binning
-                ) * (
-                    azcam.db.tools["gain"].system_gain[0]
-                    / azcam.db.tools["detcal"].system_gain[0]
-                )
+                    if self.wavelength == -1:
+                        wave = azcam.db.tools["instrument"].get_wavelength()
+                        wave = int(wave)
 
-        elif self.number_images_acquire != -1:  # max exposure time specified
-            self.exposure_times = []  # reset
-            MinExposure = float(self.max_exposure) / self.number_images_acquire
-            ExposureInc = (self.max_exposure - MinExposure) / max(
-                (self.number_images_acquire - 1), 1
-            )
-            exptime = MinExposure
-            for _ in range(self.number_images_acquire):
-                self.exposure_times.append(exptime)
-                exptime = exptime + ExposureInc
+                    else:
+                        wave = self.wavelength
 
-        else:
-            NumberExposures = len(
-                self.exposure_times
-            )  # ExposureTimes directly specified
-
-        # loop through exposures
-        NumberExposures = len(self.exposure_times)
-        azcam.log("Exposure times will be:", self.exposure_times)
-        for exp, exptime in enumerate(self.exposure_times):
-            azcam.log(
-                "Taking linearity %d of %d image for %.3f seconds: %s"
-                % (
-                    exp + 1,
-                    NumberExposures,
-                    exptime,
-                    os.path.basename(azcam.db.tools["exposure"].get_filename()),
+                    self.exposure_times = (
+                        numpy.array(self.exposure_levels) / meancounts / binning
+                    ) * (
+                        azcam.db.tools["gain"].system_gain[0]
+                        / azcam.db.tools["detcal"].system_gain[0]
+                    )
+
+            elif self.number_images_acquire != -1:  # max exposure time specified
+                self.exposure_times = []  # reset
+                MinExposure = float(self.max_exposure) / self.number_images_acquire
+                ExposureInc = (self.max_exposure - MinExposure) / max(
+                    (self.number_images_acquire - 1), 1
                 )
-            )
-            azcam.db.tools["exposure"].expose(
-                exptime, self.exposure_type, "Linearity flat"
-            )
+                exptime = MinExposure
+                for _ in range(self.number_images_acquire):
+                    self.exposure_times.append(exptime)
+                    exptime = exptime + ExposureInc
+
+            else:
+                NumberExposures = len(
+                    self.exposure_times
+                )  # ExposureTimes directly specified
+
+            # loop through exposures
+            NumberExposures = len(self.exposure_times)
+            azcam.log("Exposure times will be:", self.exposure_times)
+            for exp, exptime in enumerate(self.exposure_times):
+                azcam.log(
+                    "Taking linearity %d of %d image for %.3f seconds: %s"
+                    % (
+                        exp + 1,
+                        NumberExposures,
+                        exptime,
+                        os.path.basename(azcam.db.tools["exposure"].get_filename()),
+                    )
+                )
+                self.pipeline_expose(exptime, self.exposure_type, "Linearity flat")
+
+        # finish pipelined analysis in analysis folder
+        if self.pipelined:
+            self.pipeline_finish()
+            azcam.utils.curdir(self.analysis_folder)
+            self._finish_analysis(newfolder)
 
         # finish
-        azcam.utils.restore_imagepars(impars)
         azcam.utils.curdir(currentfolder)
         azcam.log("Linearity sequence finished")
 
@@ -205,10 +215,9 @@ class Linearity(Tester):
             # create analysis subfolder
             startingfolder, subfolder = azcam_console.utils.make_file_folder(subfolder)
 
-            # copy all image files to analysis folder
-            azcam.log("Making copy of image files for analysis")
-            for filename in glob.glob(os.path.join(startingfolder, "*.fits")):
-                shutil.copy(filename, subfolder)
+            # link image files into analysis folder, corrected images replace links
+            workspace = AnalysisWorkspace(startingfolder, subfolder)
+            workspace.add_files("*.fits")
 
             azcam.utils.curdir(
                 subfolder
@@ -228,22 +237,20 @@ class Linearity(Tester):
                 os.path.join(currentfolder, rootname + "%04d" % SequenceNumber)
                 + ".fits"
             )
-            loop = 0
             filelist = []
-            azcam.log("Overscan correct images")
             while os.path.exists(nextfile):
                 filelist.append(nextfile)
-
-                # Overscan correct each image
-                azcam.log("Overscan correct image: %s" % os.path.basename(nextfile))
-                azcam.fits.colbias(nextfile, fit_order=self.fit_order)
-
                 SequenceNumber = SequenceNumber + 1
                 nextfile = (
                     os.path.join(currentfolder, rootname + "%04d" % SequenceNumber)
                     + ".fits"
                 )
-                loop += 1
+
+            # Overscan correct each image
+            azcam.log("Overscan correct images")
+            workspace.colbias_files(
+                filelist, fit_order=self.fit_order, number_workers=self.number_workers
+            )
 
         # "debias" correct with residuals after colbias
         SequenceNumber = StartingSequence
@@ -252,7 +259,6 @@ class Linearity(Tester):
                 debiased = azcam.db.tools["bias"].debiased_filename
             else:
                 debiased = azcam.db.tools["bias"].superbias_filename
-            biassub = "biassub.fits"
 
             nextfile = (
                 os.path.join(currentfolder, rootname + "%04d" % SequenceNumber)
@@ -260,9 +266,8 @@ class Linearity(Tester):
             )
             loop = 0
             while os.path.exists(nextfile):
-                azcam.fits.sub(nextfile, debiased, biassub)
-                os.remove(nextfile)
-                os.rename(biassub, nextfile)
+                workspace.sub(nextfile, debiased)
+                workspace.flush(nextfile)
 
                 SequenceNumber = SequenceNumber + 1
                 nextfile = (
@@ -290,16 +295,7 @@ class Linearity(Tester):
             flatfilename = azcam.utils.make_image_filename(flatfilename)
             # flatfilename=os.path.join(currentfolder,flatfilename)+'.fits'
 
-            exptime = float(azcam.fits.get_keyword(flatfilename, "EXPTIME"))
-
-            self.exptimes.append(exptime)
-            fmean = azcam.fits.mean(flatfilename, self.roi[0])
-            mean = []
-            for ext in range(self.first_ext, self.last_ext):
-                chan = ext - 1
-                x = fmean[chan]
-                mean.append(x)
-            self.means.append(mean)  # list of all extensions for each exposure time
+            self._measure_frame(flatfilename)
 
             SequenceNumber = SequenceNumber + 1
             if self.use_ptc_data:
@@ -309,6 +305,97 @@ class Linearity(Tester):
                 + ".fits"
             )
 
+        self._finish_analysis(startingfolder)
+
+        return
+
+    def analyze_frame(self, filename):
+        """
+        Correct and measure one image of a pipelined linearity sequence.
+        The first image of the sequence is the bias.
+        """
+
+        filename = self._correct_frame(filename)
+
+        if self._zero_file == "":
+            self._zero_file = filename
+            self.NumExt, self.first_ext, self.last_ext = azcam.fits.get_extensions(
+                filename
+            )
+        else:
+            self._measure_frame(filename)
+
+        return
+
+    def _start_analysis(self, datafolder):
+        """
+        Prepare for pipelined analysis of images written to datafolder.
+        """
+
+        self.analysis_folder = datafolder
+        if self.overscan_correct or self.zero_correct:
+            self.analysis_folder = os.path.join(datafolder, "analysis")
+            os.makedirs(self.analysis_folder, exist_ok=True)
+        self._workspace = AnalysisWorkspace(datafolder, self.analysis_folder)
+
+        self.exptimes = []
+        self.means = []
+        self._zero_file = ""
+
+        self.roi = azcam_console.utils.get_image_roi()
+
+        return
+
+    def _correct_frame(self, filename):
+        """
+        Overscan and zero correct an image into the analysis folder.
+        Returns the filename of the image to analyze.
+        """
+
+        filename = azcam.utils.make_image_filename(filename)
+
+        if self.overscan_correct or self.zero_correct:
+            filename = self._workspace.add_file(filename)
+
+            if self.overscan_correct:
+                self._workspace.colbias(filename, fit_order=self.fit_order)
+
+            # "debias" correct with residuals after colbias
+            if self.zero_correct:
+                if self.overscan_correct:
+                    debiased = azcam.db.tools["bias"].debiased_filename
+                else:
+                    debiased = azcam.db.tools["bias"].superbias_filename
+                self._workspace.sub(filename, debiased)
+
+            self._workspace.flush(filename)
+
+        return filename
+
+    def _measure_frame(self, flatfilename):
+        """
+        Measure the mean signal of a flat and append it to the results.
+        """
+
+        exptime = float(fits_cache.get_keyword(flatfilename, "EXPTIME"))
+
+        self.exptimes.append(exptime)
+        fmean = fits_cache.mean(flatfilename, self.roi[0])
+        mean = []
+        for ext in range(self.first_ext, self.last_ext):
+            chan = ext - 1
+            x = fmean[chan]
+            mean.append(x)
+        self.means.append(mean)  # list of all extensions for each exposure time
+
+        return
+
+    def _finish_analysis(self, startingfolder):
+        """
+        Fit, plot, and write results after all images are measured.
+        Files are written to the current folder and copied to startingfolder.
+        """
+
         # find fit limits for linearity
         self.fit_min_dn = self.fit_min_percent * self.fullwell_estimate
         self.fit_max_dn = self.fit_max_percent * self.fullwell_estimate
@@ -1,4 +1,3 @@
-import glob
 import os
 import shutil
 import math
@@ -9,8 +8,9 @@ import azcam
 import azcam.utils
 import azcam.fits
 import azcam_console.utils
-import azcam.image
 from azcam_console.testers.basetester import Tester
+from azcam_console.testers.workspace import AnalysisWorkspace
+from azcam_console.testers.calibration import CalibrationChain
 
 
 class Prnu(Tester):
@@ -53,77 +53,74 @@ class Prnu(Tester):
 
         azcam.log("Acquiring PRNU sequence")
 
-        # save pars to be changed
-        impars = {}
-        azcam.utils.save_imagepars(impars)
-
-        # create new subfolder
-        currentfolder, subfolder = azcam_console.utils.make_file_folder("prnu")
-        azcam.db.parameters.set_par("imagefolder", subfolder)
-
-        # clear device
-        azcam.db.parameters.set_par("imagetest", 1)
-        imname = "test.fits"
-        azcam.db.tools["exposure"].test(0)
-        bin1 = int(azcam.fits.get_keyword(imname, "CCDBIN1"))
-        bin2 = int(azcam.fits.get_keyword(imname, "CCDBIN2"))
-        binning = bin1 * bin2
-
-        azcam.db.parameters.set_par("imageroot", "prnu.")  # for automatic data analysis
-        azcam.db.parameters.set_par(
-            "imageincludesequencenumber", 1
-        )  # use sequence numbers
-        azcam.db.parameters.set_par("imageautoname", 0)  # manually set name
-        azcam.db.parameters.set_par(
-            "imageautoincrementsequencenumber", 1
-        )  # inc sequence numbers
-        azcam.db.parameters.set_par("imagetest", 0)  # turn off TestImage
-
-        # bias image
-        azcam.db.parameters.set_par("imagetype", "zero")
-        filename = os.path.basename(azcam.db.tools["exposure"].get_filename())
-        azcam.log("Taking PRNU bias: %s" % filename)
-        azcam.db.tools["exposure"].expose(0, "zero", "PRNU bias")
-
-        # exposure times
-        waves = list(self.exposure_levels.keys())
-        waves.sort()
-        if self.mean_count_goal > 0:
-            if azcam.db.tools["detcal"].is_valid:
-                for wave in waves:
-                    meancounts = azcam.db.tools["detcal"].mean_counts[wave]
-                    self.exposure_levels[wave] = (
-                        (self.mean_count_goal / meancounts)
-                        / binning
-                        * (
-                            azcam.db.tools["gain"].system_gain[0]
-                            / azcam.db.tools["detcal"].system_gain[0]
-                        )
-                    )
-
-            else:
-                azcam.log("invalid detcal data, using fixed exposure times")
+        # save image pars, restored on exit
+        with azcam.db.parameters.imagepars():
+            # create new subfolder
+            currentfolder, subfolder = azcam_console.utils.make_file_folder("prnu")
+            azcam.db.parameters.set_par("imagefolder", subfolder)
+
+            # clear device
+            azcam.db.parameters.set_par("imagetest", 1)
+            imname = "test.fits"
+            azcam.db.tools["exposure"].test(0)
+            bin1 = int(azcam.fits.get_keyword(imname, "CCDBIN1"))
+            bin2 = int(azcam.fits.get_keyword(imname, "CCDBIN2"))
+            binning = bin1 * bin2
+
+            azcam.db.parameters.set_pars(
+                {
+                    "imageroot": "prnu.",  # for automatic data analysis
+                    "imageincludesequencenumber": 1,  # use sequence numbers
+                    "imageautoname": 0,  # manually set name
+                    "imageautoincrementsequencenumber": 1,  # inc sequence numbers
+                    "imagetest": 0,  # turn off TestImage
+                }
+            )
 
-        for wave in waves:
-            wavelength = float(wave)
-            exposuretime = self.exposure_levels[wave]
-
-            if wavelength > 0:
-                azcam.log(f"Moving to wavelength: {int(wavelength)}")
-                azcam.db.tools["instrument"].set_wavelength(wavelength)
-                wave = azcam.db.tools["instrument"].get_wavelength()
-                wave = int(wave)
-                azcam.log(f"Current wavelength: {wave}")
+            # bias image
+            azcam.db.parameters.set_par("imagetype", "zero")
             filename = os.path.basename(azcam.db.tools["exposure"].get_filename())
-            azcam.log(
-                f"Taking PRNU image for {exposuretime:.3f} seconds at {wavelength:.1f} nm"
-            )
-            azcam.db.tools["exposure"].expose(
-                exposuretime, self.exposure_type, f"PRNU image {wavelength:.1f} nm"
-            )
+            azcam.log("Taking PRNU bias: %s" % filename)
+            azcam.db.tools["exposure"].expose(0, "zero", "PRNU bias")
+
+            # exposure times
+            waves = list(self.exposure_levels.keys())
+            waves.sort()
+            if self.mean_count_goal > 0:
+                if azcam.db.tools["detcal"].is_valid:
+                    for wave in waves:
+                        meancounts = azcam.db.tools["detcal"].mean_counts[wave]
+                        self.exposure_levels[wave] = (
+                            (self.mean_count_goal / meancounts)
+                            / binning
+                            * (
+                                azcam.db.tools["gain"].system_gain[0]
+                                / azcam.db.tools["detcal"].system_gain[0]
+                            )
+                        )
+
+                else:
+                    azcam.log("invalid detcal data, using fixed exposure times")
+
+            for wave in waves:
+                wavelength = float(wave)
+                exposuretime = self.exposure_levels[wave]
+
+                if wavelength > 0:
+                    azcam.log(f"Moving to wavelength: {int(wavelength)}")
+                    azcam.db.tools["instrument"].set_wavelength(wavelength)
+                    wave = azcam.db.tools["instrument"].get_wavelength()
+                    wave = int(wave)
+                    azcam.log(f"Current wavelength: {wave}")
+                filename = os.path.basename(azcam.db.tools["exposure"].get_filename())
+                azcam.log(
+                    f"Taking PRNU image for {exposuretime:.3f} seconds at {wavelength:.1f} nm"
+                )
+                azcam.db.tools["exposure"].expose(
+                    exposuretime, self.exposure_type, f"PRNU image {wavelength:.1f} nm"
+                )
 
         # finish
-        azcam.utils.restore_imagepars(impars)
         azcam.utils.curdir(currentfolder)
         azcam.log("PRNU sequence finished")
 
@@ -143,9 +140,8 @@ class Prnu(Tester):
 
         # analysis subfolder
         startingfolder, subfolder = azcam_console.utils.make_file_folder(subfolder)
-        azcam.log("Making copy of image files for analysis")
-        for filename in glob.glob(os.path.join(startingfolder, "*.fits")):
-            shutil.copy(filename, subfolder)
+        workspace = AnalysisWorkspace(startingfolder, subfolder)
+        workspace.add_files("*.fits")
         azcam.utils.curdir(subfolder)
         currentfolder = azcam.utils.curdir()
         _, StartingSequence = azcam_console.utils.find_file_in_sequence(rootname)
@@ -171,6 +167,18 @@ class Prnu(Tester):
             numext, _, _ = azcam.fits.get_extensions(zerofilename)
             self.system_gain = numext * [1.0]
 
+        # calibration chain
+        chain = CalibrationChain()
+        if self.overscan_correct:
+            chain.overscan(fit_order=self.fit_order)
+        if self.zero_correct:
+            chain.superbias(azcam.db.tools["bias"].debiased_filename)
+        if self.overscan_correct:
+            chain.gain(self.system_gain)
+        else:
+            chain.gain(self.system_gain, azcam.db.tools["gain"].zero_mean)
+        chain.assemble(1)
+
         # loop over files
         self.grades = {}
         while os.path.exists(nextfile):
@@ -178,30 +186,8 @@ class Prnu(Tester):
             wavelength = int(float(wavelength) + 0.5)
             azcam.log("Processing image %s" % os.path.basename(nextfile))
 
-            # colbias
-            if self.overscan_correct:
-                azcam.fits.colbias(nextfile, fit_order=self.fit_order)
-
-            # "debias" correct with residuals after colbias
-            if self.zero_correct:
-                debiased = azcam.db.tools["bias"].debiased_filename
-                biassub = "biassub.fits"
-                azcam.fits.sub(nextfile, debiased, biassub)
-                os.remove(nextfile)
-                os.rename(biassub, nextfile)
-
-            # scale to electrons by system gain
-            prnuimage = azcam.image.Image(nextfile)
-
-            if self.overscan_correct:
-                prnuimage.set_scaling(self.system_gain, None)
-            else:
-                prnuimage.set_scaling(
-                    self.system_gain, azcam.db.tools["gain"].zero_mean
-                )
-            prnuimage.assemble(1)
-            prnuimage.save_data_format = -32
-            prnuimage.write_file("prnu_%d.fits" % wavelength, 6)
+            # calibrate and scale to electrons by system gain
+            prnuimage = chain.apply(nextfile, "prnu_%d.fits" % wavelength)
 
             # create masked array
             self.masked_image = numpy.ma.array(prnuimage.buffer, mask=False)
@@ -1,8 +1,4 @@
-import glob
 import os
-import shutil
-
-# import concurrent.futures
 
 import numpy
 
@@ -11,7 +7,9 @@ import azcam.utils
 import azcam.fits
 import azcam.exceptions
 import azcam_console.plot
+from azcam_console.sequence_index import SequenceIndex
 from azcam_console.testers.basetester import Tester
+from azcam_console.testers.workspace import AnalysisWorkspace
 
 
 class Ptc(Tester):
@@ -87,108 +85,120 @@ class Ptc(Tester):
 
         self.analysis_folder = ""
 
+        self._zero_file = ""
+        self._flat_file = ""
+        self._workspace = None
+        self._sequence_index = None
+
     def acquire(self):
         """
         Acquire a bias image and a series of flats for a Photon Transfer Curve (PTC).
         ExposureTimes is a list of exposure times for each pair.
+        If pipelined is True, each pair is analyzed while the next is acquired.
         """
 
         azcam.log("Acquiring PTC sequence")
 
         exposure, instrument = azcam_console.utils.get_tools(["exposure", "instrument"])
 
-        # save pars to be changed
-        impars = {}
-        azcam.utils.save_imagepars(impars)
-
-        # create new subfolder
-        currentfolder, subfolder = azcam_console.utils.make_file_folder("ptc")
-        azcam.db.parameters.set_par("imagefolder", subfolder)
-
-        # set wavelength
-        if self.wavelength > 0:
-            wave = int(self.wavelength)
-            wave1 = instrument.get_wavelength()
-            wave1 = int(wave1)
-            if wave1 != wave:
-                azcam.log(f"Setting wavelength to {wave} nm")
-                instrument.set_wavelength(wave)
+        # save image pars, restored on exit
+        with azcam.db.parameters.imagepars():
+            # create new subfolder
+            currentfolder, subfolder = azcam_console.utils.make_file_folder("ptc")
+            azcam.db.parameters.set_par("imagefolder", subfolder)
+
+            # set wavelength
+            if self.wavelength > 0:
+                wave = int(self.wavelength)
                 wave1 = instrument.get_wavelength()
                 wave1 = int(wave1)
-            azcam.log(f"Current wavelength is {wave1} nm")
-
-        # clear device
-        azcam.db.tools["exposure"].test(0)
-        imname = "test.fits"
-        bin1 = int(azcam.fits.get_keyword(imname, "CCDBIN1"))
-        bin2 = int(azcam.fits.get_keyword(imname, "CCDBIN2"))
-        binning = bin1 * bin2
-
-        azcam.db.parameters.set_par("imageroot", "ptc.")  # for automatic data analysis
-        azcam.db.parameters.set_par(
-            "imageincludesequencenumber", 1
-        )  # use sequence numbers
-        azcam.db.parameters.set_par("imageautoname", 0)  # manually set name
-        azcam.db.parameters.set_par(
-            "imageautoincrementsequencenumber", 1
-        )  # inc sequence numbers
-        azcam.db.parameters.set_par("imagetest", 0)  # turn off TestImage
-
-        # bias image
-        azcam.db.parameters.set_par("imagetype", "zero")
-        filename = os.path.basename(exposure.get_filename())
-        azcam.log("Taking PTC bias: %s" % filename)
-
-        exposure.expose(0, "zero", "PTC bias")
-
-        # determine exposure times, scaling by gain difference if necessary
-        if self.use_exposure_levels:
-            azcam.log("Using exposure_levels")
-            meancounts = azcam.db.tools["detcal"].mean_counts[self.wavelength]
-            self.exposure_times = (
-                numpy.array(self.exposure_levels) / meancounts / binning
-            ) * (
-                azcam.db.tools["gain"].system_gain[0]
-                / azcam.db.tools["detcal"].system_gain[0]
+                if wave1 != wave:
+                    azcam.log(f"Setting wavelength to {wave} nm")
+                    instrument.set_wavelength(wave)
+                    wave1 = instrument.get_wavelength()
+                    wave1 = int(wave1)
+                azcam.log(f"Current wavelength is {wave1} nm")
+
+            # clear device
+            azcam.db.tools["exposure"].test(0)
+            imname = "test.fits"
+            bin1 = int(azcam.fits.get_keyword(imname, "CCDBIN1"))
+            bin2 = int(azcam.fits.get_keyword(imname, "CCDBIN2"))
+            binning = bin1 * bin2
+
+            azcam.db.parameters.set_pars(
+                {
+                    "imageroot": "ptc.",  # for automatic data analysis
+                    "imageincludesequencenumber": 1,  # use sequence numbers
+                    "imageautoname": 0,  # manually set name
+                    "imageautoincrementsequencenumber": 1,  # inc sequence numbers
+                    "imagetest": 0,  # turn off TestImage
+                }
             )
 
-        elif len(self.exposure_times) > 0:
-            azcam.log("Using exposure_times")
+            # start analysis of images as they are acquired
+            if self.pipelined:
+                self._start_analysis(subfolder)
+                self.pipeline_start()
 
-        elif self.number_images_acquire > 0:
-            azcam.log("Using number_images_acquire")
-            self.exposure_times = []
-            min_exposure = float(self.max_exposure) / self.number_images_acquire
-            exposure_inc = (self.max_exposure - min_exposure) / max(
-                (self.number_images_acquire - 1), 1
-            )
-            exptime = min_exposure
-            for _ in range(self.number_images_acquire):
-                self.exposure_times.append(exptime)
-                exptime = exptime + exposure_inc
-        else:
-            raise azcam.exceptions.AzcamError("could not determine exposure times")
+            # bias image
+            azcam.db.parameters.set_par("imagetype", "zero")
+            filename = os.path.basename(exposure.get_filename())
+            azcam.log("Taking PTC bias: %s" % filename)
+
+            self.pipeline_expose(0, "zero", "PTC bias")
+
+            # determine exposure times, scaling by gain difference if necessary
+            if self.use_exposure_levels:
+                azcam.log("Using exposure_levels")
+                meancounts = azcam.db.tools["detcal"].mean_counts[self.wavelength]
+                self.exposure_times = (
+                    numpy.array(self.exposure_levels) / meancounts / binning
+                ) * (
+                    azcam.db.tools["gain"].system_gain[0]
+                    / azcam.db.tools["detcal"].system_gain[0]
+                )
 
-        # loop through pairs
-        azcam.db.parameters.set_par("imagetype", self.exposure_type)
-        number_pairs = len(self.exposure_times)
+            elif len(self.exposure_times) > 0:
+                azcam.log("Using exposure_times")
 
-        for pair, et in enumerate(self.exposure_times):
-            filename = os.path.basename(exposure.get_filename())
-            azcam.log(
-                f"Taking PTC pair {(pair + 1)} of {number_pairs} for {et:0.03f} secs"
-            )
+            elif self.number_images_acquire > 0:
+                azcam.log("Using number_images_acquire")
+                self.exposure_times = []
+                min_exposure = float(self.max_exposure) / self.number_images_acquire
+                exposure_inc = (self.max_exposure - min_exposure) / max(
+                    (self.number_images_acquire - 1), 1
+                )
+                exptime = min_exposure
+                for _ in range(self.number_images_acquire):
+                    self.exposure_times.append(exptime)
+                    exptime = exptime + exposure_inc
+            else:
+                raise azcam.exceptions.AzcamError("could not determine exposure times")
 
-            # make exposure
-            for _ in range(self.flush_before_exposure):
-                exposure.test(0)
-            exposure.expose(et, self.exposure_type, "Frame1")
-            filename = os.path.basename(exposure.get_filename())
+            # loop through pairs
+            azcam.db.parameters.set_par("imagetype", self.exposure_type)
+            number_pairs = len(self.exposure_times)
+
+            for pair, et in enumerate(self.exposure_times):
+                filename = os.path.basename(exposure.get_filename())
+                azcam.log(
+                    f"Taking PTC pair {(pair + 1)} of {number_pairs} for {et:0.03f} secs"
+                )
 
-            exposure.expose(et, self.exposure_type, "Frame2")
+                # make exposure
+                for _ in range(self.flush_before_exposure):
+                    exposure.test(0)
+                self.pipeline_expose(et, self.exposure_type, "Frame1")
+                self.pipeline_expose(et, self.exposure_type, "Frame2")
+
+        # finish pipelined analysis in data folder
+        if self.pipelined:
+            self.pipeline_finish()
+            azcam.utils.curdir(subfolder)
+            self._finish_analysis()
 
         # close
-        azcam.utils.restore_imagepars(impars)
         azcam.utils.curdir(currentfolder)
         azcam.log("PTC sequence finished")
 
@@ -209,15 +219,18 @@ class Ptc(Tester):
 
         self.minfits = []
         self.maxfits = []
+        self.means = []
+        self.sdevs = []
+        self.gains = []
+        self.noises = []
 
         if self.overscan_correct or self.resample > 1:
             # create analysis subfolder
             startingfolder, subfolder = azcam_console.utils.make_file_folder(subfolder)
 
-            # copy all image files to analysis folder
-            azcam.log("Making copy of image files for analysis")
-            for filename in glob.glob(os.path.join(startingfolder, "ptc*.fits")):
-                shutil.copy(filename, subfolder)
+            # link image files into analysis folder, corrected images replace links
+            workspace = AnalysisWorkspace(startingfolder, subfolder)
+            workspace.add_files("ptc*.fits")
 
             azcam.utils.curdir(
                 subfolder
@@ -225,10 +238,11 @@ class Ptc(Tester):
         currentfolder = azcam.utils.curdir()
         self.analysis_folder = currentfolder  # save for other tasks
 
-        firstfile, starting_seq_num = azcam_console.utils.find_file_in_sequence(
-            rootname
-        )
-        seq_num = starting_seq_num
+        # index sequence and read all headers once
+        index = SequenceIndex(currentfolder)
+        self._sequence_index = index
+        firstfile, starting_seq_num = index.find_file_in_sequence(rootname)
+        filelist = [f for n, f in index.sequence(rootname) if n >= starting_seq_num]
 
         self.NumExt, self.first_ext, self.last_ext = azcam.fits.get_extensions(
             firstfile
@@ -239,54 +253,17 @@ class Ptc(Tester):
 
         # Overscan correct all images
         if self.overscan_correct:
-            nextfile = (
-                os.path.join(currentfolder, rootname + "%04d" % seq_num) + ".fits"
-            )
-            loop = 0
             azcam.log("Overscan correcting images")
-            if 0:
-                while os.path.exists(nextfile):
-                    azcam.log("Overscan correct image: %s" % os.path.basename(nextfile))
-                    azcam.fits.colbias(nextfile, fit_order=self.fit_order)
-                    seq_num = seq_num + 1
-                    nextfile = (
-                        os.path.join(currentfolder, rootname + "%04d" % seq_num)
-                        + ".fits"
-                    )
-                    loop += 1
-            else:
-                arguments = []
-                while os.path.exists(nextfile):
-                    azcam.log("Overscan correct image: %s" % os.path.basename(nextfile))
-                    # arguments.append([nextfile, self.fit_order])
-                    azcam.fits.colbias(nextfile, fit_order=self.fit_order)
-                    seq_num = seq_num + 1
-                    nextfile = (
-                        os.path.join(currentfolder, rootname + "%04d" % seq_num)
-                        + ".fits"
-                    )
-                    loop += 1
-                # with concurrent.futures.ProcessPoolExecutor(self.number_workers) as executor:
-                #     futures_array = [executor.submit(azcam.fits.colbias, *arg) for arg in arguments]
-                #     for future in concurrent.futures.as_completed(futures_array):
-                #         data = future.result()
-                #         print("result", future, data)
+            workspace.colbias_files(
+                filelist, fit_order=self.fit_order, number_workers=self.number_workers
+            )
 
         if self.resample > 1:
-            seq_num = starting_seq_num
-            nextfile = (
-                os.path.join(currentfolder, rootname + "%04d" % seq_num) + ".fits"
-            )
-            loop = 0
             azcam.log(f"Resampling images: {self.resample}x{self.resample} pixels")
-            while os.path.exists(nextfile):
+            for nextfile in filelist:
                 azcam.log("Resampling image: %s" % os.path.basename(nextfile))
-                azcam.fits.resample(nextfile, 2)
-                seq_num = seq_num + 1
-                nextfile = (
-                    os.path.join(currentfolder, rootname + "%04d" % seq_num) + ".fits"
-                )
-                loop += 1
+                workspace.resample(nextfile, 2)
+                workspace.flush(nextfile)
 
         # bias image used for gain calc
         zerofilename = rootname + "%04d" % starting_seq_num
@@ -295,9 +272,9 @@ class Ptc(Tester):
 
         # start with overscan corrected pair
         seq_num = starting_seq_num
-        nextfile = os.path.join(currentfolder, rootname + "%04d" % seq_num) + ".fits"
+        next_seq_num = seq_num
         self.exposure_times = []
-        while os.path.exists(nextfile):
+        while index.exists(rootname, next_seq_num):
             if azcam.utils.check_keyboard(0) == "q":
                 break
             seq_num = seq_num + 1
@@ -306,35 +283,124 @@ class Ptc(Tester):
             seq_num = seq_num + 1
             flat2filename = rootname + "%04d" % seq_num
             flat2filename = os.path.join(currentfolder, flat2filename) + ".fits"
-            ExposureTime = float(azcam.fits.get_keyword(flat1filename, "EXPTIME"))
+            ExposureTime = self._measure_pair(
+                zerofilename, flat1filename, flat2filename
+            )
             self.exposure_times.append(ExposureTime)
+            next_seq_num = seq_num + 1
 
-            gain, noise, mean, sdev = azcam.db.tools["gain"].measure_gain(
-                zerofilename, flat1filename, flat2filename
+        # move to starting folder for data/reports
+        azcam.utils.curdir(startingfolder)
+
+        self._finish_analysis()
+
+        return
+
+    def analyze_frame(self, filename):
+        """
+        Correct one image of a pipelined PTC sequence and measure gain when a flat pair
+        is complete. The first image of the sequence is the bias.
+        """
+
+        filename = self._correct_frame(filename)
+
+        if self._zero_file == "":
+            self._zero_file = filename
+            self.NumExt, self.first_ext, self.last_ext = azcam.fits.get_extensions(
+                filename
             )
-            s = "Exposure Time: %-8.3f Mean: %.0f  File: %s" % (
-                ExposureTime,
-                mean[0],
-                os.path.basename(flat1filename),
+        elif self._flat_file == "":
+            self._flat_file = filename
+        else:
+            self._measure_pair(self._zero_file, self._flat_file, filename)
+            self._flat_file = ""
+
+        return
+
+    def _start_analysis(self, datafolder):
+        """
+        Prepare for pipelined analysis of images written to datafolder.
+        """
+
+        self.analysis_folder = datafolder
+        if self.overscan_correct or self.resample > 1:
+            self.analysis_folder = os.path.join(datafolder, "analysis")
+            os.makedirs(self.analysis_folder, exist_ok=True)
+        self._workspace = AnalysisWorkspace(datafolder, self.analysis_folder)
+        self._sequence_index = SequenceIndex(self.analysis_folder, read_headers=False)
+
+        self.minfits = []
+        self.maxfits = []
+        self.means = []
+        self.sdevs = []
+        self.gains = []
+        self.noises = []
+        self._zero_file = ""
+        self._flat_file = ""
+
+        self.roi = azcam_console.utils.get_image_roi()
+
+        return
+
+    def _correct_frame(self, filename):
+        """
+        Overscan correct and resample an image into the analysis folder.
+        Returns the filename of the image to analyze.
+        """
+
+        filename = azcam.utils.make_image_filename(filename)
+
+        if self.overscan_correct or self.resample > 1:
+            filename = self._workspace.add_file(filename)
+
+            if self.overscan_correct:
+                self._workspace.colbias(filename, fit_order=self.fit_order)
+
+            if self.resample > 1:
+                self._workspace.resample(filename, 2)
+
+            self._workspace.flush(filename)
+
+        return filename
+
+    def _measure_pair(self, zerofilename, flat1filename, flat2filename):
+        """
+        Measure gain, noise, mean, and sdev of a flat pair and append them to the results.
+        Returns the exposure time of the pair.
+        """
+
+        ExposureTime = float(self._sequence_index.get_keyword(flat1filename, "EXPTIME"))
+
+        gain, noise, mean, sdev = azcam.db.tools["gain"].measure_gain(
+            zerofilename, flat1filename, flat2filename
+        )
+        s = "Exposure Time: %-8.3f Mean: %.0f  File: %s" % (
+            ExposureTime,
+            mean[0],
+            os.path.basename(flat1filename),
+        )
+        azcam.log(s)
+
+        for chan in range(self.first_ext, self.last_ext):
+            s = "Chan: %2d Mean: %-8.0f Gain: %-5.2f Noise: %-5.1f" % (
+                chan,
+                mean[chan - 1],
+                gain[chan - 1],
+                noise[chan - 1],
             )
             azcam.log(s)
+        self.means.append([float(x) for x in mean])
+        self.gains.append([float(x) for x in gain])
+        self.sdevs.append([float(x) for x in sdev])
+        self.noises.append([float(x) for x in noise])
 
-            for chan in range(self.first_ext, self.last_ext):
-                s = "Chan: %2d Mean: %-8.0f Gain: %-5.2f Noise: %-5.1f" % (
-                    chan,
-                    mean[chan - 1],
-                    gain[chan - 1],
-                    noise[chan - 1],
-                )
-                azcam.log(s)
-            self.means.append([float(x) for x in mean])
-            self.gains.append([float(x) for x in gain])
-            self.sdevs.append([float(x) for x in sdev])
-            self.noises.append([float(x) for x in noise])
-
-            nextfile = (
-                os.path.join(currentfolder, rootname + "%04d" % (seq_num + 1)) + ".fits"
-            )
+        return ExposureTime
+
+    def _finish_analysis(self):
+        """
+        Fit, plot, and write results after all pairs are measured.
+        Files are written to the current folder.
+        """
 
         self.num_chans = len(self.means[0])
         self.num_points = len(self.means)
@@ -372,9 +438,6 @@ class Ptc(Tester):
         if self.grade_sensor:
             azcam.log(f"Grade = {self.grade}")
 
-        # move to starting folder for data/reports
-        azcam.utils.curdir(startingfolder)
-
         # now plot
         if self.create_plots and len(self.means) > 2:
             self.plot(self.log_plot)
@@ -3,7 +3,6 @@ Quantum Efficiency (QE) tester for azcam.
 This version uses Power Meter (not diodes) for calibration.
 """
 
-import glob
 import os
 import shutil
 
@@ -12,9 +11,11 @@ import numpy
 import azcam
 import azcam.utils
 import azcam.fits
-import azcam.image
 import azcam_console.plot
 from azcam_console.testers.basetester import Tester
+from azcam_console.testers.workspace import AnalysisWorkspace
+from azcam_console.testers.calibration import CalibrationChain
+from azcam_console.sequence_index import SequenceIndex
 
 
 class QE(Tester):
@@ -92,91 +93,88 @@ class QE(Tester):
             ["exposure", "instrument", "detcal"]
         )
 
-        # save pars to be changed
-        impars = {}
-        azcam.utils.save_imagepars(impars)
-
-        # create new subfolder
-        currentfolder, subfolder = azcam_console.utils.make_file_folder("qe")
-        azcam.db.parameters.set_par("imagefolder", subfolder)
-
-        # clear device
-        azcam.db.tools["exposure"].test(0)
-        imname = "test.fits"
-        bin1 = int(azcam.fits.get_keyword(imname, "CCDBIN1"))
-        bin2 = int(azcam.fits.get_keyword(imname, "CCDBIN2"))
-        binning = bin1 * bin2
-
-        azcam.db.parameters.set_par("imageroot", "qe.")  # for automatic data analysis
-        azcam.db.parameters.set_par(
-            "imageincludesequencenumber", 1
-        )  # use sequence numbers
-        azcam.db.parameters.set_par(
-            "imagesequencenumber", 1
-        )  # start at sequence number 1
-        azcam.db.parameters.set_par("imageautoname", 0)  # manually set name
-        azcam.db.parameters.set_par(
-            "imageautoincrementsequencenumber", 1
-        )  # inc sequence numbers
-        azcam.db.parameters.set_par("imagetest", 0)  # turn off TestImage
-
-        exposure.roi_reset()  # use entire device
-
-        # get exposure times
-        if self.use_exposure_levels:
-            azcam.log("Using exposure_levels")
-
-            self.exposure_times = {}  # reset
-            for w in self.exposure_levels:
-                meancounts = azcam.db.tools["detcal"].mean_counts[w]
-                et = self.exposure_levels[w] / meancounts / binning
-                et = et * (
-                    azcam.db.tools["gain"].system_gain[0]
-                    / azcam.db.tools["detcal"].system_gain[0]
-                )
+        # save image pars, restored on exit
+        with azcam.db.parameters.imagepars():
+            # create new subfolder
+            currentfolder, subfolder = azcam_console.utils.make_file_folder("qe")
+            azcam.db.parameters.set_par("imagefolder", subfolder)
+
+            # clear device
+            azcam.db.tools["exposure"].test(0)
+            imname = "test.fits"
+            bin1 = int(azcam.fits.get_keyword(imname, "CCDBIN1"))
+            bin2 = int(azcam.fits.get_keyword(imname, "CCDBIN2"))
+            binning = bin1 * bin2
 
-                self.exposure_times[w] = et
+            azcam.db.parameters.set_pars(
+                {
+                    "imageroot": "qe.",  # for automatic data analysis
+                    "imageincludesequencenumber": 1,  # use sequence numbers
+                    "imagesequencenumber": 1,  # start at sequence number 1
+                    "imageautoname": 0,  # manually set name
+                    "imageautoincrementsequencenumber": 1,  # inc sequence numbers
+                    "imagetest": 0,  # turn off TestImage
+                }
+            )
 
-        else:
-            azcam.log("Using exposure_times")
+            exposure.roi_reset()  # use entire device
 
-        # take bias image
-        azcam.db.parameters.set_par("imageroot", "qe.")
-        azcam.log("Taking bias image %s..." % os.path.basename(exposure.get_filename()))
+            # get exposure times
+            if self.use_exposure_levels:
+                azcam.log("Using exposure_levels")
 
-        exposure.expose(0, "zero", "QE bias")
+                self.exposure_times = {}  # reset
+                for w in self.exposure_levels:
+                    meancounts = azcam.db.tools["detcal"].mean_counts[w]
+                    et = self.exposure_levels[w] / meancounts / binning
+                    et = et * (
+                        azcam.db.tools["gain"].system_gain[0]
+                        / azcam.db.tools["detcal"].system_gain[0]
+                    )
 
-        for wave in self.exposure_times:
-            wave = int(0.5 + float(wave))  # make sure wave is an integer
+                    self.exposure_times[w] = et
 
-            etime = self.exposure_times[wave]
-            title = f"{wave} nm QE flat for {etime} secs"
-            instrument.set_wavelength(wave)
+            else:
+                azcam.log("Using exposure_times")
 
+            # take bias image
+            azcam.db.parameters.set_par("imageroot", "qe.")
             azcam.log(
-                f"Taking {wave} nm QE image for {etime:0.03f}seconds: {os.path.basename(exposure.get_filename())}"
+                "Taking bias image %s..." % os.path.basename(exposure.get_filename())
             )
 
-            # make exposure
-            for _ in range(self.flush_before_exposure):
-                exposure.test(0)
+            exposure.expose(0, "zero", "QE bias")
 
-            if self.include_dark_images:
-                darktitle = f"dark image for {etime} secs"
-                exposure.expose(etime, "dark", f"{darktitle}")
+            for wave in self.exposure_times:
+                wave = int(0.5 + float(wave))  # make sure wave is an integer
 
-            exposure.expose(etime, "flat", f"{title}")
+                etime = self.exposure_times[wave]
+                title = f"{wave} nm QE flat for {etime} secs"
+                instrument.set_wavelength(wave)
 
-        # copy flux cal file to local folder
-        try:
-            f1 = os.path.join(self.flux_cal_folder, self.flux_cal_file)
-            f2 = os.path.join(subfolder, "flux_cal.txt")
-            shutil.copyfile(f1, f2)
-        except FileNotFoundError:
-            pass
+                azcam.log(
+                    f"Taking {wave} nm QE image for {etime:0.03f}seconds: {os.path.basename(exposure.get_filename())}"
+                )
+
+                # make exposure
+                for _ in range(self.flush_before_exposure):
+                    exposure.test(0)
+
+                if self.include_dark_images:
+                    darktitle = f"dark image for {etime} secs"
+                    exposure.expose(etime, "dark", f"{darktitle}")
+
+                exposure.expose(etime, "flat", f"{title}")
+
+            # copy flux cal file to local folder
+            try:
+                f1 = os.path.join(self.flux_cal_folder, self.flux_cal_file)
+                f2 = os.path.join(subfolder, "flux_cal.txt")
+                shutil.copyfile(f1, f2)
+            except FileNotFoundError:
+                pass
 
         # finish
-        azcam.utils.restore_imagepars(impars)
         azcam.utils.curdir(currentfolder)
 
         return
@@ -209,15 +207,16 @@ class QE(Tester):
                 self.diode_wavelength.append(int(float(tokens[0]) + 0.5))
                 self.diode_power.append(float(tokens[1]))
 
-        # copy all image files to analysis folder
+        # link image files into analysis folder, corrected images replace links
         startingfolder, subfolder = azcam_console.utils.make_file_folder(subfolder)
-        azcam.log("Making copy of image files for analysis")
-        for filename in glob.glob(os.path.join(startingfolder, "*.fits")):
-            shutil.copy(filename, subfolder)
+        workspace = AnalysisWorkspace(startingfolder, subfolder)
+        workspace.add_files("*.fits")
 
         azcam.utils.curdir(subfolder)
 
-        _, StartingSequence = azcam_console.utils.find_file_in_sequence(rootname)
+        # index sequence and read all headers once
+        index = SequenceIndex(subfolder)
+        _, StartingSequence = index.find_file_in_sequence(rootname)
         SequenceNumber = StartingSequence
 
         # get gain
@@ -232,15 +231,14 @@ class QE(Tester):
         zmeans = azcam.fits.mean(zerofilename)
 
         try:
-            bin1 = int(azcam.fits.get_keyword(zerofilename, "CCDBIN1"))
-            bin2 = int(azcam.fits.get_keyword(zerofilename, "CCDBIN2"))
+            bin1 = int(index.get_keyword(zerofilename, "CCDBIN1"))
+            bin2 = int(index.get_keyword(zerofilename, "CCDBIN2"))
             binning = bin1 * bin2
             azcam.log(f"Binning is {binning} pixels")
         except Exception as e:
             azcam.log(e)
             binning = 1  # assume no keyword means no binning
 
-        nextfile = zerofilename  # just to start loop
         SequenceNumber = SequenceNumber + 1
 
         # loop through image files
@@ -250,7 +248,7 @@ class QE(Tester):
         self.qe = {}
         self.fluxes = []
         self.means = []
-        while os.path.exists(nextfile):
+        while index.exists(rootname, SequenceNumber):
             if self.include_dark_images:
                 darkfilename = rootname + "%04d" % (SequenceNumber)
                 darkfilename = os.path.join(subfolder, darkfilename) + ".fits"
@@ -266,19 +264,19 @@ class QE(Tester):
             meantemp = -999
 
             try:
-                exptime = float(azcam.fits.get_keyword(qefilename, "EXPTIME"))
-                wave = float(azcam.fits.get_keyword(qefilename, "WAVLNGTH"))
+                exptime = float(index.get_keyword(qefilename, "EXPTIME"))
+                wave = float(index.get_keyword(qefilename, "WAVLNGTH"))
                 wave = int(float(wave) + 0.5)
             except Exception:
                 # try wavelength in OBJECT keyword for manual testing
-                s = azcam.fits.get_keyword(qefilename, "OBJECT")
+                s = index.get_keyword(qefilename, "OBJECT")
                 wave = s.split(" ")[0]
                 wave = int(float(wave) + 0.5)
 
             self.exposures.append(exptime)
 
             try:
-                meantemp = float(azcam.fits.get_keyword(qefilename, "CAMTEMP"))
+                meantemp = float(index.get_keyword(qefilename, "CAMTEMP"))
             except Exception:
                 meantemp = -999.0
 
@@ -294,24 +292,20 @@ class QE(Tester):
 
             self.throughputs.append(windowstrans)
 
-            # bias or dark correct
+            # bias or dark correct and scale to electrons by system gain
+            chain = CalibrationChain()
             if self.include_dark_images:
-                azcam.fits.sub(qefilename, darkfilename, qefilename)
+                chain.dark(darkfilename)
             elif self.overscan_correct:
-                azcam.fits.colbias(qefilename, fit_order=self.fit_order)
-
-            # scale to electrons by system gain
-            qeimage = azcam.image.Image(qefilename)
-
+                chain.overscan(fit_order=self.fit_order)
             if self.overscan_correct or self.include_dark_images:
-                qeimage.set_scaling(self.system_gain, None)
+                chain.gain(self.system_gain)
             else:
-                qeimage.set_scaling(self.system_gain, zmeans)
-            qeimage.assemble(1)
+                chain.gain(self.system_gain, zmeans)
+            chain.assemble(1)
 
             # write scaled images as fits files
-            qeimage.save_data_format = -32
-            qeimage.write_file(f"qeimage_{wave}_{exptime:03f}.fits", 6)
+            qeimage = chain.apply(qefilename, f"qeimage_{wave}_{exptime:03f}.fits")
 
             # create masked array
             self.masked_image = numpy.ma.array(qeimage.buffer, mask=False)
@@ -357,9 +351,6 @@ class QE(Tester):
             SequenceNumber = SequenceNumber + 1
             if self.include_dark_images:
                 SequenceNumber = SequenceNumber + 1
-            nextfile = (
-                os.path.join(subfolder, rootname + "%04d" % SequenceNumber) + ".fits"
-            )
 
         # analyze grades for each wavelength
         for wave in self.wavelengths:
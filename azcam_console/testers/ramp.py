@@ -2,12 +2,12 @@ import math
 import os
 
 import numpy
-from astropy.io import fits as pyfits
 
 import azcam
 import azcam.utils
 import azcam.fits
 import azcam_console.plot
+from azcam_console.fits_mmap import MappedFits
 from azcam_console.testers.basetester import Tester
 
 
@@ -48,43 +48,40 @@ class Ramp(Tester):
         currentfolder, newfolder = azcam_console.utils.make_file_folder("ramp")
         azcam.db.parameters.set_par("imagefolder", newfolder)
 
-        # save pars to be changed
-        impars = {}
-        azcam.utils.save_imagepars(impars)
-
-        # flush detector
-        azcam.db.tools["exposure"].test(0)
-
-        azcam.db.parameters.set_par("imageroot", "ramp.")  # for automatic data analysis
-        azcam.db.parameters.set_par(
-            "imageincludesequencenumber", 1
-        )  # use sequence numbers
-        azcam.db.parameters.set_par("imageautoname", 0)  # manually set name
-        azcam.db.parameters.set_par(
-            "imageautoincrementsequencenumber", 1
-        )  # inc sequence numbers
-        azcam.db.parameters.set_par("imagetest", 0)  # turn off TestImage
-
-        # get bias image
-        azcam.db.parameters.set_par("imagetype", "zero")
-        zerofile = azcam.db.tools["exposure"].get_filename()
-        azcam.log("Taking bias image %s " % os.path.basename(zerofile))
-        azcam.db.tools["exposure"].expose(0, "zero", "ramp bias")
-
-        # take data images
-        base_et = azcam.db.tools["exposure"].get_exposuretime()
-        azcam.db.parameters.set_par("imagetype", "ramp")
-        file1 = azcam.db.tools["exposure"].get_filename()
-        azcam.log("Taking ramp image 1 %s" % os.path.basename(file1))
-        azcam.db.tools["exposure"].expose(base_et, "ramp", "ramp image 1")
-
-        file2 = azcam.db.tools["exposure"].get_filename()
-        azcam.log("Taking ramp image 2 %s" % os.path.basename(file2))
-        azcam.db.tools["exposure"].flush(2)
-        azcam.db.tools["exposure"].expose(base_et, "ramp", "ramp image 2")
+        # save image pars, restored on exit
+        with azcam.db.parameters.imagepars():
+            # flush detector
+            azcam.db.tools["exposure"].test(0)
+
+            azcam.db.parameters.set_pars(
+                {
+                    "imageroot": "ramp.",  # for automatic data analysis
+                    "imageincludesequencenumber": 1,  # use sequence numbers
+                    "imageautoname": 0,  # manually set name
+                    "imageautoincrementsequencenumber": 1,  # inc sequence numbers
+                    "imagetest": 0,  # turn off TestImage
+                }
+            )
+
+            # get bias image
+            azcam.db.parameters.set_par("imagetype", "zero")
+            zerofile = azcam.db.tools["exposure"].get_filename()
+            azcam.log("Taking bias image %s " % os.path.basename(zerofile))
+            azcam.db.tools["exposure"].expose(0, "zero", "ramp bias")
+
+            # take data images
+            base_et = azcam.db.tools["exposure"].get_exposuretime()
+            azcam.db.parameters.set_par("imagetype", "ramp")
+            file1 = azcam.db.tools["exposure"].get_filename()
+            azcam.log("Taking ramp image 1 %s" % os.path.basename(file1))
+            azcam.db.tools["exposure"].expose(base_et, "ramp", "ramp image 1")
+
+            file2 = azcam.db.tools["exposure"].get_filename()
+            azcam.log("Taking ramp image 2 %s" % os.path.basename(file2))
+            azcam.db.tools["exposure"].flush(2)
+            azcam.db.tools["exposure"].expose(base_et, "ramp", "ramp image 2")
 
         # finish
-        azcam.utils.restore_imagepars(impars)
         azcam.utils.curdir(currentfolder)
 
         return
@@ -139,6 +136,7 @@ class Ramp(Tester):
     def measure(self, Zero, Ramp1, Ramp2):
         """
         Calculate ptc data from a bias and two ramp images.
+        Ramp images are memory-mapped and only the rows analyzed are converted.
         """
 
         Ramp1 = azcam.utils.make_image_filename(Ramp1)
@@ -162,21 +160,11 @@ class Ramp(Tester):
         zsdev = azcam.fits.sdev(Zero)
 
         # open files
-        im1 = pyfits.open(Ramp1)
-        im2 = pyfits.open(Ramp2)
+        im1 = MappedFits(Ramp1)
+        im2 = MappedFits(Ramp2)
 
         # get image size
-        hdr = im1[first_ext].header
-        ncols = hdr["NAXIS1"]
-        nrows = hdr["NAXIS2"]
-
-        # get mean and ffci data shaped to [ext][rows][cols]
-        for ext in range(first_ext, last_ext):
-            azcam.log(ext, first_ext, last_ext)
-            data_ffci.append(im1[ext].data - im2[ext].data)
-            data_ffci[ext] = numpy.reshape(data_ffci[ext], [nrows, ncols])
-            data_mean.append(im1[ext].data - zmean[ext - 1])
-            data_mean[ext] = numpy.reshape(data_mean[ext], [nrows, ncols])
+        nrows, ncols = im1.shape(first_ext)
 
         # perhaps ignore edges
         if self.first_col == -1:
@@ -187,6 +175,14 @@ class Ramp(Tester):
         if self.MaxRow != -1:
             nrows = self.MaxRow
 
+        # get mean and ffci data shaped to [ext][rows][cols]
+        section = [0, nrows, 0, ncols]
+        for ext in range(first_ext, last_ext):
+            azcam.log(ext, first_ext, last_ext)
+            ramp1 = im1.section(ext, section)
+            data_ffci.append(ramp1 - im2.section(ext, section))
+            data_mean.append(ramp1 - zmean[ext - 1])
+
         # get stats in same ROI of each line
         gains = []
         means = []
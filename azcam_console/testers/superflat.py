@@ -1,4 +1,3 @@
-import glob
 import os
 import shutil
 
@@ -11,6 +10,7 @@ import azcam.image
 import azcam_console.plot
 import azcam.exceptions
 from azcam_console.testers.basetester import Tester
+from azcam_console.testers.workspace import AnalysisWorkspace
 
 
 class Superflat(Tester):
@@ -62,61 +62,63 @@ class Superflat(Tester):
 
         azcam.log("Acquiring Superflat sequence")
 
-        # save pars to be changed
-        impars = {}
-        azcam.utils.save_imagepars(impars)
-        currentfolder, subfolder = azcam_console.utils.make_file_folder("superflat")
-        azcam.db.parameters.set_par("imageroot", "superflat.")
-        azcam.db.parameters.set_par("imageincludesequencenumber", 1)
-        azcam.db.parameters.set_par("imageautoname", 0)
-        azcam.db.parameters.set_par("imageautoincrementsequencenumber", 1)
-        azcam.db.parameters.set_par("imagetest", 0)
-        azcam.db.parameters.set_par("imagefolder", subfolder)
-
-        # set wavelength
-        if self.wavelength > 0:
-            wave = int(self.wavelength)
-            wave1 = int(azcam.db.tools["instrument"].get_wavelength())
-            if wave1 != wave:
-                azcam.log(f"Setting wavelength to {wave} nm")
-                azcam.db.tools["instrument"].set_wavelength(wave)
-
-        # clear device
-        azcam.db.tools["exposure"].test(0)
-        imname = "test.fits"
-        bin1 = int(azcam.fits.get_keyword(imname, "CCDBIN1"))
-        bin2 = int(azcam.fits.get_keyword(imname, "CCDBIN2"))
-        binning = bin1 * bin2
-
-        # Try exposure_level to get ExposureTime
-        if self.use_exposure_levels:
-            azcam.log("Using exposure_level")
-
-            meancounts = azcam.db.tools["detcal"].mean_counts[wave]
-            self.exposure_time = (
-                self.exposure_level
-                / meancounts
-                / binning
-                * (
-                    azcam.db.tools["gain"].system_gain[0]
-                    / azcam.db.tools["detcal"].system_gain[0]
-                )
+        # save image pars, restored on exit
+        with azcam.db.parameters.imagepars():
+            currentfolder, subfolder = azcam_console.utils.make_file_folder("superflat")
+            azcam.db.parameters.set_pars(
+                {
+                    "imageroot": "superflat.",
+                    "imageincludesequencenumber": 1,
+                    "imageautoname": 0,
+                    "imageautoincrementsequencenumber": 1,
+                    "imagetest": 0,
+                    "imagefolder": subfolder,
+                }
             )
 
-        elif self.exposure_time > 0:
-            azcam.log("Using exposure_time")
-        else:
-            raise azcam.exceptions.AzcamError("could not determine exposure times")
+            # set wavelength
+            if self.wavelength > 0:
+                wave = int(self.wavelength)
+                wave1 = int(azcam.db.tools["instrument"].get_wavelength())
+                if wave1 != wave:
+                    azcam.log(f"Setting wavelength to {wave} nm")
+                    azcam.db.tools["instrument"].set_wavelength(wave)
+
+            # clear device
+            azcam.db.tools["exposure"].test(0)
+            imname = "test.fits"
+            bin1 = int(azcam.fits.get_keyword(imname, "CCDBIN1"))
+            bin2 = int(azcam.fits.get_keyword(imname, "CCDBIN2"))
+            binning = bin1 * bin2
+
+            # Try exposure_level to get ExposureTime
+            if self.use_exposure_levels:
+                azcam.log("Using exposure_level")
+
+                meancounts = azcam.db.tools["detcal"].mean_counts[wave]
+                self.exposure_time = (
+                    self.exposure_level
+                    / meancounts
+                    / binning
+                    * (
+                        azcam.db.tools["gain"].system_gain[0]
+                        / azcam.db.tools["detcal"].system_gain[0]
+                    )
+                )
 
-        for loop in range(self.number_images_acquire):
-            azcam.log(
-                f"Taking SuperFlat image {(loop + 1)} of {self.number_images_acquire} for {self.exposure_time:0.03f} seconds"
-            )
-            azcam.db.tools["exposure"].expose(
-                self.exposure_time, self.exposure_type, "superflat flat"
-            )
+            elif self.exposure_time > 0:
+                azcam.log("Using exposure_time")
+            else:
+                raise azcam.exceptions.AzcamError("could not determine exposure times")
+
+            for loop in range(self.number_images_acquire):
+                azcam.log(
+                    f"Taking SuperFlat image {(loop + 1)} of {self.number_images_acquire} for {self.exposure_time:0.03f} seconds"
+                )
+                azcam.db.tools["exposure"].expose(
+                    self.exposure_time, self.exposure_type, "superflat flat"
+                )
 
-        azcam.utils.restore_imagepars(impars)
         azcam.utils.curdir(currentfolder)
 
         # finish
@@ -138,10 +140,9 @@ class Superflat(Tester):
         # create analysis subfolder
         startingfolder, subfolder = azcam_console.utils.make_file_folder("analysis")
 
-        # copy all image files to analysis folder
-        azcam.log("Making copy of image files for analysis")
-        for filename in glob.glob(os.path.join(startingfolder, "*.fits")):
-            shutil.copy(filename, subfolder)
+        # link image files into analysis folder, corrected images replace links
+        workspace = AnalysisWorkspace(startingfolder, subfolder)
+        workspace.add_files("*.fits")
 
         azcam.utils.curdir(subfolder)  # move to analysis folder
 
@@ -152,26 +153,26 @@ class Superflat(Tester):
         nextfile = os.path.join(subfolder, rootname + "%04d" % SequenceNumber) + ".fits"
         filelist = []
         while os.path.exists(nextfile):
-            azcam.log(f"Processing {os.path.basename(nextfile)}")
             filelist.append(nextfile)
-
-            # colbias
-            if self.overscan_correct:
-                azcam.fits.colbias(nextfile, fit_order=self.fit_order)
-
-            # "debias" correct with residuals after colbias
-            if self.zero_correct:
-                debiased = azcam.db.tools["bias"].debiased_filename
-                biassub = "biassub.fits"
-                azcam.fits.sub(nextfile, debiased, biassub)
-                os.remove(nextfile)
-                os.rename(biassub, nextfile)
-
             SequenceNumber = SequenceNumber + 1
             nextfile = (
                 os.path.join(subfolder, rootname + "%04d" % SequenceNumber) + ".fits"
             )
 
+        # colbias
+        if self.overscan_correct:
+            workspace.colbias_files(
+                filelist, fit_order=self.fit_order, number_workers=self.number_workers
+            )
+
+        # "debias" correct with residuals after colbias
+        if self.zero_correct:
+            debiased = azcam.db.tools["bias"].debiased_filename
+            for filename in filelist:
+                azcam.log(f"Processing {os.path.basename(filename)}")
+                workspace.sub(filename, debiased)
+                workspace.flush(filename)
+
         # median combine all images
         azcam.log(f"Combining superflat images ({self.combination_type})")
         azcam.fits.combine(
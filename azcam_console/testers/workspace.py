@@ -0,0 +1,430 @@
+"""
+Copy-free analysis workspace for testers.
+
+Testers analyze images in an `analysis` subfolder because corrections such as colbias
+and bias subtraction rewrite files. Instead of copying every image into that folder,
+a workspace links the original images into it and corrects frames in memory. Only
+frames which are corrected are written, replacing their links, so the original images
+are never changed and unmodified images are never copied.
+
+Usage:
+    workspace = AnalysisWorkspace(startingfolder, subfolder)
+    workspace.add_files("ptc*.fits")
+    for filename in files:
+        workspace.colbias(filename, fit_order=3)
+        workspace.flush(filename)
+
+All corrections of the files in an analysis folder must use the workspace, as in-place
+FITS updates (such as azcam.fits.colbias) would write through links to the originals.
+"""
+
+import concurrent.futures
+import glob
+import os
+import shutil
+import time
+
+import numpy
+from astropy.io import fits as pyfits
+
+import azcam
+import azcam.utils
+import azcam.fits
+import azcam.exceptions
+
+
+class AnalysisWorkspace(object):
+    """
+    Analysis folder of linked original images with in-memory corrections.
+    """
+
+    def __init__(self, source_folder: str, folder: str) -> None:
+        """
+        Args:
+            source_folder: folder containing the original images
+            folder: analysis folder, which must exist
+        """
+
+        #: folder containing the original images
+        self.source_folder = source_folder
+
+        #: analysis folder
+        self.folder = folder
+
+        # corrected frames not yet written as {filename: HDUList}
+        self._frames = {}
+
+    def add_files(self, pattern: str = "*.fits") -> list:
+        """
+        Add original images to the workspace by linking them into the analysis folder.
+        Images are copied if links are not supported.
+
+        Args:
+            pattern: glob pattern of image files in source_folder
+
+        Returns:
+            list of image filenames in the analysis folder
+        """
+
+        filenames = []
+        for filename in sorted(glob.glob(os.path.join(self.source_folder, pattern))):
+            filenames.append(self.add_file(filename))
+
+        return filenames
+
+    def add_file(self, filename: str) -> str:
+        """
+        Add one original image to the workspace.
+
+        Args:
+            filename: image filename in source_folder
+
+        Returns:
+            image filename in the analysis folder
+        """
+
+        source = os.path.abspath(filename)
+        target = os.path.join(self.folder, os.path.basename(filename))
+
+        if os.path.lexists(target):
+            os.remove(target)
+        try:
+            os.symlink(source, target)
+        except (OSError, NotImplementedError):
+            shutil.copy(source, target)
+
+        return target
+
+    def filename(self, filename: str) -> str:
+        """
+        Return the absolute filename of an image in the analysis folder.
+
+        Args:
+            filename: image filename, relative names are in the analysis folder
+        """
+
+        filename = azcam.utils.make_image_filename(filename)
+
+        return os.path.join(self.folder, filename)
+
+    def open(self, filename: str) -> pyfits.HDUList:
+        """
+        Return the in-memory frame of an image, reading it if needed.
+        Image data are float32 until a correction changes the data type.
+
+        Args:
+            filename: image filename
+        """
+
+        filename = self.filename(filename)
+
+        frame = self._frames.get(filename)
+        if frame is None:
+            frame = pyfits.HDUList()
+            with pyfits.open(filename, memmap=False) as hdulist:
+                for hdu in hdulist:
+                    header = hdu.header.copy()
+                    if hdu.data is None:
+                        data = None
+                    elif _is_image(hdu):
+                        data = hdu.data.astype("float32")
+                    else:
+                        frame.append(hdu.copy())
+                        continue
+                    if len(frame) == 0:
+                        frame.append(pyfits.PrimaryHDU(data, header))
+                    else:
+                        frame.append(pyfits.ImageHDU(data, header))
+            self._frames[filename] = frame
+
+        return frame
+
+    def data(self, filename: str, extension: int) -> numpy.ndarray:
+        """
+        Return the current image data of an extension.
+
+        Args:
+            filename: image filename
+            extension: extension number
+        """
+
+        return self.open(filename)[extension].data
+
+    def colbias(self, filename: str, fit_order: int = 3, margin_cols: int = 0) -> None:
+        """
+        Remove column bias from an image, as azcam.fits.colbias() but vectorized and
+        without changing the original file.
+
+        Args:
+            filename: image filename
+            fit_order: polynomial fit order, use 0 to remove median not fitted value
+            margin_cols: number of overscan columns to skip before correction
+        """
+
+        frame = self.open(filename)
+
+        # if already COLBIAS then exit here
+        for h in frame[0].header.get("HISTORY", []):
+            if "COLBIAS" in repr(h):
+                return
+
+        _, firstext, lastext = _get_extensions(frame)
+
+        for i in range(firstext, lastext):
+            data = frame[i].data.astype("float32")
+            colbias_data(data, frame[firstext].header, fit_order, margin_cols)
+            frame[i].data = data
+
+        history_string = "COLBIAS data was column overscan corrected"
+        value = (
+            time.strftime("%Y/%m/%d %H:%M:%S ", time.gmtime(time.time()))
+            + history_string
+        )
+        frame[0].header.add_history(value)
+
+        return
+
+    def colbias_files(
+        self,
+        filenames: list,
+        fit_order: int = 3,
+        margin_cols: int = 0,
+        number_workers: int = 1,
+    ) -> None:
+        """
+        Remove column bias from images and write them to the analysis folder.
+        Images are corrected in separate processes when number_workers is greater than 1.
+        Progress is logged in the order of filenames.
+
+        Args:
+            filenames: image filenames
+            fit_order: polynomial fit order, use 0 to remove median not fitted value
+            margin_cols: number of overscan columns to skip before correction
+            number_workers: maximum number of processes
+        """
+
+        filenames = [self.filename(f) for f in filenames]
+        numfiles = len(filenames)
+
+        # frames already in memory are corrected here
+        pending = [f for f in filenames if f in self._frames]
+        filenames = [f for f in filenames if f not in self._frames]
+        for f in pending:
+            self.colbias(f, fit_order, margin_cols)
+            self.flush(f)
+
+        if number_workers <= 1 or len(filenames) <= 1:
+            for count, f in enumerate(filenames, len(pending) + 1):
+                _colbias_file(f, fit_order, margin_cols)
+                azcam.log(
+                    f"Overscan corrected image {count}/{numfiles}: {os.path.basename(f)}"
+                )
+            return
+
+        number_workers = min(number_workers, len(filenames))
+        with concurrent.futures.ProcessPoolExecutor(number_workers) as executor:
+            futures = [
+                executor.submit(_colbias_file, f, fit_order, margin_cols)
+                for f in filenames
+            ]
+            try:
+                for count, (f, future) in enumerate(
+                    zip(filenames, futures), len(pending) + 1
+                ):
+                    future.result()
+                    azcam.log(
+                        f"Overscan corrected image {count}/{numfiles}: {os.path.basename(f)}"
+                    )
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        return
+
+    def sub(
+        self, filename: str, filename2: str | float, datatype: str = "uint16"
+    ) -> None:
+        """
+        Subtract an image or constant from an image, as azcam.fits.sub(filename, filename2).
+
+        Args:
+            filename: image filename
+            filename2: image filename or a constant
+            datatype: valid datatype string for resultant data type
+        """
+
+        frame = self.open(filename)
+        _, firstext, lastext = _get_extensions(frame)
+
+        if isinstance(filename2, str):
+            frame2 = self._frames.get(self.filename(filename2))
+            if frame2 is None:
+                filename2 = azcam.utils.make_image_filename(filename2)
+                with pyfits.open(filename2, memmap=False) as hdulist:
+                    frame2 = [hdu.data for hdu in hdulist]
+            else:
+                frame2 = [hdu.data for hdu in frame2]
+            if len(frame2) != len(frame):
+                raise azcam.exceptions.AzcamError("unequal FITS image extensions")
+        else:
+            frame2 = None
+
+        for i in range(firstext, lastext):
+            if not _is_image(frame[i]):
+                continue
+            data = frame[i].data.astype("float32")
+            if frame2 is None:
+                data = data - float(filename2)
+            else:
+                data = data - frame2[i].astype("float32")
+            if datatype == "uint16":
+                numpy.clip(data, 0, 2**16, data)  # clip values below zero
+            frame[i].data = data.astype(datatype)
+
+        return
+
+    def resample(self, filename: str, resample: int = 2) -> None:
+        """
+        Resample an image by combining adjacent pixels, as azcam.fits.resample().
+
+        Args:
+            filename: image filename
+            resample: number of pixels to combine in each dimension
+        """
+
+        frame = self.open(filename)
+        _, firstext, lastext = _get_extensions(frame)
+
+        for i in range(firstext, lastext):
+            data = frame[i].data
+            rows = data.shape[0] // resample
+            cols = data.shape[1] // resample
+            data = data[: rows * resample, : cols * resample]
+            frame[i].data = data.reshape(rows, resample, cols, resample).sum(3).sum(1)
+
+        return
+
+    def flush(self, filename: str | None = None) -> None:
+        """
+        Write corrected frames to the analysis folder and release their memory.
+        Links to original images are replaced, the originals are not changed.
+
+        Args:
+            filename: image filename, None to write all corrected frames
+        """
+
+        if filename is None:
+            filenames = list(self._frames)
+        else:
+            filenames = [self.filename(filename)]
+
+        for f in filenames:
+            frame = self._frames.pop(f, None)
+            if frame is None:
+                continue
+            if os.path.lexists(f):
+                os.remove(f)
+            frame.writeto(f)
+
+        return
+
+
+def _colbias_file(filename: str, fit_order: int, margin_cols: int) -> None:
+    """
+    Remove column bias from one image in the analysis folder, run in worker processes.
+    """
+
+    workspace = AnalysisWorkspace(os.path.dirname(filename), os.path.dirname(filename))
+    workspace.colbias(filename, fit_order, margin_cols)
+    workspace.flush(filename)
+
+    return
+
+
+def colbias_data(
+    data: numpy.ndarray,
+    header: pyfits.Header,
+    fit_order: int = 3,
+    margin_cols: int = 0,
+) -> None:
+    """
+    Remove column bias from the float image data of one extension in place,
+    as azcam.fits.colbias().
+
+    Args:
+        data: image data as [rows, cols]
+        header: extension header with BIASSEC and optional OVRSCAN2 keywords
+        fit_order: polynomial fit order, use 0 to remove median not fitted value
+        margin_cols: number of overscan columns to skip before correction
+    """
+
+    # get overscan info
+    reply = header.get("OVRSCAN2", "")
+    if isinstance(reply, str):
+        overscanrows = 0
+    else:
+        overscanrows = int(reply)
+    col1, col2, row1, row2 = _get_section(header, "BIASSEC")
+    col1 += 1
+    col1 += margin_cols
+    col2 -= 1
+    row2 += overscanrows
+
+    rows = numpy.arange(row1, row2 + 1)
+
+    # median of overscan in each row
+    median = numpy.median(data[row1 : row2 + 1, col1 : col2 + 1], axis=1)
+
+    if fit_order > 0:
+        _, _, yfit, _, _ = azcam.fits._line_fit(list(rows), list(median), fit_order)
+        yfit = yfit.astype(data.dtype)
+    else:
+        yfit = median
+
+    # correct data by subtracting row by row best fit
+    data[row1 : row2 + 1] -= yfit[rows][:, None]
+
+    return
+
+
+def _is_image(hdu) -> bool:
+    """
+    Return True if an HDU contains image data.
+    """
+
+    return isinstance(hdu, (pyfits.PrimaryHDU, pyfits.ImageHDU))
+
+
+def _get_extensions(frame: pyfits.HDUList) -> list:
+    """
+    Return [number_exts, first_ext, last_ext] of a frame, as azcam.fits.get_extensions().
+    """
+
+    header = frame[0].header
+    if "NEXTEND" in header:
+        num_ext = header["NEXTEND"]
+        first_ext = 0 if num_ext == 0 else 1
+        last_ext = num_ext + 1
+    else:
+        num_ext = 0
+        first_ext = 0
+        last_ext = 1
+
+    return [num_ext, first_ext, last_ext]
+
+
+def _get_section(header: pyfits.Header, section: str) -> list:
+    """
+    Return a header section as zero-based [first_col, last_col, first_row, last_row],
+    as azcam.fits.get_section().
+    """
+
+    datasec = header[section].lstrip("[").split(":")
+    first_col = int(datasec[0]) - 1
+    datasec1 = datasec[1].split(",")
+    last_col = int(datasec1[0]) - 1
+    first_row = int(datasec1[1]) - 1
+    last_row = int(datasec[2].rstrip("]")) - 1
+
+    return [first_col, last_col, first_row, last_row]
@@ -2,10 +2,12 @@
 Contains the ExposureConsole class.
 """
 
+import json
 from typing import Union, List, Optional
 
 import azcam
 from azcam_console.tools.console_tools import ConsoleTools
+from azcam_console.status import StatusSubscription
 
 
 class ExposureConsole(ConsoleTools):
@@ -463,6 +465,27 @@ class ExposureConsole(ConsoleTools):
     def get_exposureflag(self):
         return azcam.db.api.command(f"exposure.get_exposureflag")
 
+    def subscribe(
+        self, active_interval: float = 0.25, idle_interval: float = 0.1
+    ) -> StatusSubscription:
+        """
+        Start and return a subscription to exposure state and progress events.
+        Events are delivered only when the state changes, using a separate server connection.
+
+        Args:
+            active_interval: poll interval in seconds while an exposure is in progress
+            idle_interval: poll interval in seconds when idle
+        Returns:
+            running StatusSubscription, call its stop() method when finished
+        """
+
+        subscription = StatusSubscription(
+            azcam.db.server.host, azcam.db.server.port, active_interval, idle_interval
+        )
+        subscription.start()
+
+        return subscription
+
     def get_status(self):
         """
         Return JSON dictionary of a variety of system status data in one dictionary.
@@ -15,6 +15,7 @@ if os.name == "nt":
 import azcam
 import azcam.utils
 import azcam.exceptions
+from azcam_console.sequence_index import SequenceIndex
 
 
 def beep(frequency=2000, duration=500) -> None:
@@ -43,30 +44,9 @@ def find_file_in_sequence(file_root: str, file_number: int = 1) -> tuple:
         tuple (filename,sequencenumber).
     """
 
-    currentfolder = azcam.utils.curdir()
-
-    for _, _, files in os.walk(currentfolder):
-        break
-
-    for f in files:
-        if f.startswith(file_root):
-            break
-
-    try:
-        if not f.startswith(file_root):
-            raise azcam.exceptions.AzcamError("image sequence not found")
-    except Exception:
-        raise azcam.exceptions.AzcamError("image sequence not found")
-
-    firstfile = azcam.utils.fix_path(os.path.join(currentfolder, f))
-    firstsequencenumber = firstfile[-9:-5]
-    firstnum = firstsequencenumber
-    firstsequencenumber = int(firstsequencenumber)
-    sequencenumber = firstsequencenumber + file_number - 1
-    newnum = "%04d" % sequencenumber
-    filename = firstfile.replace(firstnum, newnum)
+    index = SequenceIndex(azcam.utils.curdir(), read_headers=False)
 
-    return (filename, sequencenumber)
+    return index.find_file_in_sequence(file_root, file_number)
 
 
 def make_file_folder(